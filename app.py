@@ -1,12 +1,16 @@
 # app.py - 主应用程序和路由
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context, has_request_context
 from flask_cors import CORS
 import pandas as pd
 import os
 import json
+import queue
 import sys
+import threading
+import zipfile
 from pathlib import Path
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import get_input_stream
 import numpy as np
 from datetime import datetime
 import matplotlib
@@ -21,11 +25,26 @@ sys.path.insert(0, str(project_root))
 from config.settings import config
 
 # 导入自定义模块
-from src.core.utils import allowed_file, set_chinese_font
-from src.core.coal_analysis import process_data_file, classify_coal_layer, get_coal_depth_ranges
+from src.core.utils import allowed_file, set_chinese_font, file_content_hash
+from src.core.coal_analysis import (process_data_file, process_data_frame, classify_coal_layer, get_coal_depth_ranges,
+                                    coal_threshold_sensitivity, read_regularized_file)
+from src.core.upload_stream import HashingTee
+from src.core.chunked_upload import ChunkedUploadSession, ChunkedUploadError
+from src.core.depth_stats import DepthStatsPyramid
+from src.core.interval_index import IntervalIndex
+from src.core.seam_correlation import layer_signatures, correlate_well_pair, build_seam_groups
+from src.core.soil_zoning import (soil_features, zone_model_id, fit_soil_zones, assign_soil_zones,
+                                  summarize_soil_zones, save_zone_model, load_zone_model)
+from src.core.spatial_analysis import WellSpatialIndex, interpolate_surfaces, summarize_resource_grid
 from src.core.pollution_assessment import assess_coal_pollution, generate_pollution_visualization
-from src.core.resource_assessment import calculate_coal_resources, optimize_mining_plan, predict_resource_trend
+from src.core.diffusion_simulation import DEFAULT_DIFFUSION_PARAMS, simulate_diffusion
+from src.core.uncertainty import monte_carlo_assessment
+from src.core.preview import preview_assessment
+from src.core.resource_assessment import (calculate_coal_resources, optimize_mining_plan, evaluate_mining_scenarios,
+                                          update_trend_stats, trend_from_stats, generate_trend_chart)
 from src.core.agriculture import assess_soil_quality, generate_reclamation_plan, recommend_agriculture
+from src.core.batch_processing import iter_batch_assessments, extract_archive, summarize_batch_result
+from src.core.telemetry import TelemetryStream, parse_telemetry_line
 
 # 创建Flask应用实例
 app = Flask(__name__)
@@ -42,18 +61,62 @@ app.config['SECRET_KEY'] = current_config.SECRET_KEY
 # 创建必要的目录
 for folder in [current_config.UPLOAD_FOLDER, current_config.HISTORY_FOLDER, 
                current_config.RESOURCE_FOLDER, current_config.CHARTS_FOLDER, 
-               current_config.LOGS_FOLDER]:
+               current_config.SOIL_ZONE_MODEL_FOLDER, current_config.LOGS_FOLDER]:
     folder.mkdir(parents=True, exist_ok=True)
 
     # 缓存数据存储
 data_cache = {}
+stats_cache = {}
+sensitivity_cache = {}
+signature_cache = {}
+correlation_cache = {}
+soil_feature_cache = {}
+soil_zone_models = {}
+pollution_segments = {}
+well_summaries = {}
+spatial_cache = {}
+interval_index = IntervalIndex()
 pollution_history = {}
 resource_data_cache = {}
 extraction_history = {}
+resource_trend_stats = {}
 agriculture_history = {}
+chunked_uploads = {}
+telemetry_streams = {}
+telemetry_subscribers = {}
+telemetry_lock = threading.Lock()
 
 
 # 通用文件处理函数
+def get_coal_rules():
+    """按请求参数rule_set选择煤层判别规则集，返回(规则, 错误信息)"""
+    rule_set = request.values.get('rule_set') or 'default'
+    if rule_set not in current_config.COAL_DETECTION_RULE_SETS:
+        return None, f'未知的煤层判别规则集: {rule_set}'
+    return current_config.COAL_DETECTION_RULE_SETS[rule_set], None
+
+
+def assessment_parameters(**values):
+    """评估记录中保存的生成参数（规则集及非空的其他参数），离线重算时按这些参数重新计算"""
+    return {'rule_set': request.values.get('rule_set') or 'default',
+            **{key: value for key, value in values.items() if value is not None}}
+
+
+def get_uncertainty_samples():
+    """读取请求参数uncertainty_samples（蒙特卡洛模拟次数，未提供时为0），返回(次数, 错误信息)"""
+    samples = request.values.get('uncertainty_samples', 0, type=int)
+    if samples < 0 or samples > current_config.UNCERTAINTY_MAX_SAMPLES:
+        return None, f'模拟次数需在0到{current_config.UNCERTAINTY_MAX_SAMPLES}之间'
+    return samples, None
+
+
+def run_uncertainty(result, samples, area=10000):
+    """对处理结果做蒙特卡洛不确定性分析（误差模型见UNCERTAINTY_ERROR_MODELS）"""
+    coal_rules, _ = get_coal_rules()
+    return monte_carlo_assessment(result['data'], samples, current_config.UNCERTAINTY_ERROR_MODELS, coal_rules,
+                                  area=area, seed=request.values.get('seed', type=int))
+
+
 def process_uploaded_file(file, location='未知位置', notes='', area=10000):
     """处理上传的文件并返回处理结果"""
     if not file or file.filename == '':
@@ -62,18 +125,35 @@ def process_uploaded_file(file, location='未知位置', notes='', area=10000):
     if not allowed_file(file.filename):
         return None, '不允许的文件类型', 400
 
+    coal_rules, error = get_coal_rules()
+    if error:
+        return None, error, 400
+
     filename = secure_filename(file.filename)
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
 
     try:
-        data, coal_mask, coal_data, chart_data = process_data_file(filepath)
+        if filename.lower().endswith('.csv'):
+            # CSV直接从请求流解析，同时计算哈希，原始文件由后台线程保存
+            stream = HashingTee(file.stream, filepath)
+            try:
+                data = pd.read_csv(stream)
+            finally:
+                content_hash = stream.finish()
+            data, coal_mask, coal_data, chart_data = process_data_frame(data, current_config.SIGNAL_FILTERS,
+                                                                        coal_rules)
+        else:
+            file.save(filepath)
+            content_hash = file_content_hash(filepath)
+            data, coal_mask, coal_data, chart_data = process_data_file(filepath, current_config.LAS_CURVE_ALIASES,
+                                                                       current_config.SIGNAL_FILTERS, coal_rules)
         return {
             'data': data,
             'coal_mask': coal_mask,
             'coal_data': coal_data,
             'chart_data': chart_data,
             'filename': filename,
+            'content_hash': content_hash,
             'location': location,
             'notes': notes,
             'area': float(area),
@@ -85,6 +165,34 @@ def process_uploaded_file(file, location='未知位置', notes='', area=10000):
     # 保存历史记录函数
 
 
+def preview_uploaded_file(file, assessments, area=10000):
+    """
+    快速预览：读取上传文件后只计算评分和汇总指标（不生成图表、不保存历史记录）
+
+    规整化后的数据按文件内容缓存，之后以相同文件提交完整评估时不再重复读取（CSV走流式解析，不使用该缓存）。
+    """
+    if not file or file.filename == '':
+        return None, '没有选择文件', 400
+
+    if not allowed_file(file.filename):
+        return None, '不允许的文件类型', 400
+
+    coal_rules, error = get_coal_rules()
+    if error:
+        return None, error, 400
+
+    filename = secure_filename(file.filename)
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    try:
+        file.save(filepath)
+        data = read_regularized_file(filepath, current_config.LAS_CURVE_ALIASES, current_config.SIGNAL_FILTERS)
+        preview = preview_assessment(data, assessments, coal_rules, area,
+                                     horizon_params=current_config.SOIL_HORIZON_PARAMS)
+        return {'filename': filename, **preview}, None, 200
+    except Exception as e:
+        return None, f'处理文件时出错: {str(e)}', 500
+
+
 def save_history(data, folder, prefix=''):
     """保存历史记录并返回键值"""
     history_key = f"{data['location']}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
@@ -96,6 +204,137 @@ def save_history(data, folder, prefix=''):
     return history_key
 
 
+def save_history_bulk(records, folder, prefix=''):
+    """批量保存历史记录并返回与records对应的键值列表"""
+    suffix = datetime.now().strftime('%Y%m%d%H%M%S')
+    keys = []
+    for index, data in enumerate(records):
+        # 同一批次中位置相同（如同名不同扩展名的文件）的记录以序号区分
+        history_key = f"{data['location']}_{suffix}_{index}"
+        with open(os.path.join(folder, f"{prefix}{history_key}.json"), 'w') as f:
+            json.dump(data, f)
+        keys.append(history_key)
+    return keys
+
+
+def record_batch_results(results):
+    """批量写入评估历史记录并更新历史缓存，返回各文件的历史记录键值"""
+    results = [r for r in results if 'error' not in r]
+    pollution_keys = save_history_bulk([r['pollution'] for r in results], str(current_config.HISTORY_FOLDER))
+    resource_keys = save_history_bulk([r['resource'] for r in results], str(current_config.RESOURCE_FOLDER))
+    agriculture_keys = save_history_bulk([r['agriculture'] for r in results], str(current_config.RESOURCE_FOLDER),
+                                         prefix='agri_')
+
+    history_keys = {}
+    for result, pollution_key, resource_key, agriculture_key in zip(results, pollution_keys, resource_keys,
+                                                                    agriculture_keys):
+        location = result['location']
+        assessment = result['pollution']['assessment']
+        soil_quality = result['agriculture']['soil_quality']
+        pollution_segments[result['filename']] = assessment['segments']
+        index_intervals(result['filename'], segments=assessment['segments'],
+                        coal_layers=[{'start': layer['start_depth'], 'end': layer['end_depth'],
+                                      'thickness': layer['thickness']} for layer in result['resource']['layers']])
+        update_well_summary(result['filename'],
+                            thickness=sum(layer['thickness'] for layer in result['resource']['layers']),
+                            tons_per_m2=result['resource']['total_resources'] / result['resource']['area'],
+                            pollution_score=assessment['overall_score'])
+
+        pollution_history.setdefault(location, []).append({
+            'key': pollution_key,
+            'timestamp': result['timestamp'],
+            'overall_score': assessment['overall_score'],
+            'pollution_grade': assessment['pollution_grade']
+        })
+
+        record = {
+            'key': resource_key,
+            'timestamp': result['timestamp'],
+            'total_resources': result['resource']['total_resources'],
+            'layers_count': result['resource']['layers_count']
+        }
+        extraction_history.setdefault(location, []).append(record)
+        resource_trend_stats[location] = update_trend_stats(resource_trend_stats.get(location), record)
+
+        if 'error' not in soil_quality:
+            agriculture_history.setdefault(location, []).append({
+                'key': agriculture_key,
+                'timestamp': result['timestamp'],
+                'location': location,
+                'soil_type': soil_quality['soil_type'],
+                'fertility_score': soil_quality['fertility_score'],
+                'pollution_level': soil_quality['pollution_level']['level']
+            })
+
+        history_keys[result['filename']] = {
+            'pollution': pollution_key,
+            'resource': resource_key,
+            'agriculture': agriculture_key
+        }
+    return history_keys
+
+
+def update_well_summary(filename, data=None, coal_mask=None, **values):
+    """
+    更新井的平面插值属性：煤层总厚度thickness、单位面积资源量tons_per_m2（吨/平方米）、污染评分pollution_score，
+    以及请求参数x、y给出的井位坐标
+    """
+    summary = well_summaries.setdefault(filename, {'filename': filename})
+    if data is not None:
+        resources = calculate_coal_resources(data, coal_mask, 1.0)
+        summary['thickness'] = float(resources['layers'].thickness.sum())
+        summary['tons_per_m2'] = resources['total_resources']
+    summary.update(values)
+
+    if has_request_context():
+        x = request.values.get('x', type=float)
+        y = request.values.get('y', type=float)
+        if x is not None and y is not None:
+            summary.update(x=x, y=y)
+            spatial_cache.clear()
+
+
+def get_well_index():
+    """已登记坐标的井的KD树索引（坐标变化后重建）"""
+    if 'index' not in spatial_cache:
+        located = [summary for summary in well_summaries.values() if 'x' in summary]
+        spatial_cache['index'] = WellSpatialIndex([summary['filename'] for summary in located],
+                                                  [(summary['x'], summary['y']) for summary in located])
+    return spatial_cache['index']
+
+
+def cache_chart_data(filename, chart_data):
+    """缓存图表数据，并构建深度区间统计金字塔"""
+    data_cache[filename] = chart_data
+    stats_cache[filename] = DepthStatsPyramid(chart_data['depth'], chart_data['indicators'])
+    for key in [key for key in sensitivity_cache if key[0] == filename]:
+        del sensitivity_cache[key]
+    signature_cache.pop(filename, None)
+    soil_feature_cache.pop(filename, None)
+    pollution_segments.pop(filename, None)
+    for key in [key for key in correlation_cache if filename in key[:2]]:
+        del correlation_cache[key]
+    # 重新上传时旧的污染分段已失效，先删除该文件的全部区间，再登记新的煤层
+    interval_index.remove(filename)
+    index_intervals(filename, coal_layers=chart_data['coal_layers'])
+
+
+def index_intervals(filename, coal_layers=None, segments=None):
+    """把文件的煤层（start/end/thickness）和污染分段登记到深度区间索引"""
+    if coal_layers is not None:
+        interval_index.add(filename, 'layer',
+                           [layer['start'] for layer in coal_layers], [layer['end'] for layer in coal_layers],
+                           [{'layer_number': i + 1, 'start': layer['start'], 'end': layer['end'],
+                             'thickness': layer['thickness']} for i, layer in enumerate(coal_layers)])
+    if segments is not None:
+        interval_index.add(filename, 'segment',
+                           [segment['start_depth'] for segment in segments],
+                           [segment['end_depth'] for segment in segments],
+                           [{'segment_number': i + 1, 'start': segment['start_depth'], 'end': segment['end_depth'],
+                             'coal_percentage': segment['coal_percentage'],
+                             'pollution_level': segment['pollution_level']} for i, segment in enumerate(segments)])
+
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
@@ -106,10 +345,104 @@ def upload_file():
         return jsonify({'error': error}), status
 
         # 缓存数据，用于后续请求
-    data_cache[result['filename']] = result['chart_data']
+    cache_chart_data(result['filename'], result['chart_data'])
+    update_well_summary(result['filename'], result['data'], result['coal_mask'])
     return jsonify(result['chart_data']), 200
 
 
+def get_chunked_upload(upload_id):
+    """获取分块上传会话，服务重启后从进度文件恢复"""
+    session = chunked_uploads.get(upload_id)
+    if session is None:
+        session = ChunkedUploadSession.load(app.config['UPLOAD_FOLDER'], upload_id)
+        if session is not None:
+            # 并发请求同时恢复同一会话时只保留一个会话对象，保证会话锁有效
+            session = chunked_uploads.setdefault(upload_id, session)
+    return session
+
+
+@app.route('/uploads', methods=['POST'])
+def init_chunked_upload():
+    """创建分块上传会话：JSON参数 filename、size，可选 sha256"""
+    params = request.get_json(silent=True) or {}
+    filename = secure_filename(params.get('filename', ''))
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': '不允许的文件类型'}), 400
+
+    try:
+        session = ChunkedUploadSession.create(app.config['UPLOAD_FOLDER'], filename, int(params.get('size', -1)),
+                                              params.get('sha256'), current_config.MAX_CHUNKED_UPLOAD_SIZE)
+    except (ChunkedUploadError, ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    chunked_uploads[session.upload_id] = session
+    return jsonify({**session.status(), 'chunk_size': current_config.UPLOAD_CHUNK_SIZE}), 201
+
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    """查询已接收的字节数，用于断点续传"""
+    session = get_chunked_upload(upload_id)
+    if session is None:
+        return jsonify({'error': '未找到上传会话'}), 404
+    return jsonify(session.status()), 200
+
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """上传一个分块：查询参数offset为该分块在文件中的起始字节，请求体为分块数据"""
+    session = get_chunked_upload(upload_id)
+    if session is None:
+        return jsonify({'error': '未找到上传会话'}), 404
+
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': '缺少offset参数'}), 400
+
+    try:
+        session.write_chunk(offset, request.get_data(cache=False))
+    except ChunkedUploadError as e:
+        return jsonify({'error': str(e), **session.status()}), 409
+    except Exception as e:
+        return jsonify({'error': f'处理分块时出错: {str(e)}', **session.status()}), 500
+    return jsonify(session.status()), 200
+
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    """完成分块上传：校验文件并返回与/upload相同的分析结果"""
+    session = get_chunked_upload(upload_id)
+    if session is None:
+        return jsonify({'error': '未找到上传会话'}), 404
+
+    coal_rules, error = get_coal_rules()
+    if error:
+        return jsonify({'error': error}), 400
+
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], session.filename)
+    try:
+        data, content_hash = session.finalize(filepath)
+    except ChunkedUploadError as e:
+        if not os.path.exists(session.part_path):
+            chunked_uploads.pop(upload_id, None)
+        return jsonify({'error': str(e), **session.status()}), 409
+    chunked_uploads.pop(upload_id, None)
+
+    try:
+        if data is not None:
+            data, coal_mask, coal_data, chart_data = process_data_frame(data, current_config.SIGNAL_FILTERS,
+                                                                        coal_rules)
+        else:
+            data, coal_mask, coal_data, chart_data = process_data_file(filepath, current_config.LAS_CURVE_ALIASES,
+                                                                       current_config.SIGNAL_FILTERS, coal_rules)
+    except Exception as e:
+        return jsonify({'error': f'处理文件时出错: {str(e)}'}), 500
+
+    cache_chart_data(session.filename, chart_data)
+    update_well_summary(session.filename, data, coal_mask)
+    return jsonify({**chart_data, 'filename': session.filename, 'content_hash': content_hash}), 200
+
+
 @app.route('/data/<filename>', methods=['GET'])
 def get_data_range(filename):
     if filename not in data_cache:
@@ -146,6 +479,311 @@ def get_data_range(filename):
     return jsonify(chart_data), 200
 
 
+@app.route('/stats/<filename>', methods=['GET'])
+def get_depth_stats(filename):
+    """统计深度区间内各指标的均值、标准差、最小值和最大值（不传start/end时为全井段）"""
+    if filename not in stats_cache:
+        return jsonify({'error': '未找到数据，请先上传文件'}), 404
+
+    start_depth = request.args.get('start', type=float)
+    end_depth = request.args.get('end', type=float)
+    return jsonify(stats_cache[filename].query(start_depth, end_depth)), 200
+
+
+def query_intervals(start, end):
+    """按请求参数kind和filename过滤区间索引查询结果"""
+    kind = request.args.get('kind')
+    if kind not in (None, 'layer', 'segment'):
+        return jsonify({'error': 'kind只能为layer或segment'}), 400
+    intervals = interval_index.overlap(start, end, kind=kind, source=request.args.get('filename'))
+    return jsonify({'start': start, 'end': end, 'count': len(intervals), 'intervals': intervals}), 200
+
+
+@app.route('/intervals/point', methods=['GET'])
+def intervals_at_depth():
+    """查询包含指定深度的煤层和污染分段，可按kind(layer/segment)和filename过滤"""
+    depth = request.args.get('depth', type=float)
+    if depth is None:
+        return jsonify({'error': '缺少depth参数'}), 400
+    return query_intervals(depth, depth)
+
+
+@app.route('/intervals/overlap', methods=['GET'])
+def intervals_in_range():
+    """查询与深度区间[start, end]相交的煤层和污染分段，可按kind(layer/segment)和filename过滤"""
+    start_depth = request.args.get('start', type=float)
+    end_depth = request.args.get('end', type=float)
+    if start_depth is None or end_depth is None or start_depth > end_depth:
+        return jsonify({'error': '需要有效的start和end参数'}), 400
+    return query_intervals(start_depth, end_depth)
+
+
+def parse_threshold_grid(grid):
+    """解析阈值网格：每个参数为取值列表，或{'start', 'stop', 'num'}形式的等间距范围"""
+    if not isinstance(grid, dict) or not grid:
+        raise ValueError('grid必须是非空的参数字典')
+    parsed = {}
+    for name, spec in grid.items():
+        if isinstance(spec, dict):
+            parsed[name] = np.linspace(float(spec['start']), float(spec['stop']), int(spec.get('num', 11))).tolist()
+        else:
+            parsed[name] = [float(value) for value in spec]
+    return parsed
+
+
+@app.route('/threshold-sensitivity/<filename>', methods=['POST'])
+def threshold_sensitivity(filename):
+    """
+    在阈值参数网格上评估煤层总厚度和层数的变化
+
+    JSON参数：grid {阈值参数名: 取值列表或{start, stop, num}}，rule_set 基础规则集（默认default）
+    """
+    if filename not in data_cache:
+        return jsonify({'error': '未找到数据，请先上传文件'}), 404
+
+    params = request.get_json(silent=True) or {}
+    rule_set = params.get('rule_set') or 'default'
+    if rule_set not in current_config.COAL_DETECTION_RULE_SETS:
+        return jsonify({'error': f'未知的煤层判别规则集: {rule_set}'}), 400
+    try:
+        grid = parse_threshold_grid(params.get('grid'))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'阈值网格格式错误: {str(e)}'}), 400
+
+    combinations = int(np.prod([len(values) for values in grid.values()]))
+    if combinations > current_config.SENSITIVITY_MAX_COMBINATIONS:
+        return jsonify({'error': f'参数组合数{combinations}超过上限{current_config.SENSITIVITY_MAX_COMBINATIONS}'}), 400
+
+    cache_key = (filename, json.dumps({'rule_set': rule_set, 'grid': grid}, sort_keys=True))
+    if cache_key not in sensitivity_cache:
+        chart_data = data_cache[filename]
+        data = pd.DataFrame({'深度': chart_data['depth'], **chart_data['indicators']})
+        # 煤层划分使用上传时规整化得到的采样间隔和数据缺失段
+        data.attrs.update(sampling_interval=chart_data.get('sampling_interval'),
+                          gaps=[(gap['start'], gap['end']) for gap in chart_data.get('gaps', [])])
+        try:
+            sensitivity_cache[cache_key] = coal_threshold_sensitivity(
+                data, grid, current_config.COAL_DETECTION_RULE_SETS[rule_set])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    return jsonify({'filename': filename, 'rule_set': rule_set, **sensitivity_cache[cache_key]}), 200
+
+
+def get_layer_signatures(filename):
+    """获取已上传文件的煤层特征曲线（按文件缓存）"""
+    if filename not in signature_cache:
+        chart_data = data_cache[filename]
+        signature_cache[filename] = layer_signatures(chart_data['depth'], chart_data['indicators']['自然伽玛'],
+                                                     chart_data['indicators']['密度'], chart_data['coal_layers'],
+                                                     current_config.SEAM_CORRELATION_PARAMS)
+    return signature_cache[filename]
+
+
+@app.route('/seam-correlation', methods=['POST'])
+def seam_correlation():
+    """
+    多井煤层对比：两两对齐各井的煤层并合并为跨井煤层组
+
+    JSON参数：filenames 参与对比的已上传文件（默认全部已上传文件）
+    """
+    params = request.get_json(silent=True) or {}
+    filenames = params.get('filenames') or sorted(data_cache)
+    missing = [filename for filename in filenames if filename not in data_cache]
+    if missing:
+        return jsonify({'error': f'未找到数据，请先上传文件: {", ".join(missing)}'}), 404
+    if len(filenames) < 2:
+        return jsonify({'error': '至少需要两口井的数据'}), 400
+
+    filenames = sorted(set(filenames))
+    wells = {filename: get_layer_signatures(filename) for filename in filenames}
+    pair_matches = {}
+    for i, well_a in enumerate(filenames):
+        for well_b in filenames[i + 1:]:
+            if (well_a, well_b) not in correlation_cache:
+                correlation_cache[(well_a, well_b)] = correlate_well_pair(wells[well_a], wells[well_b],
+                                                                          current_config.SEAM_CORRELATION_PARAMS)
+            pair_matches[(well_a, well_b)] = correlation_cache[(well_a, well_b)]
+
+    groups = build_seam_groups({filename: wells[filename]['starts'].size for filename in filenames}, pair_matches)
+
+    def layer_info(filename, index):
+        layer = data_cache[filename]['coal_layers'][index]
+        return {'filename': filename, 'layer_number': index + 1, **layer}
+
+    return jsonify({
+        'wells': filenames,
+        'pairs': [{'wells': [well_a, well_b],
+                   'matches': [{'layer_a': match['layer_a'] + 1, 'layer_b': match['layer_b'] + 1,
+                                'distance': match['distance']} for match in matches]}
+                  for (well_a, well_b), matches in pair_matches.items()],
+        'seams': [{'seam_id': k + 1, 'members': [layer_info(filename, index) for filename, index in members]}
+                  for k, members in enumerate(groups)]
+    }), 200
+
+
+def get_soil_features(filename):
+    """获取已上传文件非煤层样本的分区特征（按文件缓存），煤层范围取自缓存的煤层深度段"""
+    if filename not in soil_feature_cache:
+        chart_data = data_cache[filename]
+        depth = np.asarray(chart_data['depth'], dtype=float)
+        coal_mask = np.zeros(depth.size, dtype=bool)
+        for layer in chart_data['coal_layers']:
+            coal_mask |= (depth >= layer['start']) & (depth <= layer['end'])
+        soil_feature_cache[filename] = soil_features({'深度': depth, **chart_data['indicators']}, coal_mask)
+    return soil_feature_cache[filename]
+
+
+def get_soil_zone_model(model_id):
+    """按模型标识获取土壤分区模型：先查内存缓存，再读取保存的模型文件"""
+    if model_id not in soil_zone_models:
+        model = load_zone_model(str(current_config.SOIL_ZONE_MODEL_FOLDER), model_id)
+        if model is None:
+            return None
+        soil_zone_models[model_id] = model
+    return soil_zone_models[model_id]
+
+
+@app.route('/soil-zoning', methods=['POST'])
+def soil_zoning():
+    """
+    多井土壤分区：对各井非煤层样本的密度/伽马/电阻率做小批量KMeans聚类，返回分区模型和各井的分区结果
+
+    JSON参数：filenames 参与聚类的已上传文件（默认全部已上传文件），n_zones 分区数。
+    相同的井数据和参数对应同一模型标识，已拟合的模型直接复用。
+    """
+    params = request.get_json(silent=True) or {}
+    filenames = sorted(set(params.get('filenames') or data_cache))
+    missing = [filename for filename in filenames if filename not in data_cache]
+    if missing:
+        return jsonify({'error': f'未找到数据，请先上传文件: {", ".join(missing)}'}), 404
+    if not filenames:
+        return jsonify({'error': '没有已上传的井数据'}), 400
+
+    zoning_params = dict(current_config.SOIL_ZONING_PARAMS)
+    if 'n_zones' in params:
+        zoning_params['n_zones'] = params['n_zones']
+    wells = {filename: get_soil_features(filename) for filename in filenames}
+    features = {filename: well[1] for filename, well in wells.items()}
+    try:
+        model_id = zone_model_id(features, zoning_params)
+        model = get_soil_zone_model(model_id)
+        if model is None:
+            model = fit_soil_zones(features, zoning_params)
+            save_zone_model(model, str(current_config.SOIL_ZONE_MODEL_FOLDER))
+            soil_zone_models[model_id] = model
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'model_id': model['model_id'],
+        'zones': model['zones'],
+        'wells': {filename: summarize_soil_zones(model, depths, assign_soil_zones(model, well_features))
+                  for filename, (depths, well_features) in wells.items()}
+    }), 200
+
+
+@app.route('/soil-zoning/<model_id>/<filename>', methods=['GET'])
+def soil_zone_assignment(model_id, filename):
+    """用已拟合的分区模型判别一口已上传井的土壤分区（不重新拟合）"""
+    model = get_soil_zone_model(model_id)
+    if model is None:
+        return jsonify({'error': '未找到土壤分区模型'}), 404
+    if filename not in data_cache:
+        return jsonify({'error': '未找到数据，请先上传文件'}), 404
+
+    depths, features = get_soil_features(filename)
+    return jsonify({'filename': filename, **summarize_soil_zones(model, depths, assign_soil_zones(model, features))}), 200
+
+
+@app.route('/wells', methods=['GET'])
+def list_wells():
+    """列出已登记的井及其坐标和插值属性"""
+    return jsonify({'wells': sorted(well_summaries.values(), key=lambda summary: summary['filename'])}), 200
+
+
+@app.route('/wells/<filename>/location', methods=['POST'])
+def set_well_location(filename):
+    """登记或修改已上传文件的井位坐标（参数x、y，JSON或表单）"""
+    if filename not in well_summaries:
+        return jsonify({'error': '未找到该井，请先上传文件'}), 404
+    params = request.get_json(silent=True) or request.values
+    try:
+        x, y = float(params['x']), float(params['y'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': '需要有效的x和y坐标'}), 400
+
+    well_summaries[filename].update(x=x, y=y)
+    spatial_cache.clear()
+    return jsonify(well_summaries[filename]), 200
+
+
+@app.route('/wells/nearest', methods=['GET'])
+def nearest_wells():
+    """查询距离(x, y)最近的k口井，或radius范围内的所有井"""
+    x = request.args.get('x', type=float)
+    y = request.args.get('y', type=float)
+    if x is None or y is None:
+        return jsonify({'error': '需要有效的x和y坐标'}), 400
+
+    radius = request.args.get('radius', type=float)
+    index = get_well_index()
+    if radius is not None:
+        wells = index.within(x, y, radius)
+    else:
+        wells = index.nearest(x, y, request.args.get('k', 5, type=int))
+    return jsonify({'x': x, 'y': y, 'wells': wells}), 200
+
+
+@app.route('/resource-grid', methods=['POST'])
+def resource_grid():
+    """
+    用反距离加权把各井的煤层厚度、单位面积资源量和污染评分插值到规则网格，并在网格上积分资源量
+
+    JSON参数：bounds [xmin, ymin, xmax, ymax]（默认井位范围外扩10%）、cell_size 网格边长（默认约200×200个网格）、
+    power 距离幂次、neighbors 参与插值的最近井数、include_surfaces 是否返回网格数据
+    """
+    params = request.get_json(silent=True) or {}
+    wells = [summary for summary in well_summaries.values() if 'x' in summary and 'tons_per_m2' in summary]
+    if len(wells) < 2:
+        return jsonify({'error': '至少需要两口已登记坐标的井'}), 400
+
+    coords = np.array([(well['x'], well['y']) for well in wells])
+    try:
+        if params.get('bounds'):
+            bounds = [float(value) for value in params['bounds']]
+        else:
+            padding = np.maximum(0.1 * (coords.max(axis=0) - coords.min(axis=0)), 1.0)
+            bounds = [*(coords.min(axis=0) - padding), *(coords.max(axis=0) + padding)]
+        cell_size = float(params.get('cell_size') or max(bounds[2] - bounds[0], bounds[3] - bounds[1]) / 200)
+        cells = np.ceil((bounds[2] - bounds[0]) / cell_size) * np.ceil((bounds[3] - bounds[1]) / cell_size)
+        if cells > current_config.RESOURCE_GRID_MAX_CELLS:
+            return jsonify({'error': f'网格数{int(cells)}超过上限{current_config.RESOURCE_GRID_MAX_CELLS}'}), 400
+
+        attributes = {name: [well.get(name, np.nan) for well in wells]
+                      for name in ('thickness', 'tons_per_m2', 'pollution_score')}
+        grid = interpolate_surfaces(coords, attributes, bounds, cell_size,
+                                    power=float(params.get('power', 2.0)), neighbors=int(params.get('neighbors', 12)))
+    except (TypeError, ValueError, IndexError, ZeroDivisionError) as e:
+        return jsonify({'error': f'网格参数错误: {str(e)}'}), 400
+
+    response = {
+        'wells': len(wells),
+        'bounds': [float(value) for value in bounds],
+        'cell_size': cell_size,
+        'shape': [int(grid['y'].size), int(grid['x'].size)],
+        **summarize_resource_grid(grid, cell_size)
+    }
+    if params.get('include_surfaces'):
+        if response['cells'] > current_config.RESOURCE_GRID_MAX_RETURN_CELLS:
+            return jsonify({'error': f'网格数超过可返回的上限{current_config.RESOURCE_GRID_MAX_RETURN_CELLS}'}), 400
+        response['x'] = grid['x'].tolist()
+        response['y'] = grid['y'].tolist()
+        response['surfaces'] = {name: np.where(np.isnan(surface), None, surface).tolist()
+                                for name, surface in grid['surfaces'].items()}
+    return jsonify(response), 200
+
+
 @app.route('/pollution-assessment', methods=['POST'])
 def assess_pollution():
     if 'file' not in request.files:
@@ -153,6 +791,13 @@ def assess_pollution():
 
     location = request.form.get('location', '未知位置')
     notes = request.form.get('notes', '')
+    uncertainty_samples, error = get_uncertainty_samples()
+    if error:
+        return jsonify({'error': error}), 400
+
+    if request.form.get('preview', '').lower() == 'true':
+        preview, error, status = preview_uploaded_file(request.files['file'], ('pollution',))
+        return jsonify({'error': error} if error else preview), status
 
     result, error, status = process_uploaded_file(
         request.files['file'], location=location, notes=notes
@@ -161,8 +806,20 @@ def assess_pollution():
         return jsonify({'error': error}), status
 
         # 评估煤污染
-    pollution_assessment = assess_coal_pollution(result['data'], result['coal_mask'])
+    diffusion_params = None
+    if request.form.get('diffusion_simulation', '').lower() == 'true':
+        diffusion_params = current_config.DIFFUSION_SIMULATION_PARAMS
+    pollution_assessment = assess_coal_pollution(result['data'], result['coal_mask'], diffusion_params=diffusion_params)
     visualization = generate_pollution_visualization(pollution_assessment)
+    pollution_segments[result['filename']] = pollution_assessment['segments']
+    if uncertainty_samples:
+        uncertainty = run_uncertainty(result, uncertainty_samples)
+        pollution_assessment['uncertainty'] = {'samples': uncertainty['samples'],
+                                               'overall_score': uncertainty['overall_score']}
+    index_intervals(result['filename'], coal_layers=result['chart_data']['coal_layers'],
+                    segments=pollution_assessment['segments'])
+    update_well_summary(result['filename'], result['data'], result['coal_mask'],
+                        pollution_score=pollution_assessment['overall_score'])
 
     # 生成结果数据
     assessment_data = {
@@ -171,7 +828,10 @@ def assess_pollution():
         'notes': notes,
         'filename': result['filename'],
         'assessment': pollution_assessment,
-        'visualization': visualization
+        'visualization': visualization,
+        'parameters': assessment_parameters(diffusion_simulation=diffusion_params is not None,
+                                            uncertainty_samples=uncertainty_samples,
+                                            seed=request.values.get('seed', type=int))
     }
 
     # 保存历史记录
@@ -190,6 +850,44 @@ def assess_pollution():
     return jsonify(assessment_data), 200
 
 
+@app.route('/diffusion-simulation/<filename>', methods=['POST'])
+def diffusion_simulation(filename):
+    """
+    按已评估文件的污染分段做二维（深度×水平距离）对流-弥散数值模拟
+
+    JSON参数覆盖DIFFUSION_SIMULATION_PARAMS中的模拟参数（depth_cells、distance_cells、max_distance、time_step、
+    years、dispersivity、vertical_dispersivity、molecular_diffusion、threshold），include_grids 是否返回浓度网格
+    """
+    if filename not in pollution_segments:
+        return jsonify({'error': '未找到污染分段数据，请先进行污染评估'}), 404
+
+    params = request.get_json(silent=True) or {}
+    simulation_params = {**current_config.DIFFUSION_SIMULATION_PARAMS,
+                         **{key: value for key, value in params.items() if key in DEFAULT_DIFFUSION_PARAMS}}
+    include_grids = bool(params.get('include_grids'))
+    try:
+        cells = int(simulation_params.get('depth_cells', DEFAULT_DIFFUSION_PARAMS['depth_cells'])) * \
+            int(simulation_params.get('distance_cells', DEFAULT_DIFFUSION_PARAMS['distance_cells']))
+        if cells > current_config.DIFFUSION_MAX_GRID_CELLS:
+            return jsonify({'error': f'网格数{cells}超过上限{current_config.DIFFUSION_MAX_GRID_CELLS}'}), 400
+        if include_grids and cells * len(simulation_params['years']) > current_config.DIFFUSION_MAX_RETURN_CELLS:
+            return jsonify({'error': f'返回的网格数超过上限{current_config.DIFFUSION_MAX_RETURN_CELLS}'}), 400
+        simulation = simulate_diffusion(pollution_segments[filename], simulation_params, include_grids=include_grids)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'模拟参数错误: {str(e)}'}), 400
+
+    for snapshot in simulation['snapshots']:
+        if 'concentration' in snapshot:
+            snapshot['concentration'] = np.round(snapshot['concentration'], 6).tolist()
+    return jsonify({
+        'filename': filename,
+        'depth': simulation['depth'].tolist(),
+        'distance': simulation['distance'].tolist(),
+        'time_step': simulation['time_step'],
+        'snapshots': simulation['snapshots']
+    }), 200
+
+
 @app.route('/resource-assessment', methods=['POST'])
 def assess_resources():
     if 'file' not in request.files:
@@ -198,6 +896,17 @@ def assess_resources():
     location = request.form.get('location', '未知位置')
     area = float(request.form.get('area', 10000))
     notes = request.form.get('notes', '')
+    annual_capacity = request.form.get('annual_capacity', type=float)
+    schedule_options = {key: request.form.get(key, type=cast)
+                        for key, cast in (('discount_rate', float), ('max_periods', int), ('time_budget', float))
+                        if request.form.get(key)}
+    uncertainty_samples, error = get_uncertainty_samples()
+    if error:
+        return jsonify({'error': error}), 400
+
+    if request.form.get('preview', '').lower() == 'true':
+        preview, error, status = preview_uploaded_file(request.files['file'], ('resources',), area)
+        return jsonify({'error': error} if error else preview), status
 
     result, error, status = process_uploaded_file(
         request.files['file'], location=location, notes=notes, area=area
@@ -207,7 +916,9 @@ def assess_resources():
 
         # 计算资源储量
     resource_data = calculate_coal_resources(result['data'], result['coal_mask'], area)
-    mining_plan = optimize_mining_plan(resource_data["layers"])
+    update_well_summary(result['filename'], thickness=float(resource_data["layers"].thickness.sum()),
+                        tons_per_m2=resource_data["total_resources"] / area)
+    mining_plan = optimize_mining_plan(resource_data["layers"], annual_capacity=annual_capacity, **schedule_options)
 
     # 生成结果数据
     assessment_data = {
@@ -219,10 +930,19 @@ def assess_resources():
         'total_resources': resource_data["total_resources"],
         'total_volume': resource_data["total_volume"],
         'layers_count': len(resource_data["layers"]),
-        'layers': resource_data["layers"],
+        'layers': resource_data["layers"].to_records(),
         'mining_plan': mining_plan["mining_plan"],
-        'priority_chart': mining_plan["priority_chart"]
+        'priority_chart': mining_plan["priority_chart"],
+        'parameters': assessment_parameters(annual_capacity=annual_capacity, **schedule_options,
+                                            uncertainty_samples=uncertainty_samples,
+                                            seed=request.values.get('seed', type=int))
     }
+    if 'schedule' in mining_plan:
+        assessment_data['mining_schedule'] = mining_plan['schedule']
+    if uncertainty_samples:
+        uncertainty = run_uncertainty(result, uncertainty_samples, area)
+        assessment_data['uncertainty'] = {key: uncertainty[key]
+                                          for key in ('samples', 'total_resources', 'total_thickness', 'area')}
 
     # 保存历史记录
     resource_key = save_history(assessment_data, str(current_config.RESOURCE_FOLDER))
@@ -231,21 +951,65 @@ def assess_resources():
     if location not in extraction_history:
         extraction_history[location] = []
 
-    extraction_history[location].append({
+    record = {
         'key': resource_key,
         'timestamp': result['timestamp'],
         'total_resources': resource_data["total_resources"],
         'layers_count': len(resource_data["layers"])
-    })
-
-    # 预测资源趋势（如果有历史数据）
-    if len(extraction_history[location]) >= 2:
-        trend_data = predict_resource_trend(extraction_history[location])
+    }
+    extraction_history[location].append(record)
+    resource_trend_stats[location] = update_trend_stats(resource_trend_stats.get(location), record)
+
+    # 预测资源趋势（如果有历史数据），趋势图仅在请求时生成
+    trend_data = trend_from_stats(resource_trend_stats[location])
+    if trend_data:
+        if request.form.get('trend_chart', '').lower() == 'true':
+            trend_data['trend_chart'] = generate_trend_chart(extraction_history[location], trend_data)
         assessment_data['trend_data'] = trend_data
 
     return jsonify(assessment_data), 200
 
 
+def parse_float_list(value, default):
+    """解析JSON数组或逗号分隔的数值列表"""
+    if not value:
+        return list(default)
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        parsed = value.split(',')
+    if not isinstance(parsed, list):
+        parsed = [parsed]
+    return [float(v) for v in parsed]
+
+
+@app.route('/resource-scenarios', methods=['POST'])
+def resource_scenarios():
+    """对面积、提取率和开采方法因子的参数网格一次性计算储量和预期产量"""
+    if 'file' not in request.files:
+        return jsonify({'error': '没有文件部分'}), 400
+
+    try:
+        areas = parse_float_list(request.form.get('areas'), [10000])
+        extraction_rates = parse_float_list(request.form.get('extraction_rates', request.form.get('base_rates')),
+                                            [0.85])
+        method_factor_sets = json.loads(request.form.get('method_factors', '[{}]'))
+        if isinstance(method_factor_sets, dict):
+            method_factor_sets = [method_factor_sets]
+    except (ValueError, TypeError):
+        return jsonify({'error': '参数格式错误'}), 400
+
+    result, error, status = process_uploaded_file(request.files['file'])
+    if error:
+        return jsonify({'error': error}), status
+
+    resource_data = calculate_coal_resources(result['data'], result['coal_mask'])
+    scenarios = evaluate_mining_scenarios(resource_data, areas, extraction_rates, method_factor_sets)
+    scenarios['filename'] = result['filename']
+
+    return jsonify(scenarios), 200
+
+
 @app.route('/agriculture-assessment', methods=['POST'])
 def agriculture_assessment():
     if 'file' not in request.files:
@@ -256,6 +1020,17 @@ def agriculture_assessment():
     notes = request.form.get('notes', '')
     assessment_type = request.form.get('type', 'both')  # 'reclamation', 'agriculture', 'both'
 
+    # 可选：用已拟合的土壤分区模型判别本井的分区
+    zone_model = None
+    if request.form.get('zone_model'):
+        zone_model = get_soil_zone_model(request.form['zone_model'])
+        if zone_model is None:
+            return jsonify({'error': '未找到土壤分区模型'}), 404
+
+    if request.form.get('preview', '').lower() == 'true':
+        preview, error, status = preview_uploaded_file(request.files['file'], ('soil_quality',), area)
+        return jsonify({'error': error} if error else preview), status
+
     result, error, status = process_uploaded_file(
         request.files['file'], location=location, notes=notes, area=area
     )
@@ -263,7 +1038,7 @@ def agriculture_assessment():
         return jsonify({'error': error}), status
 
         # 评估土壤质量
-    soil_quality = assess_soil_quality(result['data'], result['coal_mask'])
+    soil_quality = assess_soil_quality(result['data'], result['coal_mask'], current_config.SOIL_HORIZON_PARAMS)
 
     # 生成结果
     assessment_data = {
@@ -272,9 +1047,14 @@ def agriculture_assessment():
         'area': float(area),
         'notes': notes,
         'filename': result['filename'],
-        'soil_quality': soil_quality
+        'soil_quality': soil_quality,
+        'parameters': assessment_parameters()
     }
 
+    if zone_model is not None:
+        depths, features = soil_features(result['data'], result['coal_mask'])
+        assessment_data['soil_zones'] = summarize_soil_zones(zone_model, depths, assign_soil_zones(zone_model, features))
+
     # 根据评估类型生成建议
     if assessment_type in ['reclamation', 'both']:
         assessment_data['reclamation_plan'] = generate_reclamation_plan(soil_quality)
@@ -301,6 +1081,175 @@ def agriculture_assessment():
     return jsonify(assessment_data), 200
 
 
+@app.route('/batch-assessment', methods=['POST'])
+def batch_assessment():
+    """批量评估多个钻孔文件（multipart多文件或zip压缩包），按完成顺序以NDJSON流式返回摘要"""
+    filepaths = []
+    for file in request.files.getlist('files'):
+        if file and file.filename and allowed_file(file.filename):
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file.filename))
+            file.save(filepath)
+            filepaths.append(filepath)
+
+    archive = request.files.get('archive')
+    if archive and archive.filename:
+        archive_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(archive.filename))
+        archive.save(archive_path)
+        try:
+            filepaths.extend(extract_archive(archive_path, app.config['UPLOAD_FOLDER']))
+        except zipfile.BadZipFile:
+            return jsonify({'error': '压缩包格式错误'}), 400
+
+    if not filepaths:
+        return jsonify({'error': '没有可处理的文件'}), 400
+
+    coal_rules, error = get_coal_rules()
+    if error:
+        return jsonify({'error': error}), 400
+
+    area = float(request.form.get('area', 10000))
+    notes = request.form.get('notes', '')
+    workers = request.form.get('workers', type=int)
+
+    def generate():
+        results = []
+        for result in iter_batch_assessments(filepaths, max_workers=workers, area=area, notes=notes,
+                                             signal_filters=current_config.SIGNAL_FILTERS,
+                                             curve_aliases=current_config.LAS_CURVE_ALIASES, coal_rules=coal_rules,
+                                             rule_set=request.values.get('rule_set') or 'default',
+                                             horizon_params=current_config.SOIL_HORIZON_PARAMS):
+            results.append(result)
+            yield json.dumps(summarize_batch_result(result), ensure_ascii=False) + '\n'
+
+        # 全部完成后一次性写入历史记录
+        history_keys = record_batch_results(results)
+        yield json.dumps({'done': True, 'files': len(results), 'history_keys': history_keys},
+                         ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def get_telemetry_stream(well_id, rule_set='default'):
+    """获取井的随钻数据流状态，不存在时按给定的煤层判别规则集新建（调用方需持有telemetry_lock）"""
+    if well_id not in telemetry_streams:
+        telemetry_streams[well_id] = TelemetryStream(well_id, segment_size=current_config.POLLUTION_SEGMENT_SIZE,
+                                                     coal_rules=current_config.COAL_DETECTION_RULE_SETS[rule_set],
+                                                     rule_set=rule_set)
+    return telemetry_streams[well_id]
+
+
+def publish_telemetry_events(well_id, events):
+    """把事件推送给该井的所有订阅者，队列已满的慢订阅者会被断开，不阻塞数据接入"""
+    with telemetry_lock:
+        subscribers = list(telemetry_subscribers.get(well_id, []))
+    for subscriber in subscribers:
+        try:
+            for event in events:
+                subscriber.put_nowait(event)
+        except queue.Full:
+            with telemetry_lock:
+                if subscriber in telemetry_subscribers.get(well_id, []):
+                    telemetry_subscribers[well_id].remove(subscriber)
+            subscriber.put(None)
+
+
+@app.route('/telemetry/<well_id>', methods=['POST'])
+def ingest_telemetry(well_id):
+    """
+    接入随钻数据：请求体为NDJSON（可分块传输），每行一个样本对象或一批样本数组，样本按深度递增
+
+    每行处理完立即以NDJSON返回本批的煤层开闭和分段评分事件，并推送给订阅者；
+    final=true时在请求结束后闭合未闭合的煤层。rule_set只在查询参数中读取（不解析请求体），
+    数据流创建后不能更换规则集。格式错误或含非数值的行返回error事件，不影响后续行。
+    """
+    final = request.args.get('final', 'false').lower() == 'true'
+    rule_set = request.args.get('rule_set') or 'default'
+    if rule_set not in current_config.COAL_DETECTION_RULE_SETS:
+        return jsonify({'error': f'未知的煤层判别规则集: {rule_set}'}), 400
+    with telemetry_lock:
+        if well_id in telemetry_streams and telemetry_streams[well_id].rule_set != rule_set:
+            return jsonify({'error': f'该井的随钻数据流已使用规则集{telemetry_streams[well_id].rule_set}，'
+                                     f'不能切换为{rule_set}'}), 400
+
+    # 随钻数据流持续时间长，不受单次上传大小限制（Werkzeug 2.x的get_input_stream不接受该参数，本身也不限制）
+    try:
+        stream = get_input_stream(request.environ, max_content_length=None)
+    except TypeError:
+        stream = get_input_stream(request.environ)
+
+    def generate():
+        for line in stream:
+            try:
+                samples = parse_telemetry_line(line)
+                if samples is None:
+                    continue
+                with telemetry_lock:
+                    events = get_telemetry_stream(well_id, rule_set).ingest(samples)
+            except (ValueError, TypeError) as e:
+                yield json.dumps({'event': 'error', 'error': str(e)}, ensure_ascii=False) + '\n'
+                continue
+            publish_telemetry_events(well_id, events)
+            for event in events:
+                yield json.dumps(event, ensure_ascii=False) + '\n'
+
+        with telemetry_lock:
+            telemetry = get_telemetry_stream(well_id, rule_set)
+            events = telemetry.finish() if final else []
+            done = {'event': 'done', 'samples': telemetry.samples, 'depth': telemetry.last_depth,
+                    'layers': len(telemetry.closed_layers)}
+        publish_telemetry_events(well_id, events + ([done] if final else []))
+        for event in events + [done]:
+            yield json.dumps(event, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/telemetry/<well_id>', methods=['GET'])
+def get_telemetry(well_id):
+    """获取井的随钻数据当前状态"""
+    with telemetry_lock:
+        if well_id not in telemetry_streams:
+            return jsonify({'error': '该井没有随钻数据'}), 404
+        return jsonify(telemetry_streams[well_id].snapshot()), 200
+
+
+@app.route('/telemetry/<well_id>/events', methods=['GET'])
+def telemetry_events(well_id):
+    """
+    以Server-Sent Events订阅井的随钻事件，连接后首先收到snapshot事件
+
+    订阅不创建数据流（规则集由第一次接入数据的请求确定），尚无数据时snapshot为空状态。
+    """
+    subscriber = queue.Queue(maxsize=current_config.TELEMETRY_SUBSCRIBER_QUEUE)
+    with telemetry_lock:
+        stream = telemetry_streams.get(well_id) or TelemetryStream(well_id)
+        snapshot = stream.snapshot()
+        telemetry_subscribers.setdefault(well_id, []).append(subscriber)
+
+    def format_event(name, payload):
+        return f"event: {name}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    def generate():
+        try:
+            yield format_event('snapshot', snapshot)
+            while True:
+                try:
+                    event = subscriber.get(timeout=15)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if event is None:
+                    break
+                yield format_event(event['event'], event)
+        finally:
+            with telemetry_lock:
+                if subscriber in telemetry_subscribers.get(well_id, []):
+                    telemetry_subscribers[well_id].remove(subscriber)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 # 历史记录处理函数
 def get_history(history_dict, location=None):
     """获取历史记录"""
@@ -327,6 +1276,19 @@ def get_resource_history():
     return get_history(extraction_history, request.args.get('location'))
 
 
+@app.route('/resource-trend', methods=['GET'])
+def get_resource_trend():
+    """返回指定位置的储量趋势预测，chart=true时附带趋势图"""
+    location = request.args.get('location', '未知位置')
+    trend_data = trend_from_stats(resource_trend_stats.get(location))
+    if not trend_data:
+        return jsonify({'error': '历史数据不足，无法预测趋势'}), 404
+
+    if request.args.get('chart', '').lower() == 'true':
+        trend_data['trend_chart'] = generate_trend_chart(extraction_history[location], trend_data)
+    return jsonify(trend_data), 200
+
+
 @app.route('/agriculture-history', methods=['GET'])
 def get_agriculture_history():
     return get_history(agriculture_history, request.args.get('location'))
@@ -15,14 +15,22 @@ class Config:
     
     # 文件上传配置
     UPLOAD_FOLDER = BASE_DIR / 'data' / 'uploads'
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
-    ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB（单次请求，分块上传时为单个分块的上限）
+    UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 分块上传建议的分块大小
+    MAX_CHUNKED_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024  # 分块上传的文件大小上限 2GB
+    ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'las'}
+
+    # LAS测井曲线助记符别名（系统列名 -> LAS助记符，按顺序匹配第一个）；
+    # 未配置的列使用las_reader.LAS_CURVE_ALIASES，如{'自然伽玛': ['GR', 'GRC']}只替换该列的别名
+    LAS_CURVE_ALIASES = {}
     
     # 数据存储路径
     HISTORY_FOLDER = BASE_DIR / 'data' / 'history'
     RESOURCE_FOLDER = BASE_DIR / 'data' / 'resource'
     CHARTS_FOLDER = BASE_DIR / 'data' / 'charts'
+    SOIL_ZONE_MODEL_FOLDER = BASE_DIR / 'data' / 'models'
     LOGS_FOLDER = BASE_DIR / 'logs'
+    REPROCESS_MANIFEST = BASE_DIR / 'data' / 'reprocess_manifest.json'  # 离线重算检查点
     
     # 图表配置
     CHART_DPI = 100
@@ -39,7 +47,55 @@ class Config:
         'density_min': 1.0,
         'density_max': 1.8
     }
+    # 可按请求选择的煤层判别规则集（参数rule_set），不同盆地可配置不同阈值，缺省的上下限视为不限
+    COAL_DETECTION_RULE_SETS = {
+        'default': COAL_DETECTION_PARAMS
+    }
     
+    # 识别煤层前的滤波配置：{指标列名: [{'type': 'despike'/'median'/'mean', 'window': 样本数, 'threshold': 阈值}]}
+    # 按顺序依次应用，例如 {'自然伽玛': [{'type': 'despike', 'window': 7, 'threshold': 3.0}]}；为空时不滤波
+    SIGNAL_FILTERS = {}
+
+    # 多井煤层对比参数（未配置的项使用seam_correlation.DEFAULT_CORRELATION_PARAMS）
+    SEAM_CORRELATION_PARAMS = {
+        'max_depth_offset': 50.0,
+        'max_distance': 1.0
+    }
+
+    # 资源平面插值的网格数上限，以及随结果返回网格数据时的上限
+    RESOURCE_GRID_MAX_CELLS = 4000000
+    RESOURCE_GRID_MAX_RETURN_CELLS = 250000
+
+    # 污染物扩散数值模拟参数（未配置的项使用diffusion_simulation.DEFAULT_DIFFUSION_PARAMS），
+    # 以及单次模拟的网格数上限和随结果返回浓度网格时的上限
+    DIFFUSION_SIMULATION_PARAMS = {
+        'max_distance': 100.0,
+        'years': [5, 10, 20]
+    }
+    DIFFUSION_MAX_GRID_CELLS = 1000000
+    DIFFUSION_MAX_RETURN_CELLS = 250000
+
+    # 蒙特卡洛不确定性分析的测量误差模型（未配置的项使用uncertainty.DEFAULT_ERROR_MODELS，
+    # 如{'密度': {'type': 'absolute', 'sigma': 0.03}}；sigma为0时不扰动该项），以及单次请求允许的最大模拟次数
+    UNCERTAINTY_ERROR_MODELS = {}
+    UNCERTAINTY_MAX_SAMPLES = 10000
+
+    # 土壤层位划分：层位厚度(米)、表土深度(米)、全剖面指标中表土样本的权重（1为不加权）
+    SOIL_HORIZON_PARAMS = {
+        'horizon_thickness': 10.0,
+        'topsoil_depth': 10.0,
+        'topsoil_weight': 1.0
+    }
+
+    # 多井土壤分区聚类参数（未配置的项使用soil_zoning.DEFAULT_ZONING_PARAMS）
+    SOIL_ZONING_PARAMS = {
+        'n_zones': 5,
+        'max_samples_per_well': 20000
+    }
+
+    # 阈值敏感性分析单次请求允许的最大参数组合数
+    SENSITIVITY_MAX_COMBINATIONS = 20000
+
     # 污染评估参数
     POLLUTION_SEGMENT_SIZE = 10  # 米
     POLLUTION_THRESHOLDS = {
@@ -49,6 +105,9 @@ class Config:
         'critical': 75
     }
 
+    # 随钻数据订阅者的事件队列长度，积压超过该长度的订阅者会被断开
+    TELEMETRY_SUBSCRIBER_QUEUE = 1000
+
 class DevelopmentConfig(Config):
     """开发环境配置"""
     DEBUG = True
@@ -8,19 +8,89 @@
 - 开发环境: python run.py
 - 生产环境: python run.py --env production
 - 测试环境: python run.py --env testing
+- 批量评估: python run.py batch 文件或目录... [--workers N]
+- 离线重算: python run.py reprocess [--workers N] [--force]
 """
 
 import argparse
+import json
 import sys
 import os
+import time
 from pathlib import Path
 
 # 添加项目根目录到Python路径
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-from app import app
+from app import app, record_batch_results
 from config.settings import config
+from src.core.batch_processing import iter_batch_assessments, summarize_batch_result
+from src.core.reprocessing import iter_reprocess_uploads
+from src.core.utils import allowed_file
+
+
+def collect_data_files(paths):
+    """展开命令行给出的文件和目录，返回允许类型的数据文件列表"""
+    filepaths = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            filepaths.extend(str(p) for p in sorted(path.iterdir()) if p.is_file() and allowed_file(p.name))
+        elif path.is_file() and allowed_file(path.name):
+            filepaths.append(str(path))
+    return filepaths
+
+
+def run_batch(args):
+    """批量评估钻孔文件，按完成顺序输出每个文件的摘要（每行一个JSON）"""
+    filepaths = collect_data_files(args.paths)
+    if not filepaths:
+        print("❌ 没有找到可处理的数据文件")
+        sys.exit(1)
+
+    current_config = config[args.env]()
+    if args.rule_set not in current_config.COAL_DETECTION_RULE_SETS:
+        print(f"❌ 未知的煤层判别规则集: {args.rule_set}")
+        sys.exit(1)
+
+    started = time.time()
+    results = []
+    for result in iter_batch_assessments(filepaths, max_workers=args.workers, area=args.area, notes=args.notes,
+                                         signal_filters=current_config.SIGNAL_FILTERS,
+                                         curve_aliases=current_config.LAS_CURVE_ALIASES,
+                                         rule_set=args.rule_set,
+                                         coal_rules=current_config.COAL_DETECTION_RULE_SETS[args.rule_set],
+                                         horizon_params=current_config.SOIL_HORIZON_PARAMS):
+        results.append(result)
+        print(json.dumps(summarize_batch_result(result), ensure_ascii=False), flush=True)
+
+    # 全部完成后一次性写入历史记录
+    record_batch_results(results)
+    failed = sum(1 for r in results if 'error' in r)
+    print(f"✅ 批量评估完成: {len(results) - failed} 成功, {failed} 失败, 用时 {time.time() - started:.1f} 秒",
+          file=sys.stderr)
+
+
+def run_reprocess(args):
+    """按当前参数重算data/uploads中的文件并原子替换对应的历史评估记录"""
+    current_config = config[args.env]()
+
+    started = time.time()
+    counts = {'reprocessed': 0, 'skipped': 0, 'failed': 0}
+    total_bytes = 0
+    for status in iter_reprocess_uploads(str(current_config.UPLOAD_FOLDER), str(current_config.HISTORY_FOLDER),
+                                         str(current_config.RESOURCE_FOLDER), current_config,
+                                         str(current_config.REPROCESS_MANIFEST),
+                                         max_workers=args.workers, force=args.force):
+        counts[status['status']] += 1
+        total_bytes += status['bytes']
+        print(json.dumps(status, ensure_ascii=False), flush=True)
+
+    elapsed = max(time.time() - started, 1e-9)
+    print(f"✅ 重算完成: {counts['reprocessed']} 重算, {counts['skipped']} 跳过, {counts['failed']} 失败, "
+          f"用时 {elapsed:.1f} 秒, 吞吐量 {counts['reprocessed'] / elapsed:.2f} 文件/秒, "
+          f"{total_bytes / elapsed / 1024 / 1024:.2f} MB/秒", file=sys.stderr)
+
 
 def main():
     """主函数"""
@@ -39,8 +109,27 @@ def main():
     parser.add_argument('--debug', 
                        action='store_true',
                        help='启用调试模式')
+
+    subparsers = parser.add_subparsers(dest='command')
+    batch_parser = subparsers.add_parser('batch', help='并行批量评估多个钻孔文件')
+    batch_parser.add_argument('paths', nargs='+', help='数据文件或包含数据文件的目录')
+    batch_parser.add_argument('--workers', type=int, default=None, help='进程数 (默认: CPU核数)')
+    batch_parser.add_argument('--area', type=float, default=10000, help='煤层面积，平方米 (默认: 10000)')
+    batch_parser.add_argument('--notes', default='', help='备注')
+    batch_parser.add_argument('--rule-set', default='default', help='煤层判别规则集 (默认: default)')
+
+    reprocess_parser = subparsers.add_parser('reprocess', help='按当前参数离线重算已上传文件的评估记录')
+    reprocess_parser.add_argument('--workers', type=int, default=None, help='进程数 (默认: CPU核数)')
+    reprocess_parser.add_argument('--force', action='store_true', help='忽略检查点，重算所有文件')
     
     args = parser.parse_args()
+
+    if args.command == 'batch':
+        run_batch(args)
+        return
+    if args.command == 'reprocess':
+        run_reprocess(args)
+        return
     
     # 设置环境变量
     os.environ['FLASK_ENV'] = args.env
@@ -5,14 +5,44 @@
 
 包含以下子模块：
 - coal_analysis: 煤层分析
+- signal_filters: 测井曲线滑动窗口滤波
 - pollution_assessment: 污染评估
+- diffusion_simulation: 污染物二维对流-弥散数值模拟
+- layer_table: 煤层列式数据表
 - resource_assessment: 资源评估
+- uncertainty: 污染评分与资源量的蒙特卡洛不确定性分析
+- preview: 快速预览评估（只计算评分和汇总指标，不生成图表）
 - agriculture: 农业利用
+- batch_processing: 多井批量评估
+- reprocessing: 上传文件离线重算
+- upload_stream: 上传文件流式解析
+- chunked_upload: 分块续传上传
+- telemetry: 随钻数据增量煤层识别
+- depth_stats: 深度区间统计金字塔
+- interval_index: 煤层与污染分段深度区间索引
+- seam_correlation: 多井煤层对比
+- soil_zoning: 多井土壤分区聚类
+- spatial_analysis: 钻孔空间索引与平面插值
 - utils: 工具函数
 """
 
+from .signal_filters import *
 from .coal_analysis import *
+from .diffusion_simulation import *
 from .pollution_assessment import *
+from .layer_table import *
 from .resource_assessment import *
+from .uncertainty import *
+from .preview import *
 from .agriculture import *
+from .batch_processing import *
+from .reprocessing import *
+from .upload_stream import *
+from .chunked_upload import *
+from .telemetry import *
+from .depth_stats import *
+from .interval_index import *
+from .seam_correlation import *
+from .soil_zoning import *
+from .spatial_analysis import *
 from .utils import *
@@ -2,14 +2,18 @@
 
 import random
 import numpy as np
-from sklearn.cluster import KMeans
 
 
-def classify_soil_type(soil_data):
-    """根据物理特性将土壤分类"""
-    avg_density = soil_data['密度'].mean()
-    avg_gamma = soil_data['自然伽玛'].mean()
+# 默认土壤层位划分参数
+DEFAULT_SOIL_HORIZON_PARAMS = {
+    'horizon_thickness': 10.0,  # 每个层位的厚度(米)，从测井顶部起算
+    'topsoil_depth': 10.0,      # 表土深度(米)，顶部起算落在该深度内的层位视为表土
+    'topsoil_weight': 1.0       # 计算全剖面指标时表土样本的权重（其余样本为1），为1时即所有土壤样本的均值
+}
 
+
+def soil_type_from_properties(avg_density, avg_gamma):
+    """根据平均密度和伽马值将土壤分类"""
     # 基于密度和伽马值的简单分类
     if avg_density < 1.3:
         if avg_gamma < 50:
@@ -30,10 +34,13 @@ def classify_soil_type(soil_data):
             return "粘土"
 
 
-def assess_soil_pollution(soil_data, coal_mask):
-    """评估土壤污染程度"""
-    avg_gamma = soil_data['自然伽玛'].mean()
+def classify_soil_type(soil_data):
+    """根据物理特性将土壤分类"""
+    return soil_type_from_properties(soil_data['密度'].mean(), soil_data['自然伽玛'].mean())
 
+
+def soil_pollution_from_gamma(avg_gamma):
+    """根据平均伽马值评估土壤污染程度"""
     # 基于伽马值的简单污染评估
     if avg_gamma < 45:
         pollution = {
@@ -57,59 +64,135 @@ def assess_soil_pollution(soil_data, coal_mask):
     return pollution
 
 
-def assess_soil_quality(data, coal_mask):
-    """评估土壤质量，分析煤含量和其他指标"""
-    # 获取非煤层数据，作为土壤层
-    soil_data = data[~coal_mask].copy()
+def assess_soil_pollution(soil_data, coal_mask):
+    """评估土壤污染程度"""
+    return soil_pollution_from_gamma(soil_data['自然伽玛'].mean())
+
 
-    if soil_data.empty:
-        return {"error": "没有足够的土壤数据"}
+def estimate_soil_properties(avg_density, avg_gamma, resistivity):
+    """
+    由平均密度、伽马值和电阻率估算pH、有机质、煤含量、水分和肥力
 
-        # 计算关键指标
-    avg_density = soil_data['密度'].mean()
-    avg_gamma = soil_data['自然伽玛'].mean()
-    resistivity = soil_data['双侧向电阻率'].mean()
+    参数可以是标量或数组（逐元素计算，用于各层位）；某项均值缺失(NaN)时按阈值边界取值。
+    """
+    avg_density = np.asarray(avg_density, dtype=float)
+    avg_gamma = np.asarray(avg_gamma, dtype=float)
+    resistivity = np.asarray(resistivity, dtype=float)
 
     # 估算土壤pH值 (基于伽马值和电阻率的模拟)
-    estimated_ph = 7.0 - (avg_gamma - 50) / 20
-    estimated_ph = max(4.0, min(9.0, estimated_ph))
+    estimated_ph = np.fmax(4.0, np.fmin(9.0, 7.0 - (avg_gamma - 50) / 20))
 
     # 估算有机质含量 (基于密度的模拟)
-    organic_matter = max(0, 5.0 - (avg_density - 1.2) * 10)
+    organic_matter = np.fmax(0, 5.0 - (avg_density - 1.2) * 10)
 
     # 估算煤含量 (基于伽马值的模拟)
-    coal_content = max(0, min(30, (avg_gamma - 40) / 2))
+    coal_content = np.fmax(0, np.fmin(30, (avg_gamma - 40) / 2))
 
     # 估算水分含量 (基于电阻率的模拟)
-    moisture = max(5, min(40, 1000 / resistivity))
+    with np.errstate(divide='ignore'):
+        moisture = np.fmax(5, np.fmin(40, 1000 / resistivity))
 
     # 估算土壤肥力 (基于有机质和pH的综合评分)
-    fertility_score = 0
-    if 6.0 <= estimated_ph <= 7.5:
-        ph_factor = 1.0
-    else:
-        ph_factor = 1.0 - abs(estimated_ph - 6.75) / 3
-
+    ph_factor = np.where((estimated_ph >= 6.0) & (estimated_ph <= 7.5), 1.0, 1.0 - np.abs(estimated_ph - 6.75) / 3)
     fertility_score = (organic_matter * 0.6 + ph_factor * 40) * (1 - coal_content / 100)
-    fertility_score = max(0, min(100, fertility_score))
+    fertility_score = np.fmax(0, np.fmin(100, fertility_score))
+
+    return {
+        "ph_value": estimated_ph,
+        "organic_matter": organic_matter,
+        "coal_content": coal_content,
+        "moisture": moisture,
+        "fertility_score": fertility_score
+    }
+
+
+def _rounded(value, digits):
+    """四舍五入为Python浮点数，缺失值为None"""
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
 
-    # 土壤类型分类
-    soil_type = classify_soil_type(soil_data)
 
-    # 土壤污染评估
-    pollution_level = assess_soil_pollution(soil_data, coal_mask)
+def assess_soil_quality(data, coal_mask, horizon_params=None):
+    """
+    评估土壤质量，分析煤含量和其他指标
+
+    非煤样本按深度划分为等厚层位，各层位的密度、伽马值、电阻率均值用bincount分组归约一次求得，
+    逐层位估算土壤指标；全剖面指标由各层位的和与样本数加权合成，表土层位的权重为topsoil_weight。
+
+    Args:
+        data: 处理后的钻孔数据
+        coal_mask: 煤层样本掩码
+        horizon_params: 覆盖DEFAULT_SOIL_HORIZON_PARAMS的层位参数
+
+    Returns:
+        全剖面的土壤指标，以及'horizons'（各层位的顶底深度、样本数、指标和是否为表土）
+    """
+    params = {**DEFAULT_SOIL_HORIZON_PARAMS, **(horizon_params or {})}
+    thickness = float(params['horizon_thickness'])
+    if thickness <= 0:
+        raise ValueError('土壤层位厚度必须为正数')
+
+    # 非煤层样本作为土壤层
+    soil = ~np.asarray(coal_mask, dtype=bool)
+    if not soil.any():
+        return {"error": "没有足够的土壤数据"}
+
+    # 按深度划分层位，只对非煤样本分组
+    depth = data['深度'].to_numpy(dtype=float)
+    top = np.nanmin(depth)
+    horizon_index = ((depth[soil] - top) // thickness).astype(int)
+    count = int(horizon_index.max()) + 1
+    samples = np.bincount(horizon_index, minlength=count)
+
+    sums, counts = {}, {}
+    for column in ('密度', '自然伽玛', '双侧向电阻率'):
+        values = data[column].to_numpy(dtype=float)[soil]
+        valid = ~np.isnan(values)
+        sums[column] = np.bincount(horizon_index[valid], weights=values[valid], minlength=count)
+        counts[column] = np.bincount(horizon_index[valid], minlength=count)
+
+    # 全剖面均值：表土层位的和与样本数乘以权重
+    topsoil = np.arange(count) * thickness < float(params['topsoil_depth'])
+    weights = np.where(topsoil, float(params['topsoil_weight']), 1.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        horizon_means = {column: sums[column] / counts[column] for column in sums}
+        overall = {column: (weights * sums[column]).sum() / (weights * counts[column]).sum() for column in sums}
+
+    # 计算关键指标
+    avg_density, avg_gamma, resistivity = overall['密度'], overall['自然伽玛'], overall['双侧向电阻率']
+    properties = estimate_soil_properties(avg_density, avg_gamma, resistivity)
+    horizon_properties = estimate_soil_properties(horizon_means['密度'], horizon_means['自然伽玛'],
+                                                  horizon_means['双侧向电阻率'])
+
+    horizons = [{
+        "top": float(top + i * thickness),
+        "bottom": float(top + (i + 1) * thickness),
+        "samples": int(samples[i]),
+        "topsoil": bool(topsoil[i]),
+        "ph_value": _rounded(horizon_properties["ph_value"][i], 1),
+        "organic_matter": _rounded(horizon_properties["organic_matter"][i], 1),
+        "coal_content": _rounded(horizon_properties["coal_content"][i], 1),
+        "moisture": _rounded(horizon_properties["moisture"][i], 1),
+        "fertility_score": _rounded(horizon_properties["fertility_score"][i], 1),
+        "soil_type": soil_type_from_properties(horizon_means['密度'][i], horizon_means['自然伽玛'][i]),
+        "density": _rounded(horizon_means['密度'][i], 2),
+        "gamma": _rounded(horizon_means['自然伽玛'][i], 2),
+        "resistivity": _rounded(horizon_means['双侧向电阻率'][i], 2)
+    } for i in np.flatnonzero(samples)]
 
     return {
-        "ph_value": round(float(estimated_ph), 1),
-        "organic_matter": round(float(organic_matter), 1),
-        "coal_content": round(float(coal_content), 1),
-        "moisture": round(float(moisture), 1),
-        "fertility_score": round(float(fertility_score), 1),
-        "soil_type": soil_type,
-        "pollution_level": pollution_level,
+        "ph_value": round(float(properties["ph_value"]), 1),
+        "organic_matter": round(float(properties["organic_matter"]), 1),
+        "coal_content": round(float(properties["coal_content"]), 1),
+        "moisture": round(float(properties["moisture"]), 1),
+        "fertility_score": round(float(properties["fertility_score"]), 1),
+        "soil_type": soil_type_from_properties(avg_density, avg_gamma),
+        "pollution_level": soil_pollution_from_gamma(avg_gamma),
         "density": round(float(avg_density), 2),
         "gamma": round(float(avg_gamma), 2),
-        "resistivity": round(float(resistivity), 2)
+        "resistivity": round(float(resistivity), 2),
+        "topsoil_weight": float(params['topsoil_weight']),
+        "horizons": horizons
     }
 
 
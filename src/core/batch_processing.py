@@ -0,0 +1,148 @@
+# batch_processing.py - 多井批量评估功能
+import os
+import shutil
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from utils import allowed_file
+from coal_analysis import process_data_file
+from pollution_assessment import assess_coal_pollution, generate_pollution_visualization
+from resource_assessment import calculate_coal_resources, optimize_mining_plan
+from agriculture import assess_soil_quality, generate_reclamation_plan, recommend_agriculture
+
+
+def assess_well_file(filepath: str, location: Optional[str] = None, area: float = 10000,
+                     notes: str = '', include_charts: bool = False,
+                     signal_filters: Optional[Dict] = None, coal_rules: Optional[Dict] = None,
+                     horizon_params: Optional[Dict] = None, curve_aliases: Optional[Dict] = None,
+                     rule_set: str = 'default') -> Dict:
+    """
+    对单个钻孔文件运行数据处理和污染、资源、农业三项评估
+
+    Args:
+        filepath: 钻孔数据文件路径
+        location: 位置名称，默认使用文件名（不含扩展名）
+        area: 煤层面积(平方米)
+        notes: 备注
+        include_charts: 是否生成图表（批量处理时默认不生成）
+        signal_filters: 识别煤层前的滤波配置
+        coal_rules: 煤层判别阈值，默认使用DEFAULT_COAL_RULES
+        horizon_params: 土壤层位参数，默认使用DEFAULT_SOIL_HORIZON_PARAMS
+        curve_aliases: LAS测井曲线别名表
+        rule_set: coal_rules对应的规则集名称，记录在评估记录的parameters中供离线重算使用
+
+    Returns:
+        包含pollution/resource/agriculture三条记录的字典，格式与对应单文件接口的返回一致；
+        处理失败时返回包含error的字典
+    """
+    filename = os.path.basename(filepath)
+    location = location or os.path.splitext(filename)[0]
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    base = {'timestamp': timestamp, 'location': location, 'notes': notes, 'filename': filename}
+    parameters = {'rule_set': rule_set}
+
+    try:
+        data, coal_mask, coal_data, chart_data = process_data_file(filepath, curve_aliases, signal_filters, coal_rules)
+
+        pollution_assessment = assess_coal_pollution(data, coal_mask, include_charts=include_charts)
+        resource_data = calculate_coal_resources(data, coal_mask, area)
+        mining_plan = optimize_mining_plan(resource_data["layers"], include_chart=include_charts)
+        soil_quality = assess_soil_quality(data, coal_mask, horizon_params)
+    except Exception as e:
+        return {**base, 'error': f'处理文件时出错: {str(e)}'}
+
+    return {
+        **base,
+        'pollution': {
+            **base,
+            'assessment': pollution_assessment,
+            'visualization': generate_pollution_visualization(pollution_assessment) if include_charts else '',
+            'parameters': parameters
+        },
+        'resource': {
+            **base,
+            'area': float(area),
+            'total_resources': resource_data["total_resources"],
+            'total_volume': resource_data["total_volume"],
+            'layers_count': len(resource_data["layers"]),
+            'layers': resource_data["layers"].to_records(),
+            'mining_plan': mining_plan["mining_plan"],
+            'priority_chart': mining_plan["priority_chart"],
+            'parameters': parameters
+        },
+        'agriculture': {
+            **base,
+            'area': float(area),
+            'soil_quality': soil_quality,
+            'reclamation_plan': generate_reclamation_plan(soil_quality),
+            'agriculture_recommendation': recommend_agriculture(soil_quality),
+            'parameters': parameters
+        }
+    }
+
+
+def iter_batch_assessments(filepaths: List[str], max_workers: Optional[int] = None, **options) -> Iterator[Dict]:
+    """
+    在进程池中并行评估多个钻孔文件，按完成顺序逐个返回结果
+
+    Args:
+        filepaths: 钻孔数据文件路径列表
+        max_workers: 进程数，默认等于可用CPU核数
+        options: 传给assess_well_file的参数（area、notes、include_charts、signal_filters、coal_rules、horizon_params等）
+
+    Yields:
+        每个文件的评估结果
+    """
+    if not filepaths:
+        return
+    max_workers = min(max_workers or os.cpu_count() or 1, len(filepaths))
+
+    if max_workers == 1:
+        for filepath in filepaths:
+            yield assess_well_file(filepath, **options)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(assess_well_file, filepath, **options) for filepath in filepaths]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def extract_archive(archive_path: str, target_folder: str) -> List[str]:
+    """
+    解压zip压缩包中允许类型的数据文件（忽略目录结构），返回解压后的文件路径列表
+    """
+    filepaths = []
+    with zipfile.ZipFile(archive_path) as archive:
+        for member in archive.infolist():
+            filename = os.path.basename(member.filename)
+            if member.is_dir() or not filename or not allowed_file(filename):
+                continue
+            filepath = os.path.join(target_folder, filename)
+            with archive.open(member) as source, open(filepath, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            filepaths.append(filepath)
+    return filepaths
+
+
+def summarize_batch_result(result: Dict) -> Dict:
+    """提取批量评估结果的摘要，用于逐条流式返回"""
+    if 'error' in result:
+        return {'filename': result['filename'], 'location': result['location'], 'error': result['error']}
+
+    pollution = result['pollution']['assessment']
+    resource = result['resource']
+    soil_quality = result['agriculture']['soil_quality']
+    return {
+        'filename': result['filename'],
+        'location': result['location'],
+        'timestamp': result['timestamp'],
+        'overall_score': pollution['overall_score'],
+        'pollution_grade': pollution['pollution_grade'],
+        'total_resources': resource['total_resources'],
+        'layers_count': resource['layers_count'],
+        'soil_type': soil_quality.get('soil_type'),
+        'fertility_score': soil_quality.get('fertility_score')
+    }
@@ -0,0 +1,184 @@
+# chunked_upload.py - 分块续传上传功能
+import hashlib
+import io
+import json
+import os
+import threading
+import uuid
+
+import pandas as pd
+
+from utils import file_content_hash
+
+
+class ChunkedUploadError(ValueError):
+    """分块上传协议错误（偏移量不连续、大小或校验和不符等）"""
+
+
+class ChunkedUploadSession:
+    """
+    一次分块续传上传
+
+    分块按偏移量顺序写入 <upload_id>.part，进度保存在 <upload_id>.json 中，
+    服务重启后客户端可以查询已接收的字节数并从该偏移量继续上传。
+    CSV文件在分块到达时即按完整行增量解析，完成上传时只需解析最后不完整的一行；
+    某个分块解析失败时放弃增量结果，完成上传时由调用方重新读取整个文件。
+    写入分块和完成上传持有会话锁，同一会话的并发请求按顺序处理。
+    """
+
+    def __init__(self, folder, upload_id, filename, total_size, checksum=None, received=0):
+        self.folder = folder
+        self.upload_id = upload_id
+        self.filename = filename
+        self.total_size = int(total_size)
+        self.checksum = checksum.lower() if checksum else None
+        self.received = int(received)
+
+        # 内存中的增量状态，重启后丢失时在完成上传时回退为整体计算
+        self.digest = hashlib.sha256() if self.received == 0 else None
+        self.incremental = filename.lower().endswith('.csv') and self.received == 0
+        self.columns = None
+        self.pending = b''
+        self.frames = []
+        self.lock = threading.Lock()
+
+    @property
+    def part_path(self):
+        return os.path.join(self.folder, f"{self.upload_id}.part")
+
+    @property
+    def meta_path(self):
+        return os.path.join(self.folder, f"{self.upload_id}.json")
+
+    @classmethod
+    def create(cls, folder, filename, total_size, checksum=None, max_size=None):
+        """创建上传会话并预分配分块文件"""
+        if int(total_size) < 0 or (max_size and int(total_size) > max_size):
+            raise ChunkedUploadError('文件大小超出限制')
+        session = cls(folder, uuid.uuid4().hex, filename, total_size, checksum)
+        open(session.part_path, 'wb').close()
+        session._save_meta()
+        return session
+
+    @classmethod
+    def load(cls, folder, upload_id):
+        """从进度文件恢复上传会话，不存在时返回None"""
+        meta_path = os.path.join(folder, f"{upload_id}.json")
+        if not upload_id.isalnum() or not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        return cls(folder, upload_id, meta['filename'], meta['total_size'], meta.get('checksum'), meta['received'])
+
+    def _save_meta(self):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'filename': self.filename, 'total_size': self.total_size,
+                       'checksum': self.checksum, 'received': self.received}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def status(self):
+        return {
+            'upload_id': self.upload_id,
+            'filename': self.filename,
+            'total_size': self.total_size,
+            'received': self.received,
+            'complete': self.received >= self.total_size
+        }
+
+    def write_chunk(self, offset, chunk):
+        """
+        写入从offset开始的分块
+
+        重传已接收的部分会被忽略，只追加新数据；offset超过已接收字节数时抛出ChunkedUploadError。
+        """
+        with self.lock:
+            return self._write_chunk(offset, chunk)
+
+    def _write_chunk(self, offset, chunk):
+        if offset > self.received:
+            raise ChunkedUploadError(f'分块不连续，请从偏移量{self.received}继续上传')
+        if offset + len(chunk) > self.total_size:
+            raise ChunkedUploadError('分块超出文件大小')
+
+        new_data = chunk[self.received - offset:]
+        if not new_data:
+            return self.received
+
+        with open(self.part_path, 'r+b') as f:
+            f.seek(self.received)
+            f.write(new_data)
+        self.received += len(new_data)
+        self._save_meta()
+
+        if self.digest is not None:
+            self.digest.update(new_data)
+        if self.incremental:
+            self._parse_lines(new_data)
+        return self.received
+
+    def _parse_lines(self, new_data, final=False):
+        """解析缓冲区中所有完整的CSV行，不完整的末行留到下一个分块；解析失败时停止增量解析"""
+        try:
+            self._parse_complete_lines(new_data, final)
+        except (ValueError, TypeError):
+            self.incremental = False
+            self.columns = None
+            self.pending = b''
+            self.frames = []
+
+    def _parse_complete_lines(self, new_data, final):
+        buffer = self.pending + new_data
+        cut = len(buffer) if final else buffer.rfind(b'\n') + 1
+        complete, self.pending = buffer[:cut], buffer[cut:]
+
+        if self.columns is None:
+            header_end = complete.find(b'\n')
+            if header_end == -1 and not final:
+                self.pending = complete + self.pending
+                return
+            header = complete if header_end == -1 else complete[:header_end + 1]
+            self.columns = pd.read_csv(io.BytesIO(header), nrows=0).columns.tolist()
+            complete = complete[len(header):]
+
+        if complete.strip():
+            self.frames.append(pd.read_csv(io.BytesIO(complete), header=None, names=self.columns))
+
+    def finalize(self, target_path):
+        """
+        校验大小和校验和，把分块文件移动到target_path
+
+        Returns:
+            (CSV增量解析得到的DataFrame, 内容哈希)；非CSV、增量状态已丢失或增量解析失败时DataFrame为None，
+            由调用方读取文件
+        """
+        with self.lock:
+            return self._finalize(target_path)
+
+    def _finalize(self, target_path):
+        if not os.path.exists(self.part_path):
+            raise ChunkedUploadError('上传会话已完成或已取消')
+        if self.received != self.total_size:
+            raise ChunkedUploadError(f'文件未上传完整：已接收{self.received}/{self.total_size}字节')
+
+        content_hash = self.digest.hexdigest() if self.digest is not None else file_content_hash(self.part_path)
+        if self.checksum and content_hash != self.checksum:
+            self.discard()
+            raise ChunkedUploadError('校验和不匹配，请重新上传')
+
+        data = None
+        if self.incremental:
+            self._parse_lines(b'', final=True)
+            if self.columns is not None:
+                data = (pd.concat(self.frames, ignore_index=True) if self.frames
+                        else pd.DataFrame(columns=self.columns))
+
+        os.replace(self.part_path, target_path)
+        os.remove(self.meta_path)
+        return data, content_hash
+
+    def discard(self):
+        """删除分块文件和进度文件"""
+        for path in (self.part_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
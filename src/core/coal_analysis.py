@@ -1,52 +1,444 @@
 # coal_analysis.py - 煤层分析相关功能
+import os
+from collections import OrderedDict
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
+from las_reader import read_las
+from signal_filters import apply_signal_filters
+from utils import file_content_hash
+
+# 数据文件必须包含的列，以及评估时会用到的可选列
+REQUIRED_COLUMNS = ['深度', '深侧向', '浅侧向', '声波时差', '自然伽玛', '密度']
+OPTIONAL_COLUMNS = ['pH值', '电阻率']
+
+# 优先使用更快的calamine引擎读取Excel（pandas 2.2起支持），未安装或pandas版本较低时使用pandas默认引擎
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine' if tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2) else None
+except (ImportError, ValueError):
+    EXCEL_ENGINE = None
+
+# 煤层判别规则的参数名前缀与对应的数据列
+COAL_RULE_COLUMNS = {
+    'resistivity': '双侧向电阻率',
+    'sonic': '声波时差',
+    'gamma': '自然伽玛',
+    'density': '密度'
+}
+
+# 默认煤层判别阈值（与config中的COAL_DETECTION_PARAMS一致）
+DEFAULT_COAL_RULES = {
+    'resistivity_min': 50,
+    'resistivity_max': 2000,
+    'sonic_min': 300,
+    'sonic_max': 600,
+    'gamma_min': 20,
+    'gamma_max': 80,
+    'density_min': 1.0,
+    'density_max': 1.8
+}
+
+# Excel转换缓存文件后缀（与原文件同目录）
+EXCEL_CACHE_SUFFIX = '.cache.npz'
+
+# 相邻样本深度差超过采样间隔的该倍数时视为数据缺失段
+GAP_FACTOR = 4
+# 煤层合并间隔的下限(米)：相邻煤样本深度差大于max(MIN_LAYER_GAP, GAP_FACTOR × 采样间隔)时视为新煤层
+MIN_LAYER_GAP = 1.0
+# 深度规整化结果的进程内缓存（按文件内容哈希），保留最近使用的若干个文件
+REGULARIZED_CACHE_SIZE = 8
+_regularized_cache = OrderedDict()
+
+
+@lru_cache(maxsize=32)
+def _compile_rules(rule_items):
+    """把阈值参数编译为((列名, 下限, 上限), ...)，上下限都不限的指标不参与判别"""
+    params = dict(rule_items)
+    allowed = {f'{key}_{bound}' for key in COAL_RULE_COLUMNS for bound in ('min', 'max')}
+    unknown = [key for key in params if key not in allowed]
+    if unknown:
+        raise ValueError(f'未知的煤层判别参数: {", ".join(unknown)}')
+
+    bounds = []
+    for key, column in COAL_RULE_COLUMNS.items():
+        lower = params.get(f'{key}_min', -np.inf)
+        upper = params.get(f'{key}_max', np.inf)
+        if np.isinf(lower) and np.isinf(upper):
+            continue
+        bounds.append((column, float(lower), float(upper)))
+    return tuple(bounds)
+
+
+def compile_coal_rules(rules=None):
+    """
+    编译煤层判别规则
+
+    rules为{'resistivity_min', 'resistivity_max', 'sonic_min', ...}形式的阈值字典（缺省的上下限视为不限），
+    默认使用DEFAULT_COAL_RULES；相同的规则只编译一次。
+    """
+    rules = DEFAULT_COAL_RULES if rules is None else rules
+    return _compile_rules(tuple(sorted(rules.items())))
+
+
+def classify_coal_arrays(columns, shape, rules=None):
+    """
+    按阈值规则批量判别煤样本
+
+    columns为{列名: 数组}（或DataFrame），数组形状均为shape，例如(模拟次数, 深度点数)的二维数组。
+    所有条件在预分配的两个布尔数组上原地比较和累积，不产生逐条件的临时数组。
+    """
+    coal = np.ones(shape, dtype=bool)
+    condition = np.empty(shape, dtype=bool)
+    for column, lower, upper in compile_coal_rules(rules):
+        values = np.asarray(columns[column], dtype=float)
+        np.greater_equal(values, lower, out=condition)
+        coal &= condition
+        np.less_equal(values, upper, out=condition)
+        coal &= condition
+    return coal
+
+
+def classify_coal_layer(data, rules=None):
+    """根据物理参数识别煤层（rules为阈值字典，见compile_coal_rules）"""
+    return pd.Series(classify_coal_arrays(data, len(data), rules), index=data.index)
+
+
+def layer_merge_gap(sampling_interval=None):
+    """煤层合并间隔(米)：随采样间隔放宽，稀疏采样的连续煤样本不会被拆成零厚度的煤层"""
+    if not sampling_interval:
+        return MIN_LAYER_GAP
+    return max(MIN_LAYER_GAP, GAP_FACTOR * float(sampling_interval))
+
+
+def coal_layer_gaps(data, max_gap=None, gaps=None):
+    """
+    煤层划分参数(合并间隔, 数据缺失段)，未给出的项按data.attrs中regularize_depth记录的采样间隔和缺失段确定
+
+    相邻煤样本深度差大于合并间隔，或之间有数据缺失段（缺失段不计入煤层厚度）时视为不同煤层。
+    """
+    attrs = getattr(data, 'attrs', None) or {}
+    if max_gap is None:
+        max_gap = layer_merge_gap(attrs.get('sampling_interval'))
+    if gaps is None:
+        gaps = attrs.get('gaps') or []
+    return float(max_gap), [(float(start), float(end)) for start, end in gaps]
+
+
+def gap_ranks(depths, gaps):
+    """每个深度之前的数据缺失段个数，两个样本的值不同说明二者之间有缺失段"""
+    gap_starts = np.sort(np.asarray([start for start, _ in gaps], dtype=float))
+    return np.searchsorted(gap_starts, np.asarray(depths, dtype=float), side='left')
+
+
+def coal_layer_breaks(coal_depths, max_gap, gaps=()):
+    """按深度排序的煤样本之间是否断开为不同煤层（长度比煤样本数少1的布尔数组）"""
+    coal_depths = np.asarray(coal_depths, dtype=float)
+    breaks = np.diff(coal_depths) > max_gap
+    if gaps:
+        breaks |= np.diff(gap_ranks(coal_depths, gaps)) > 0
+    return breaks
+
+
+def coal_layer_boundaries(coal, depths, max_gap=MIN_LAYER_GAP, gaps=()):
+    """
+    在二维煤样本掩码(批次, 样本)上标出每个煤层的首末样本（划分规则与get_coal_depth_ranges一致）
+
+    用前缀最大/后缀最小定位每个煤样本前后最近的煤样本，相邻煤样本深度差大于max_gap
+    或之间有数据缺失段（gaps）时视为新煤层。
+
+    Returns:
+        (starts, ends)两个与coal同形状的布尔数组
+    """
+    rows, size = coal.shape
+    positions = np.arange(size)
+    # 每个位置之前/之后最近的煤样本位置（没有时为-1/size）
+    previous = np.maximum.accumulate(np.where(coal, positions, -1), axis=1)
+    previous = np.concatenate((np.full((rows, 1), -1), previous[:, :-1]), axis=1)
+    following = np.minimum.accumulate(np.where(coal, positions, size)[:, ::-1], axis=1)[:, ::-1]
+    following = np.concatenate((following[:, 1:], np.full((rows, 1), size)), axis=1)
+
+    padded = np.concatenate((depths, [np.nan]))
+    split_before = depths - padded[previous] > max_gap
+    split_after = padded[following] - depths > max_gap
+    if gaps:
+        ranks = np.append(gap_ranks(depths, gaps), -1)
+        split_before |= ranks[previous] != ranks[:-1]
+        split_after |= ranks[following] != ranks[:-1]
+    starts = coal & ((previous < 0) | split_before)
+    ends = coal & ((following >= size) | split_after)
+    return starts, ends
+
+
+def coal_threshold_sensitivity(data, grid, rules=None, max_gap=None, chunk_size=256, gaps=None):
+    """
+    在阈值参数网格上批量评估煤层识别结果
+
+    网格中未出现的阈值保持rules（默认DEFAULT_COAL_RULES）的取值。先用各网格参数最宽松的取值
+    筛出候选样本，所有组合的煤样本都是候选样本的子集；再把组合分块，在(组合, 候选样本)二维布尔矩阵上
+    用广播比较得到每个组合的煤层掩码，再由coal_layer_boundaries一次得到所有组合的煤层起止点。
+
+    Args:
+        data: 钻孔数据（需包含判别用的列）
+        grid: {阈值参数名: 取值列表}，参数名形如gamma_max、density_min
+        rules: 基础阈值
+        max_gap: 相邻煤样本深度差大于该值时视为新煤层，gaps为数据缺失段，未给出时见coal_layer_gaps
+
+    Returns:
+        {'parameters': 参数名列表, 'values': {参数名: 取值列表},
+         'total_thickness': 多维列表（各维依次对应parameters）, 'layer_count': 同形状的多维列表}
+    """
+    names = list(grid)
+    axes = [np.asarray(grid[name], dtype=float).ravel() for name in names]
+    max_gap, gaps = coal_layer_gaps(data, max_gap, gaps)
+    rules = dict(DEFAULT_COAL_RULES if rules is None else rules)
+    compile_coal_rules({name: 0 for name in names})  # 校验参数名
+    if not names or any(axis.size == 0 for axis in axes):
+        raise ValueError('阈值网格不能为空')
+
+    # 候选样本：网格参数取最宽松的值
+    loosest = {name: (axis.min() if name.endswith('_min') else axis.max()) for name, axis in zip(names, axes)}
+    candidates = classify_coal_layer(data, {**rules, **loosest}).to_numpy()
+    depths = data['深度'].to_numpy(dtype=float)[candidates]
+    columns = [data[COAL_RULE_COLUMNS[name.rsplit('_', 1)[0]]].to_numpy(dtype=float)[candidates] for name in names]
+
+    combos = np.stack([mesh.ravel() for mesh in np.meshgrid(*axes, indexing='ij')], axis=1)
+    thickness = np.zeros(len(combos))
+    counts = np.zeros(len(combos), dtype=np.int64)
+
+    for first in range(0, len(combos), chunk_size):
+        block = combos[first:first + chunk_size]
+        coal = np.ones((len(block), depths.size), dtype=bool)
+        for k, (name, values) in enumerate(zip(names, columns)):
+            if name.endswith('_min'):
+                coal &= values[None, :] >= block[:, k, None]
+            else:
+                coal &= values[None, :] <= block[:, k, None]
+
+        starts, ends = coal_layer_boundaries(coal, depths, max_gap, gaps)
+        thickness[first:first + len(block)] = (np.where(ends, depths, 0.0).sum(axis=1)
+                                               - np.where(starts, depths, 0.0).sum(axis=1))
+        counts[first:first + len(block)] = starts.sum(axis=1)
+
+    shape = tuple(axis.size for axis in axes)
+    return {
+        'parameters': names,
+        'values': {name: axis.tolist() for name, axis in zip(names, axes)},
+        'total_thickness': thickness.reshape(shape).tolist(),
+        'layer_count': counts.reshape(shape).tolist()
+    }
+
+
+def label_coal_layers(data, coal_mask, max_gap=None, gaps=None):
+    """
+    为每个样本分配煤层编号（从0开始，非煤样本为-1）
+
+    相邻煤样本深度差大于max_gap或之间有数据缺失段时视为新煤层，未给出的参数见coal_layer_gaps
+    """
+    max_gap, gaps = coal_layer_gaps(data, max_gap, gaps)
+    mask = np.asarray(coal_mask, dtype=bool)
+    labels = np.full(len(mask), -1, dtype=np.int64)
+    coal_depths = data['深度'].to_numpy()[mask]
+    if coal_depths.size:
+        labels[mask] = np.concatenate(([0], np.cumsum(coal_layer_breaks(coal_depths, max_gap, gaps))))
+    return labels
+
+
+def get_coal_depth_ranges(data, coal_mask, max_gap=None, gaps=None):
+    """计算煤层的深度范围（划分规则同label_coal_layers）"""
+    max_gap, gaps = coal_layer_gaps(data, max_gap, gaps)
+    coal_depths = data['深度'].to_numpy()[np.asarray(coal_mask, dtype=bool)]
+    if coal_depths.size == 0:
+        return []
+    breaks = np.flatnonzero(coal_layer_breaks(coal_depths, max_gap, gaps))
+    starts = coal_depths[np.concatenate(([0], breaks + 1))]
+    ends = coal_depths[np.concatenate((breaks, [coal_depths.size - 1]))]
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def summarize_coal_layers(data, labels):
+    """
+    一次分组归约计算所有煤层的统计量（只统计煤样本）
+
+    返回包含start/end/count/density/gamma数组的字典，第i个元素对应编号为i的煤层
+    """
+    coal = labels >= 0
+    layer_ids = labels[coal]
+    depths = data['深度'].to_numpy()[coal]
+    if layer_ids.size == 0:
+        empty = np.empty(0, dtype=float)
+        return {'start': empty, 'end': empty, 'count': np.empty(0, dtype=np.int64),
+                'density': empty, 'gamma': empty}
+
+    # 煤样本的编号单调不减，每个煤层是一段连续区间
+    boundaries = np.flatnonzero(np.diff(layer_ids))
+    first = np.concatenate(([0], boundaries + 1))
+    last = np.concatenate((boundaries, [layer_ids.size - 1]))
+    n_layers = first.size
+
+    stats = {'start': depths[first], 'end': depths[last], 'count': last - first + 1}
+    for key, column in (('density', '密度'), ('gamma', '自然伽玛')):
+        values = data[column].to_numpy(dtype=float)[coal]
+        valid = ~np.isnan(values)
+        sums = np.bincount(layer_ids, weights=np.where(valid, values, 0.0), minlength=n_layers)
+        counts = np.bincount(layer_ids, weights=valid, minlength=n_layers)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats[key] = sums / counts
+    return stats
+
+
+def detect_sampling_interval(depth):
+    """按相邻深度差的中位数估计采样间隔（米）"""
+    steps = np.diff(np.asarray(depth, dtype=float))
+    steps = steps[steps > 0]
+    if steps.size == 0:
+        return None
+    return float(np.round(np.median(steps), 6))
+
+
+def regularize_depth(data, step=None, gap_factor=GAP_FACTOR):
+    """
+    将测井数据按深度排序并重采样到等间隔深度网格
+
+    数值列用np.interp线性插值，其他列取最近样本；相邻样本深度差超过gap_factor倍采样间隔的区段
+    视为数据缺失，缺失段内不生成网格点。已是等间隔且无缺失的数据原样返回。
+
+    Returns:
+        规整后的DataFrame，attrs中记录sampling_interval和gaps（[(起始深度, 结束深度)]）
+    """
+    depth = data['深度'].to_numpy(dtype=float)
+    if not np.all(np.diff(depth) > 0):
+        order = np.argsort(depth, kind='stable')
+        data = data.iloc[order].drop_duplicates(subset='深度').reset_index(drop=True)
+        depth = data['深度'].to_numpy(dtype=float)
+
+    step = step or detect_sampling_interval(depth)
+    if step is None:
+        data.attrs.update(sampling_interval=None, gaps=[])
+        return data
+
+    diffs = np.diff(depth)
+    gap_index = np.flatnonzero(diffs > gap_factor * step)
+    gaps = [(float(depth[i]), float(depth[i + 1])) for i in gap_index]
+    if np.allclose(diffs, step, rtol=1e-3, atol=1e-6):
+        data.attrs.update(sampling_interval=step, gaps=gaps)
+        return data
+
+    # 每个连续区段单独生成网格，缺失段内不插值
+    run_starts = np.concatenate(([0], gap_index + 1))
+    run_ends = np.concatenate((gap_index, [depth.size - 1]))
+    grid = np.concatenate([depth[first] + step * np.arange(int(np.floor((depth[last] - depth[first]) / step + 1e-9)) + 1)
+                           for first, last in zip(run_starts, run_ends)])
+    grid = np.round(grid, 6)
+
+    regular = {}
+    nearest = None
+    for column in data.columns:
+        if column == '深度':
+            regular[column] = grid
+        elif pd.api.types.is_numeric_dtype(data[column]):
+            regular[column] = np.interp(grid, depth, data[column].to_numpy(dtype=float))
+        else:
+            if nearest is None:
+                right = np.clip(np.searchsorted(depth, grid), 1, depth.size - 1)
+                nearest = np.where(grid - depth[right - 1] <= depth[right] - grid, right - 1, right)
+            regular[column] = data[column].to_numpy()[nearest]
+
+    result = pd.DataFrame(regular, columns=data.columns)
+    result.attrs.update(sampling_interval=step, gaps=gaps)
+    return result
+
+
+def read_excel_columns(filepath):
+    """只读取必要列和可选列，并固定为浮点类型"""
+    usecols = lambda column: column in REQUIRED_COLUMNS or column in OPTIONAL_COLUMNS
+    try:
+        return pd.read_excel(filepath, usecols=usecols, dtype=float, engine=EXCEL_ENGINE)
+    except ValueError:
+        # 存在非数值内容（或calamine引擎无法读取）时用默认引擎按原样读取，由后续的列检查给出错误信息
+        return pd.read_excel(filepath, engine=None)
+
+
+def read_excel_cached(filepath):
+    """
+    读取Excel文件，首次读取后转换为同目录下的二进制列式缓存文件
+
+    缓存中记录了原文件的内容哈希，文件被覆盖后会自动重新转换。
+    """
+    cache_path = filepath + EXCEL_CACHE_SUFFIX
+    source_hash = file_content_hash(filepath)
+
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path, allow_pickle=False) as cache:
+                if str(cache['source_hash']) == source_hash:
+                    return pd.DataFrame(cache['values'], columns=cache['columns'].tolist())
+        except (OSError, ValueError, KeyError):
+            pass
+
+    data = read_excel_columns(filepath)
+    try:
+        values = data.to_numpy(dtype=float)
+    except (TypeError, ValueError):
+        return data
+
+    tmp_path = f"{cache_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, source_hash=np.array(source_hash), columns=np.array([str(c) for c in data.columns]),
+                 values=values)
+    os.replace(tmp_path, cache_path)
+    return data
+
+
+def read_data_file(filepath, curve_aliases=None):
+    """根据文件类型读取钻孔数据（xlsx/xls/csv/las）"""
+    if filepath.lower().endswith(('xlsx', 'xls')):
+        return read_excel_cached(filepath)
+    if filepath.lower().endswith('las'):
+        return read_las(filepath, curve_aliases)
+    return pd.read_csv(filepath)  # 假设是CSV
+
+
+def read_regularized_file(filepath, curve_aliases=None, signal_filters=None):
+    """读取数据文件并做深度规整化和滤波，同一内容的文件以相同参数重复读取时直接使用缓存"""
+    cache_key = (file_content_hash(filepath), repr(curve_aliases), repr(signal_filters))
+    if cache_key in _regularized_cache:
+        _regularized_cache.move_to_end(cache_key)
+    else:
+        data = regularize_depth(read_data_file(filepath, curve_aliases))
+        _regularized_cache[cache_key] = apply_signal_filters(data, signal_filters)
+        while len(_regularized_cache) > REGULARIZED_CACHE_SIZE:
+            _regularized_cache.popitem(last=False)
+    # 返回副本，调用方添加的列不会写回缓存
+    return _regularized_cache[cache_key].copy()
+
+
+def process_data_file(filepath, curve_aliases=None, signal_filters=None, coal_rules=None):
+    """
+    处理上传的数据文件，返回处理后的数据和煤层信息
+
+    curve_aliases为LAS曲线别名表，signal_filters为识别煤层前的滤波配置（见apply_signal_filters），
+    coal_rules为煤层判别阈值（见compile_coal_rules）
+    """
+    # 根据文件类型读取数据（规整化和滤波结果带缓存）
+    return process_data_frame(read_regularized_file(filepath, curve_aliases, signal_filters), coal_rules=coal_rules)
+
 
+def process_data_frame(data, signal_filters=None, coal_rules=None):
+    """处理已读取的钻孔数据，返回处理后的数据和煤层信息（signal_filters为滤波配置，coal_rules为煤层判别阈值）"""
+    # 检查必要的列
+    if not all(col in data.columns for col in REQUIRED_COLUMNS):
+        raise ValueError(f'文件中缺少必要的列。请确保文件包含以下列：{", ".join(REQUIRED_COLUMNS)}')
 
-def classify_coal_layer(data):
-    """根据物理参数识别煤层"""
-    coal_conditions = (
-            (data['双侧向电阻率'] >= 50) & (data['双侧向电阻率'] <= 2000) &
-            (data['声波时差'] >= 300) & (data['声波时差'] <= 600) &
-            (data['自然伽玛'] >= 20) & (data['自然伽玛'] <= 80) &
-            (data['密度'] >= 1.0) & (data['密度'] <= 1.8))
-    return coal_conditions
-
-
-def get_coal_depth_ranges(data, coal_mask):
-    """计算煤层的深度范围"""
-    coal_depths = data.loc[coal_mask, '深度']
-    depth_ranges = []
-    if not coal_depths.empty:
-        current_start = coal_depths.iloc[0]
-        current_end = coal_depths.iloc[0]
-        for depth in coal_depths.iloc[1:]:
-            if depth - current_end > 1:
-                depth_ranges.append((current_start, current_end))
-                current_start = depth
-            current_end = depth
-        depth_ranges.append((current_start, current_end))
-    return depth_ranges
-
-
-def process_data_file(filepath):
-    """处理上传的数据文件，返回处理后的数据和煤层信息"""
-    # 根据文件类型读取数据
-    if filepath.endswith(('xlsx', 'xls')):
-        data = pd.read_excel(filepath)
-    else:  # 假设是CSV
-        data = pd.read_csv(filepath)
-
-        # 检查必要的列
-    required_columns = ['深度', '深侧向', '浅侧向', '声波时差', '自然伽玛', '密度']
-    if not all(col in data.columns for col in required_columns):
-        raise ValueError(f'文件中缺少必要的列。请确保文件包含以下列：{", ".join(required_columns)}')
+    # 深度规整化（已规整的数据直接返回）并滤波
+    data = apply_signal_filters(regularize_depth(data), signal_filters)
 
         # 计算双侧向电阻率
     data['双侧向电阻率'] = 0.7 * data['深侧向'] + 0.3 * data['浅侧向']
 
     # 识别煤层
-    coal_mask = classify_coal_layer(data)
+    coal_mask = classify_coal_layer(data, coal_rules)
     coal_data = data.loc[coal_mask, ['深度', '声波时差', '自然伽玛', '双侧向电阻率', '密度']]
 
     # 获取煤层深度范围
@@ -65,7 +457,9 @@ def process_data_file(filepath):
         'coal_layers': formatted_ranges,
         'total_thickness': float(total_thickness),
         'min_depth': float(data['深度'].min()),
-        'max_depth': float(data['深度'].max())
+        'max_depth': float(data['深度'].max()),
+        'sampling_interval': data.attrs.get('sampling_interval'),
+        'gaps': [{'start': start, 'end': end} for start, end in data.attrs.get('gaps', [])]
     }
 
     return data, coal_mask, coal_data, chart_data
\ No newline at end of file
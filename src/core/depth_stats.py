@@ -0,0 +1,103 @@
+# depth_stats.py - 深度区间统计金字塔
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class DepthStatsPyramid:
+    """
+    按深度排序的多分辨率统计金字塔
+
+    第k层把样本按2^k个一块对齐分块，每块保存各指标的有效样本数、和、平方和、最小值、最大值；
+    任意深度区间可分解为O(log n)个对齐块，合并这些块即可得到均值、标准差和极值，无需读取原始样本。
+    NaN不计入统计。
+    """
+
+    def __init__(self, depth, indicators: Dict[str, list]):
+        depth = np.asarray(depth, dtype=float)
+        order = np.argsort(depth, kind='stable')
+        self.depth = depth[order]
+        self.names = list(indicators)
+
+        values = np.array([np.asarray(indicators[name], dtype=float)[order] for name in self.names],
+                          dtype=float).reshape(len(self.names), -1)
+        valid = ~np.isnan(values)
+        level = {
+            'count': valid.astype(np.int64),
+            'sum': np.where(valid, values, 0.0),
+            'sumsq': np.where(valid, values * values, 0.0),
+            'min': np.where(valid, values, np.inf),
+            'max': np.where(valid, values, -np.inf)
+        }
+        self.levels = [level]
+        while level['count'].shape[1] > 1:
+            level = self._merge_pairs(level)
+            self.levels.append(level)
+
+    @staticmethod
+    def _merge_pairs(level):
+        """两两合并相邻块得到上一层，块数为奇数时末尾补空块"""
+        if level['count'].shape[1] % 2:
+            padding = {'count': 0, 'sum': 0.0, 'sumsq': 0.0, 'min': np.inf, 'max': -np.inf}
+            level = {key: np.concatenate((array, np.full((array.shape[0], 1), padding[key], dtype=array.dtype)),
+                                         axis=1)
+                     for key, array in level.items()}
+        merged = {key: level[key][:, 0::2] + level[key][:, 1::2] for key in ('count', 'sum', 'sumsq')}
+        merged['min'] = np.minimum(level['min'][:, 0::2], level['min'][:, 1::2])
+        merged['max'] = np.maximum(level['max'][:, 0::2], level['max'][:, 1::2])
+        return merged
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None) -> Dict:
+        """
+        统计深度区间[start, end]内各指标的均值、标准差、最小值和最大值
+
+        Returns:
+            {'start', 'end', 'samples', 'indicators': {指标: {count, mean, std, min, max}}}
+        """
+        lo = 0 if start is None else int(np.searchsorted(self.depth, start, side='left'))
+        hi = self.depth.size if end is None else int(np.searchsorted(self.depth, end, side='right'))
+
+        n = len(self.names)
+        count = np.zeros(n, dtype=np.int64)
+        total = np.zeros(n)
+        total_sq = np.zeros(n)
+        minimum = np.full(n, np.inf)
+        maximum = np.full(n, -np.inf)
+
+        samples = max(0, hi - lo)
+        level_index = 0
+        while lo < hi:
+            level = self.levels[level_index]
+            blocks = []
+            if lo & 1:
+                blocks.append(lo)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                blocks.append(hi)
+            for block in blocks:
+                count += level['count'][:, block]
+                total += level['sum'][:, block]
+                total_sq += level['sumsq'][:, block]
+                minimum = np.minimum(minimum, level['min'][:, block])
+                maximum = np.maximum(maximum, level['max'][:, block])
+            lo >>= 1
+            hi >>= 1
+            level_index += 1
+
+        indicators = {}
+        for i, name in enumerate(self.names):
+            if count[i] == 0:
+                indicators[name] = {'count': 0, 'mean': None, 'std': None, 'min': None, 'max': None}
+                continue
+            mean = total[i] / count[i]
+            variance = max(0.0, total_sq[i] / count[i] - mean * mean)
+            indicators[name] = {
+                'count': int(count[i]),
+                'mean': float(mean),
+                'std': float(np.sqrt(variance)),
+                'min': float(minimum[i]),
+                'max': float(maximum[i])
+            }
+
+        return {'start': start, 'end': end, 'samples': samples, 'indicators': indicators}
@@ -0,0 +1,177 @@
+# diffusion_simulation.py - 污染物二维对流-弥散数值模拟
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# 默认模拟参数
+DEFAULT_DIFFUSION_PARAMS = {
+    'depth_cells': 200,               # 深度方向网格数
+    'distance_cells': 200,            # 水平方向网格数
+    'max_distance': 100.0,            # 模拟的最大水平距离(米)
+    'time_step': 0.5,                 # 时间步长(年)
+    'years': [5, 10, 20],             # 输出浓度快照的年份
+    'dispersivity': 1.0,              # 水平弥散度(米)，水平弥散系数 = 弥散度 × 水平扩散速度 + 分子扩散系数
+    'vertical_dispersivity': 0.5,     # 垂向弥散度(米)
+    'molecular_diffusion': 0.03,      # 分子扩散系数(平方米/年)
+    'threshold': 0.05                 # 统计影响范围的相对浓度阈值
+}
+
+
+def estimate_spreading_speeds(coal_percentage, density, resistivity):
+    """
+    按煤层占比、密度和电阻率估计扩散风险与扩散速度
+
+    Returns:
+        (水平风险, 垂直风险, 水平扩散速度(米/年), 垂直扩散速度(米/年))，可以是标量或逐元素数组
+    """
+    coal_percentage = np.asarray(coal_percentage, dtype=float)
+    horizontal_risk = np.minimum(10, coal_percentage * 10 * (100 / np.maximum(10, resistivity)))
+    vertical_risk = np.minimum(10, coal_percentage * 10 * (2.0 - np.minimum(2.0, density)))
+    horizontal_speed = np.maximum(0.1, horizontal_risk * 0.2)   # 0.1-2.0 米/年
+    vertical_speed = np.maximum(0.05, vertical_risk * 0.1)      # 0.05-1.0 米/年
+    return horizontal_risk, vertical_risk, horizontal_speed, vertical_speed
+
+
+def _factor_tridiagonal(lower, diag, upper):
+    """
+    沿第0维分解一批三对角方程组（Thomas算法的消元部分），返回回代所需的系数
+
+    系数的第0维是方程序号，其余维度是相互独立的方程组（可广播）；lower[0]和upper[-1]不使用。
+    """
+    inverse = np.empty(np.broadcast(lower, diag, upper).shape)
+    scaled_upper = np.empty_like(inverse)
+    inverse[0] = 1.0 / diag[0]
+    scaled_upper[0] = upper[0] * inverse[0]
+    for i in range(1, inverse.shape[0]):
+        inverse[i] = 1.0 / (diag[i] - lower[i] * scaled_upper[i - 1])
+        scaled_upper[i] = upper[i] * inverse[i]
+    return np.broadcast_to(lower, inverse.shape), inverse, scaled_upper
+
+
+def _solve_tridiagonal(factors, rhs) -> np.ndarray:
+    """用_factor_tridiagonal的结果沿第0维求解，每一步是对整批方程组的一次向量运算"""
+    lower, inverse, scaled_upper = factors
+    result = np.empty_like(rhs)
+    result[0] = rhs[0] * inverse[0]
+    for i in range(1, rhs.shape[0]):
+        np.multiply(lower[i], result[i - 1], out=result[i])
+        np.subtract(rhs[i], result[i], out=result[i])
+        result[i] *= inverse[i]
+    for i in range(rhs.shape[0] - 2, -1, -1):
+        result[i] -= scaled_upper[i] * result[i + 1]
+    return result
+
+
+def _row_parameters(segments: List[Dict], depths: np.ndarray):
+    """把污染分段的参数映射到各深度网格行，返回(源浓度, 水平扩散速度, 垂直扩散速度)"""
+    starts = np.array([segment['start_depth'] for segment in segments], dtype=float)
+    order = np.argsort(starts, kind='stable')
+    starts = starts[order]
+    segments = [segments[i] for i in order]
+
+    coal_percentage = np.array([segment['coal_percentage'] for segment in segments], dtype=float)
+    density = np.array([segment['physical_params']['density'] for segment in segments], dtype=float)
+    resistivity = np.array([segment['physical_params']['resistivity'] for segment in segments], dtype=float)
+    source = np.array([segment['pollution_level'] for segment in segments], dtype=float) / 10
+    _, _, horizontal_speed, vertical_speed = estimate_spreading_speeds(coal_percentage, density, resistivity)
+
+    rows = np.clip(np.searchsorted(starts, depths, side='right') - 1, 0, len(segments) - 1)
+    return source[rows], horizontal_speed[rows], vertical_speed[rows]
+
+
+def simulate_diffusion(segments: List[Dict], params: Optional[Dict] = None,
+                       include_grids: bool = False) -> Dict:
+    """
+    在深度×水平距离剖面上模拟污染物的对流-弥散
+
+    井筒所在的左边界(距离0)上，有污染的深度段为定浓度源（相对浓度 = 污染指数/10），其余边界为零通量，
+    右边界允许流出。污染物以各深度段估计的水平扩散速度向外迁移，同时沿水平和垂向弥散。
+    时间上用隐式交替方向分裂（先水平后垂向，各为一批互不耦合的三对角方程），无条件稳定；
+    两个方向的方程组在模拟开始时各消元一次，每个时间步只做向量化回代。
+
+    Args:
+        segments: assess_coal_pollution返回的污染分段
+        params: 覆盖DEFAULT_DIFFUSION_PARAMS的参数
+        include_grids: 是否在快照中返回浓度网格（形状(深度网格数, 水平网格数)）
+
+    Returns:
+        {'depth', 'distance', 'time_step', 'snapshots': [{'year', 'max_concentration', 'horizontal_extent',
+         'vertical_extent', 'affected_area', 'total_mass', 'concentration'(可选)}]}
+    """
+    params = {**DEFAULT_DIFFUSION_PARAMS, **(params or {})}
+    if not segments:
+        raise ValueError('没有污染分段数据')
+    nz, nx = int(params['depth_cells']), int(params['distance_cells'])
+    years = sorted({float(year) for year in params['years']})
+    if nz < 2 or nx < 2 or not years or years[0] <= 0 or params['time_step'] <= 0 or params['max_distance'] <= 0:
+        raise ValueError('模拟网格、时间步长或输出年份无效')
+
+    depth_min = min(segment['start_depth'] for segment in segments)
+    depth_max = max(segment['end_depth'] for segment in segments)
+    dz = (depth_max - depth_min) / nz
+    dx = float(params['max_distance']) / nx
+    if dz <= 0:
+        raise ValueError('污染分段的深度范围无效')
+    depths = depth_min + dz * (np.arange(nz) + 0.5)
+    distances = dx * (np.arange(nx) + 0.5)
+
+    source, velocity, vertical_speed = _row_parameters(segments, depths)
+    diffusivity = params['dispersivity'] * velocity + params['molecular_diffusion']
+    vertical_diffusivity = params['vertical_dispersivity'] * vertical_speed + params['molecular_diffusion']
+
+    steps = int(np.ceil(years[-1] / params['time_step']))
+    dt = years[-1] / steps
+    snapshot_steps = {max(1, int(round(year / dt))): year for year in years}
+
+    # 水平方向（方程沿距离排列，每个深度行一组）：弥散 + 迎风格式对流
+    diffusion_x = np.broadcast_to(dt * diffusivity / dx ** 2, (nx, nz))
+    advection_x = np.broadcast_to(dt * velocity / dx, (nx, nz))
+    lower = -(diffusion_x + advection_x)
+    upper = -diffusion_x.copy()
+    diag = 1 + 2 * diffusion_x + advection_x
+    diag[[0, -1]] -= diffusion_x[[0, -1]]                        # 左边界无流入，右边界自由流出
+    sources = source > 0
+    diag[0, sources] = 1.0                                       # 污染源为定浓度边界
+    upper[0, sources] = 0.0
+    horizontal = _factor_tridiagonal(lower, diag, upper)
+
+    # 垂向（方程沿深度排列，各水平位置系数相同）：界面弥散系数取相邻网格的平均值，顶底零通量
+    face = dt * (vertical_diffusivity[1:] + vertical_diffusivity[:-1]) / 2 / dz ** 2
+    lower_z = np.concatenate(([0.0], -face))[:, None]
+    upper_z = np.concatenate((-face, [0.0]))[:, None]
+    vertical = _factor_tridiagonal(lower_z, 1 - lower_z - upper_z, upper_z)
+
+    threshold = float(params['threshold'])
+    cell_area = dx * dz
+    concentration = np.zeros((nz, nx))
+    concentration[sources, 0] = source[sources]
+    snapshots = []
+    for step in range(1, steps + 1):
+        concentration = _solve_tridiagonal(horizontal, np.ascontiguousarray(concentration.T)).T
+        concentration = _solve_tridiagonal(vertical, np.ascontiguousarray(concentration))
+        concentration[sources, 0] = source[sources]
+
+        if step in snapshot_steps:
+            affected = concentration >= threshold
+            affected_rows = np.flatnonzero(affected.any(axis=1))
+            affected_columns = np.flatnonzero(affected.any(axis=0))
+            snapshot = {
+                'year': snapshot_steps[step],
+                'max_concentration': float(concentration.max()),
+                'horizontal_extent': float(distances[affected_columns[-1]] + dx / 2) if affected_columns.size else 0.0,
+                'vertical_extent': ({'start': float(depths[affected_rows[0]] - dz / 2),
+                                     'end': float(depths[affected_rows[-1]] + dz / 2)}
+                                    if affected_rows.size else None),
+                'affected_area': float(affected.sum() * cell_area),
+                'total_mass': float(concentration.sum() * cell_area)
+            }
+            if include_grids:
+                snapshot['concentration'] = concentration.copy()
+            snapshots.append(snapshot)
+
+    return {
+        'depth': depths,
+        'distance': distances,
+        'time_step': float(dt),
+        'snapshots': snapshots
+    }
@@ -0,0 +1,93 @@
+# interval_index.py - 深度区间索引（煤层、污染分段查询）
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class IntervalIndex:
+    """
+    多个文件的深度区间索引
+
+    区间按(文件名, 类型)分组登记，同一组重新登记时整体替换；查询前按起始深度排序一次，
+    并保存结束深度的前缀最大值。查询[a, b]时用二分查找确定候选范围：
+    起始深度<=b的区间是排序数组的前缀，前缀最大结束深度>=a的位置是另一个二分边界，
+    只需在两个边界之间按结束深度做一次向量化过滤。区间为闭区间。
+    """
+
+    def __init__(self):
+        self.groups = {}
+        self.lock = threading.Lock()
+        self._built = None
+
+    def add(self, source: str, kind: str, starts, ends, records: List[Dict]) -> None:
+        """登记一组区间，records为与区间一一对应的返回内容"""
+        starts = np.asarray(starts, dtype=float)
+        ends = np.asarray(ends, dtype=float)
+        if not (starts.size == ends.size == len(records)):
+            raise ValueError('区间起止深度与记录数量不一致')
+        with self.lock:
+            self.groups[(source, kind)] = (starts, ends, list(records))
+            self._built = None
+
+    def remove(self, source: str, kind: Optional[str] = None) -> None:
+        """删除某个文件（某类型）的全部区间"""
+        with self.lock:
+            for key in [key for key in self.groups if key[0] == source and kind in (None, key[1])]:
+                del self.groups[key]
+            self._built = None
+
+    def _build(self):
+        """合并所有分组并按起始深度排序（登记变化后的首次查询时执行）"""
+        keys = list(self.groups)
+        if not keys:
+            empty = np.empty(0)
+            return {'keys': keys, 'records': [], 'starts': empty, 'ends': empty, 'max_ends': empty,
+                    'group': np.empty(0, dtype=np.int64), 'position': np.empty(0, dtype=np.int64)}
+
+        starts = np.concatenate([self.groups[key][0] for key in keys])
+        ends = np.concatenate([self.groups[key][1] for key in keys])
+        group = np.repeat(np.arange(len(keys)), [self.groups[key][0].size for key in keys])
+        position = np.concatenate([np.arange(self.groups[key][0].size) for key in keys])
+
+        order = np.argsort(starts, kind='stable')
+        return {
+            'keys': keys,
+            'records': [self.groups[key][2] for key in keys],
+            'starts': starts[order],
+            'ends': ends[order],
+            'max_ends': np.maximum.accumulate(ends[order]),
+            'group': group[order],
+            'position': position[order]
+        }
+
+    def overlap(self, start: float, end: float, kind: Optional[str] = None,
+                source: Optional[str] = None) -> List[Dict]:
+        """返回与[start, end]相交的区间记录（按起始深度排序），可按类型和文件名过滤"""
+        with self.lock:
+            if self._built is None:
+                self._built = self._build()
+            built = self._built
+
+        upper = int(np.searchsorted(built['starts'], end, side='right'))
+        lower = int(np.searchsorted(built['max_ends'][:upper], start, side='left'))
+        candidates = lower + np.flatnonzero(built['ends'][lower:upper] >= start)
+
+        wanted = [i for i, (group_source, group_kind) in enumerate(built['keys'])
+                  if kind in (None, group_kind) and source in (None, group_source)]
+        if len(wanted) < len(built['keys']):
+            candidates = candidates[np.isin(built['group'][candidates], wanted)]
+
+        results = []
+        for group_id, position in zip(built['group'][candidates].tolist(), built['position'][candidates].tolist()):
+            group_source, group_kind = built['keys'][group_id]
+            results.append({'filename': group_source, 'kind': group_kind, **built['records'][group_id][position]})
+        return results
+
+    def point(self, depth: float, kind: Optional[str] = None, source: Optional[str] = None) -> List[Dict]:
+        """返回包含深度depth的区间记录"""
+        return self.overlap(depth, depth, kind, source)
+
+    def size(self) -> int:
+        with self.lock:
+            return sum(starts.size for starts, _, _ in self.groups.values())
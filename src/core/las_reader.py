@@ -0,0 +1,154 @@
+# las_reader.py - LAS 2.0/3.0测井文件读取
+import io
+import mmap
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 曲线助记符别名表：系统列名 -> 可能的LAS曲线助记符（不区分大小写，按顺序匹配第一个）
+LAS_CURVE_ALIASES = {
+    '深度': ['DEPT', 'DEPTH', 'MD'],
+    '深侧向': ['LLD', 'RLLD', 'RD', 'RT'],
+    '浅侧向': ['LLS', 'RLLS', 'RS'],
+    '声波时差': ['DT', 'AC', 'DTC'],
+    '自然伽玛': ['GR', 'CGR', 'SGR'],
+    '密度': ['RHOB', 'DEN', 'ZDEN']
+}
+
+# 单位换算：系统使用米和微秒/米
+UNIT_CONVERSIONS = {
+    'FT': 0.3048,
+    'F': 0.3048,
+    'US/F': 1 / 0.3048,
+    'US/FT': 1 / 0.3048,
+    'USEC/FT': 1 / 0.3048
+}
+
+# 数据段分隔符（LAS 3.0的DLM参数）
+DELIMITERS = {'SPACE': r'\s+', 'COMMA': ',', 'TAB': '\t'}
+
+_HEADER_LINE = re.compile(r'^\s*([^.]*?)\s*\.(\S*)\s*(.*)$')
+
+
+def _parse_header_line(line: str) -> Optional[Tuple[str, str, str, str]]:
+    """解析 'MNEM.UNIT  DATA : DESCRIPTION' 格式的头部行，返回(助记符, 单位, 值, 描述)"""
+    match = _HEADER_LINE.match(line)
+    if not match:
+        return None
+    mnemonic, unit, rest = match.groups()
+    value, _, description = rest.rpartition(':') if ':' in rest else (rest, '', '')
+    return mnemonic.strip(), unit.strip(), value.strip(), description.strip()
+
+
+def _section_kind(title: str) -> str:
+    """将节标题映射为version/well/curve/data/other（兼容LAS 2.0和3.0的命名）"""
+    title = title.upper()
+    if title.startswith('~V'):
+        return 'version'
+    if title.startswith('~W'):
+        return 'well'
+    if title.startswith('~C') or title.startswith('~LOG_DEFINITION'):
+        return 'curve'
+    if title.startswith('~A') or title.startswith('~LOG_DATA'):
+        return 'data'
+    return 'other'
+
+
+def read_las_header(mm) -> Tuple[Dict[str, str], List[Tuple[str, str]], int]:
+    """
+    逐行解析LAS头部直到数据段
+
+    Returns:
+        (版本和井信息参数字典, [(曲线助记符, 单位)], 数据段起始字节偏移)
+    """
+    params = {}
+    curves = []
+    section = 'other'
+    position = 0
+    while True:
+        line_end = mm.find(b'\n', position)
+        raw = mm[position:] if line_end == -1 else mm[position:line_end]
+        next_position = mm.size() if line_end == -1 else line_end + 1
+        line = raw.decode('utf-8', errors='replace').strip()
+        position = next_position
+
+        if line.startswith('~'):
+            section = _section_kind(line)
+            if section == 'data':
+                return params, curves, position
+        elif line and not line.startswith('#'):
+            parsed = _parse_header_line(line)
+            if parsed:
+                mnemonic, unit, value, _ = parsed
+                if section in ('version', 'well'):
+                    params[mnemonic.upper()] = value
+                elif section == 'curve':
+                    curves.append((mnemonic, unit))
+
+        if position >= mm.size():
+            raise ValueError('LAS文件中缺少数据段(~A)')
+
+
+def read_las(filepath: str, curve_aliases: Optional[Dict[str, List[str]]] = None) -> pd.DataFrame:
+    """
+    读取LAS 2.0/3.0测井文件，并按别名表把曲线映射为系统使用的列名
+
+    头部逐行解析，数据段通过内存映射交给pandas的C解析器一次性读取；
+    NULL值转换为NaN，深度英尺和声波时差微秒/英尺换算为米制单位。
+
+    Args:
+        filepath: LAS文件路径
+        curve_aliases: 按列覆盖LAS_CURVE_ALIASES的曲线别名表
+
+    Returns:
+        数据DataFrame，匹配到别名的曲线使用系统列名，其余曲线保留原助记符
+    """
+    aliases = {**LAS_CURVE_ALIASES, **(curve_aliases or {})}
+
+    with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        params, curves, data_start = read_las_header(mm)
+        if not curves:
+            raise ValueError('LAS文件中缺少曲线定义段(~C)')
+
+        mnemonics = [mnemonic for mnemonic, _ in curves]
+        delimiter = DELIMITERS.get(params.get('DLM', 'SPACE').upper(), r'\s+')
+        wrapped = params.get('WRAP', 'NO').upper().startswith('Y')
+        # LAS 3.0中数据段之后可能还有其他节
+        data_end = mm.find(b'\n~', data_start)
+        body = mm[data_start:] if data_end == -1 else mm[data_start:data_end]
+
+    if wrapped:
+        # 折行模式：数据按空白分隔的数值流，按曲线数重排
+        values = np.array(body.split(), dtype=float)
+        data = pd.DataFrame(values[:values.size - values.size % len(mnemonics)].reshape(-1, len(mnemonics)),
+                            columns=mnemonics)
+    else:
+        data = pd.read_csv(io.BytesIO(body), sep=delimiter, header=None, names=mnemonics,
+                           comment='#', skipinitialspace=True, dtype=float)
+
+    null_value = params.get('NULL')
+    if null_value:
+        try:
+            data = data.replace(float(null_value), np.nan)
+        except ValueError:
+            pass
+
+    # 单位换算（只处理深度和声波时差）
+    convertible = {candidate.upper() for column in ('深度', '声波时差') for candidate in aliases.get(column, [])}
+    for mnemonic, unit in curves:
+        factor = UNIT_CONVERSIONS.get(unit.upper())
+        if factor and mnemonic.upper() in convertible:
+            data[mnemonic] = data[mnemonic] * factor
+
+    # 按别名表映射列名
+    upper_to_original = {mnemonic.upper(): mnemonic for mnemonic in mnemonics}
+    rename = {}
+    for column, candidates in aliases.items():
+        for candidate in candidates:
+            original = upper_to_original.get(candidate.upper())
+            if original is not None and original not in rename:
+                rename[original] = column
+                break
+    return data.rename(columns=rename)
@@ -0,0 +1,127 @@
+# layer_table.py - 煤层列式数据表
+
+from dataclasses import dataclass, fields
+from typing import List, Dict, Any, Union
+import numpy as np
+
+
+@dataclass
+class LayerTable:
+    """煤层列式数据表
+
+    每个字段是一个长度相同的numpy数组（第i个元素对应第i个煤层），
+    打分、排序和过滤都在整列上向量化完成，只在JSON输出时调用to_records()。
+    """
+    layer_number: np.ndarray
+    start_depth: np.ndarray
+    end_depth: np.ndarray
+    thickness: np.ndarray
+    volume: np.ndarray
+    density: np.ndarray
+    gamma: np.ndarray
+    mass_tons: np.ndarray
+    quality_score: np.ndarray
+    quality_grade: np.ndarray
+    difficulty_score: np.ndarray
+    difficulty_grade: np.ndarray
+    depth_factor: np.ndarray
+    thickness_factor: np.ndarray
+
+    @classmethod
+    def empty(cls) -> 'LayerTable':
+        """创建空表"""
+        columns = {f.name: np.empty(0, dtype=float) for f in fields(cls)}
+        columns['layer_number'] = np.empty(0, dtype=int)
+        columns['quality_grade'] = np.empty(0, dtype='<U4')
+        columns['difficulty_grade'] = np.empty(0, dtype='<U4')
+        return cls(**columns)
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> 'LayerTable':
+        """从煤层字典列表（to_records()的输出格式）创建实例"""
+        if not records:
+            return cls.empty()
+        return cls(
+            layer_number=np.array([r['layer_number'] for r in records], dtype=int),
+            start_depth=np.array([r['start_depth'] for r in records], dtype=float),
+            end_depth=np.array([r['end_depth'] for r in records], dtype=float),
+            thickness=np.array([r['thickness'] for r in records], dtype=float),
+            volume=np.array([r['volume'] for r in records], dtype=float),
+            density=np.array([r['density'] for r in records], dtype=float),
+            gamma=np.array([r['quality']['gamma'] for r in records], dtype=float),
+            mass_tons=np.array([r['mass_tons'] for r in records], dtype=float),
+            quality_score=np.array([r['quality']['score'] for r in records], dtype=float),
+            quality_grade=np.array([r['quality']['grade'] for r in records]),
+            difficulty_score=np.array([r['mining_difficulty']['score'] for r in records], dtype=float),
+            difficulty_grade=np.array([r['mining_difficulty']['grade'] for r in records]),
+            depth_factor=np.array([r['mining_difficulty']['depth_factor'] for r in records], dtype=float),
+            thickness_factor=np.array([r['mining_difficulty']['thickness_factor'] for r in records], dtype=float)
+        )
+
+    @classmethod
+    def concat(cls, tables: List['LayerTable']) -> 'LayerTable':
+        """按行拼接多个表（如多口井的煤层）"""
+        if not tables:
+            return cls.empty()
+        return cls(**{f.name: np.concatenate([getattr(t, f.name) for t in tables]) for f in fields(cls)})
+
+    def __len__(self) -> int:
+        return len(self.layer_number)
+
+    def take(self, index: np.ndarray) -> 'LayerTable':
+        """按整数索引或布尔掩码选取行，返回新表"""
+        return LayerTable(**{f.name: getattr(self, f.name)[index] for f in fields(self)})
+
+    def filter(self, mask: np.ndarray) -> 'LayerTable':
+        """按布尔掩码过滤煤层"""
+        return self.take(np.asarray(mask, dtype=bool))
+
+    def sort_by(self, column: Union[str, np.ndarray], descending: bool = False) -> 'LayerTable':
+        """按列名或给定的得分数组排序（稳定排序）"""
+        keys = getattr(self, column) if isinstance(column, str) else np.asarray(column)
+        order = np.argsort(-keys if descending else keys, kind='stable')
+        return self.take(order)
+
+    def priority_scores(self, quality_weight: float = 0.5, difficulty_weight: float = 0.3,
+                        resource_weight: float = 0.2) -> np.ndarray:
+        """
+        向量化计算开采优先级得分
+
+        优先级 = 品质 * 0.5 + (100-难度*10) * 0.3 + 储量占比 * 0.2
+        """
+        if len(self) == 0:
+            return np.empty(0, dtype=float)
+        resources = self.mass_tons / 1000
+        max_resource = resources.max()
+        resource_factor = resources / (max_resource if max_resource else 1) * 100
+        return (self.quality_score * quality_weight +
+                (100 - self.difficulty_score * 10) * difficulty_weight +
+                resource_factor * resource_weight)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """转换为字典列表格式（仅在JSON输出边界使用）"""
+        columns = {f.name: getattr(self, f.name).tolist() for f in fields(self)}
+        return [
+            {
+                'layer_number': int(columns['layer_number'][i]),
+                'start_depth': columns['start_depth'][i],
+                'end_depth': columns['end_depth'][i],
+                'thickness': columns['thickness'][i],
+                'volume': columns['volume'][i],
+                'density': columns['density'][i],
+                'mass_tons': columns['mass_tons'][i],
+                'quality': {
+                    'score': columns['quality_score'][i],
+                    'grade': columns['quality_grade'][i],
+                    'density': columns['density'][i],
+                    'gamma': columns['gamma'][i]
+                },
+                'mining_difficulty': {
+                    'score': columns['difficulty_score'][i],
+                    'grade': columns['difficulty_grade'][i],
+                    'depth_factor': columns['depth_factor'][i],
+                    'thickness_factor': columns['thickness_factor'][i]
+                }
+            }
+            for i in range(len(self))
+        ]
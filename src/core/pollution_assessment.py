@@ -11,6 +11,7 @@ from typing import Dict, List, Any
 from io import BytesIO
 import base64
 from utils import set_chinese_font
+from diffusion_simulation import estimate_spreading_speeds, simulate_diffusion
 
 # 配置日志记录
 logging.basicConfig(level=logging.INFO,
@@ -34,8 +35,39 @@ def safe_plot_to_base64(fig):
         return ""
 
 
-def assess_coal_pollution(data, coal_mask):
-    """评估煤污染程度，基于多参数综合分析"""
+def calculate_segment_pollution(coal_percentage, avg_density, avg_gamma, resistivity, porosity_factor,
+                                rock_density, rock_resistivity, depth_factor):
+    """
+    计算单个深度分段的污染指数(0-10)
+
+    rock_density/rock_resistivity为分段内非煤岩层的平均值，没有非煤样本时传None（按中等阻隔计算）。
+    各参数也可以是同形状的数组（逐元素计算，rock_density为NaN表示没有非煤样本）。
+    """
+    if rock_density is not None:
+        # 密度越高、电阻率越高，阻隔性越好
+        barrier_factor = np.where(np.isnan(rock_density), 0.5,
+                                  np.fmin(1.0, (np.asarray(rock_density) / 3.0) * (np.asarray(rock_resistivity) / 500)))
+    else:
+        barrier_factor = 0.5  # 默认中等阻隔
+
+    # 煤质污染潜力评估
+    coal_pollution_potential = (
+                                       (2.0 - np.fmin(2.0, avg_density)) * 2.0 +  # 密度因子
+                                       (np.asarray(avg_gamma) / 40) * 3.0 +  # 伽马因子
+                                       (100 / np.fmax(10, resistivity)) * 2.5 +  # 电阻率因子
+                                       np.asarray(porosity_factor) * 1.5  # 孔隙度因子
+                               ) / 9.0  # 归一化到约0-1范围
+
+    # 最终污染指数：煤层比例 × 煤炭污染潜力 × 深度因子 ÷ 阻隔因子
+    return np.fmin(10, (coal_percentage * coal_pollution_potential * depth_factor / np.fmax(0.1, barrier_factor)) * 10)
+
+
+def assess_coal_pollution(data, coal_mask, include_charts=True, diffusion_params=None):
+    """
+    评估煤污染程度，基于多参数综合分析（include_charts为False时不生成图表）
+
+    diffusion_params不为None时，扩散风险中附带二维对流-弥散数值模拟结果（参数见diffusion_simulation）
+    """
     try:
         # 深度分段（每10米一段）
         depth_min = data['深度'].min()
@@ -45,17 +77,26 @@ def assess_coal_pollution(data, coal_mask):
         segments = []
         avg_density_total = float(data['密度'].mean())  # 确保转换为Python原生类型
 
+        # 按深度排序后二分查找每段的行范围，段内煤样本数由累计和得到，不必每段都比较整列深度
+        depths = data['深度'].to_numpy(dtype=float)
+        order = np.argsort(depths, kind='stable')
+        sorted_depths = depths[order]
+        coal_counts = np.concatenate(([0], np.cumsum(np.asarray(coal_mask[data.index], dtype=bool)[order])))
+        monotonic = bool(np.all(np.diff(depths) >= 0))
+
         for start in np.arange(depth_min, depth_max, segment_size):
             end = min(start + segment_size, depth_max)
-            segment_data = data[(data['深度'] >= start) & (data['深度'] < end)]
+            lower, upper = np.searchsorted(sorted_depths, [start, end], side='left')
 
-            if len(segment_data) > 0:
-                # 计算该段内煤层占比
-                segment_coal = np.sum(coal_mask[segment_data.index])
-                coal_percentage = segment_coal / len(segment_data)
+            if upper > lower:
+                # 计算该段内煤层占比（不含煤的段不取出段内数据）
+                segment_coal = coal_counts[upper] - coal_counts[lower]
+                coal_percentage = segment_coal / (upper - lower)
 
                 # 计算污染指数 - 基于综合物理特性和煤层状况
                 if coal_percentage > 0:
+                    segment_data = data.iloc[lower:upper] if monotonic else data.iloc[np.sort(order[lower:upper])]
+
                     # 获取物理参数
                     avg_density = float(segment_data['密度'].mean())
                     avg_gamma = float(segment_data['自然伽玛'].mean())
@@ -78,6 +119,7 @@ def assess_coal_pollution(data, coal_mask):
 
                     # 计算周围岩层阻隔系数 (非煤层部分的密度和电阻率)
                     non_coal_data = segment_data[~coal_mask[segment_data.index]]
+                    rock_density = rock_resistivity = None
                     if len(non_coal_data) > 0:
                         rock_density = float(non_coal_data['密度'].mean())
                         try:
@@ -88,25 +130,12 @@ def assess_coal_pollution(data, coal_mask):
                             except:
                                 rock_resistivity = 200.0  # 默认值
 
-                        # 密度越高、电阻率越高，阻隔性越好
-                        barrier_factor = min(1.0, (rock_density / 3.0) * (rock_resistivity / 500))
-                    else:
-                        barrier_factor = 0.5  # 默认中等阻隔
-
-                    # 煤质污染潜力评估
-                    coal_pollution_potential = (
-                                                       (2.0 - min(2.0, avg_density)) * 2.0 +  # 密度因子
-                                                       (avg_gamma / 40) * 3.0 +  # 伽马因子
-                                                       (100 / max(10, resistivity)) * 2.5 +  # 电阻率因子
-                                                       porosity_factor * 1.5  # 孔隙度因子
-                                               ) / 9.0  # 归一化到约0-1范围
-
                     # 考虑深度因素：浅层污染更容易影响地表和地下水
                     depth_factor = 1.0 - (start - depth_min) / (depth_max - depth_min) * 0.5  # 深度越大，影响越小
 
-                    # 最终污染指数：煤层比例 × 煤炭污染潜力 × 深度因子 ÷ 阻隔因子
-                    pollution_level = min(10, (coal_percentage * coal_pollution_potential * depth_factor /
-                                               max(0.1, barrier_factor)) * 10)
+                    pollution_level = calculate_segment_pollution(coal_percentage, avg_density, avg_gamma, resistivity,
+                                                                  porosity_factor, rock_density, rock_resistivity,
+                                                                  depth_factor)
                 else:
                     pollution_level = 0.0
                     avg_density = 0.0
@@ -171,16 +200,20 @@ def assess_coal_pollution(data, coal_mask):
         impacts = analyze_pollution_impacts(segments, overall_score)
 
         # 污染扩散风险分析
-        diffusion_risk = analyze_diffusion_risk(segments, data, coal_mask)
+        diffusion_risk = analyze_diffusion_risk(segments, data, coal_mask, diffusion_params)
 
-        # 创建临时目录
-        os.makedirs('temp_charts', exist_ok=True)
+        if include_charts:
+            # 创建临时目录
+            os.makedirs('temp_charts', exist_ok=True)
 
-        # 生成污染深度剖面图
-        pollution_profile_chart = generate_pollution_profile(segments, depth_min, depth_max)
+            # 生成污染深度剖面图
+            pollution_profile_chart = generate_pollution_profile(segments, depth_min, depth_max)
 
-        # 生成污染物类型分布图
-        pollutant_distribution_chart = generate_pollutant_distribution(segments)
+            # 生成污染物类型分布图
+            pollutant_distribution_chart = generate_pollutant_distribution(segments)
+        else:
+            pollution_profile_chart = ''
+            pollutant_distribution_chart = ''
 
         # 返回结果（确保所有值都是可JSON序列化的）
         return {
@@ -266,8 +299,8 @@ def analyze_pollution_impacts(segments, overall_score):
         return {'ecological': [], 'water': [], 'soil': [], 'health': []}
 
 
-def analyze_diffusion_risk(segments, data, coal_mask):
-    """分析污染物扩散风险"""
+def analyze_diffusion_risk(segments, data, coal_mask, simulation_params=None):
+    """分析污染物扩散风险（给出simulation_params时附带二维对流-弥散数值模拟的各年份影响范围）"""
     try:
         # 数据验证
         if not segments:
@@ -293,20 +326,15 @@ def analyze_diffusion_risk(segments, data, coal_mask):
         except:
             avg_params['resistivity'] = 100.0
 
-            # 扩散风险因素评估
-        horizontal_risk = float(
-            min(10, avg_params['coal_percentage'] * 10 * (100 / max(10, avg_params['resistivity']))))
-        vertical_risk = float(min(10, avg_params['coal_percentage'] * 10 * (2.0 - min(2.0, avg_params['density']))))
-
-        # 扩散速度估计 (单位: 米/年)
-        est_horizontal_speed = float(max(0.1, horizontal_risk * 0.2))  # 0.1-2.0 米/年
-        est_vertical_speed = float(max(0.05, vertical_risk * 0.1))  # 0.05-1.0 米/年
+        # 扩散风险因素评估与扩散速度估计 (单位: 米/年)
+        horizontal_risk, vertical_risk, est_horizontal_speed, est_vertical_speed = map(float, estimate_spreading_speeds(
+            avg_params['coal_percentage'], avg_params['density'], avg_params['resistivity']))
 
         # 扩散范围估计 (单位: 米，20年内)
         horizontal_range = float(est_horizontal_speed * 20)  # 20年内水平扩散范围
         vertical_range = float(est_vertical_speed * 20)  # 20年内垂直扩散范围
 
-        return {
+        diffusion_risk = {
             'horizontal_risk': horizontal_risk,
             'vertical_risk': vertical_risk,
             'est_horizontal_speed': est_horizontal_speed,
@@ -315,6 +343,14 @@ def analyze_diffusion_risk(segments, data, coal_mask):
             'vertical_range_20y': vertical_range,
             'risk_level': get_diffusion_risk_level(horizontal_risk, vertical_risk)
         }
+        if simulation_params is not None:
+            try:
+                simulation = simulate_diffusion(segments, simulation_params)
+                diffusion_risk['simulation'] = {'time_step': simulation['time_step'],
+                                                'snapshots': simulation['snapshots']}
+            except ValueError as e:
+                logger.warning(f"扩散数值模拟参数无效: {str(e)}")
+        return diffusion_risk
     except Exception as e:
         logger.error(f"扩散风险分析失败: {str(e)}")
         return {
@@ -0,0 +1,51 @@
+# preview.py - 快速预览评估（只计算评分和汇总指标，不生成图表）
+from typing import Dict, Optional, Sequence
+
+from coal_analysis import REQUIRED_COLUMNS, classify_coal_layer
+from pollution_assessment import assess_coal_pollution
+from resource_assessment import calculate_coal_resources
+from agriculture import assess_soil_quality
+
+
+def preview_assessment(data, assessments: Sequence[str] = ('pollution', 'resources', 'soil_quality'),
+                       rules=None, area: float = 10000, horizon_params: Optional[Dict] = None) -> Dict:
+    """
+    快速预览：只计算所选评估的评分和汇总指标，不生成图表
+
+    结果与完整评估相同，不是抽样估计。煤层判别、资源量和土壤质量都是整列的向量化计算，
+    污染评分只取出含煤分段的数据，大文件的耗时主要在读取文件上。
+
+    Args:
+        data: 规整化后的钻孔数据
+        assessments: 'pollution'（污染评分）、'resources'（资源量）、'soil_quality'（土壤质量）的组合
+        rules: 煤层判别阈值
+        area: 煤层面积(平方米)
+        horizon_params: 土壤层位参数（见assess_soil_quality），预览只返回全剖面的土壤指标
+
+    Returns:
+        {'preview': True, 'rows', 以及所选评估的汇总指标}
+    """
+    if not all(col in data.columns for col in REQUIRED_COLUMNS):
+        raise ValueError(f'文件中缺少必要的列。请确保文件包含以下列：{", ".join(REQUIRED_COLUMNS)}')
+
+    data = data.sort_values('深度', kind='stable').reset_index(drop=True)
+    data['双侧向电阻率'] = 0.7 * data['深侧向'] + 0.3 * data['浅侧向']
+    coal_mask = classify_coal_layer(data, rules)
+
+    result = {'preview': True, 'rows': int(len(data))}
+    if 'pollution' in assessments:
+        pollution = assess_coal_pollution(data, coal_mask, include_charts=False)
+        result['pollution'] = {key: pollution[key] for key in ('overall_score', 'pollution_grade')}
+    if 'resources' in assessments:
+        resources = calculate_coal_resources(data, coal_mask, area)
+        result['resources'] = {
+            'total_resources': float(resources['total_resources']),
+            'total_volume': float(resources['total_volume']),
+            'total_thickness': float(resources['layers'].thickness.sum()),
+            'layers_count': len(resources['layers'])
+        }
+    if 'soil_quality' in assessments:
+        soil_quality = assess_soil_quality(data, coal_mask, horizon_params)
+        soil_quality.pop('horizons', None)
+        result['soil_quality'] = soil_quality
+    return result
@@ -0,0 +1,250 @@
+# reprocessing.py - 上传文件的离线重算功能
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from utils import allowed_file, file_content_hash, write_json_atomic
+from coal_analysis import process_data_file
+from pollution_assessment import assess_coal_pollution, generate_pollution_visualization
+from resource_assessment import calculate_coal_resources, optimize_mining_plan
+from agriculture import assess_soil_quality, generate_reclamation_plan, recommend_agriculture
+from uncertainty import monte_carlo_assessment
+
+# 影响评估结果的配置项，任一变化都会使已保存的评估结果失效
+ASSESSMENT_PARAMETERS = ['COAL_DETECTION_RULE_SETS', 'LAS_CURVE_ALIASES', 'POLLUTION_SEGMENT_SIZE',
+                         'POLLUTION_THRESHOLDS', 'SIGNAL_FILTERS', 'SOIL_HORIZON_PARAMS',
+                         'DIFFUSION_SIMULATION_PARAMS', 'UNCERTAINTY_ERROR_MODELS']
+
+# 开采计划的排程参数（记录在评估记录的parameters中）
+SCHEDULE_PARAMETERS = ['annual_capacity', 'discount_rate', 'max_periods', 'time_budget']
+
+
+def parameter_hash(config) -> str:
+    """计算评估相关配置项的哈希"""
+    params = {name: getattr(config, name, None) for name in ASSESSMENT_PARAMETERS}
+    return hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def reprocess_settings(config) -> Dict:
+    """从配置中取出重算所需的各项参数（可在进程间传递的字典）"""
+    return {
+        'curve_aliases': getattr(config, 'LAS_CURVE_ALIASES', None),
+        'signal_filters': getattr(config, 'SIGNAL_FILTERS', None),
+        'rule_sets': getattr(config, 'COAL_DETECTION_RULE_SETS', None) or {},
+        'horizon_params': getattr(config, 'SOIL_HORIZON_PARAMS', None),
+        'diffusion_params': getattr(config, 'DIFFUSION_SIMULATION_PARAMS', None),
+        'error_models': getattr(config, 'UNCERTAINTY_ERROR_MODELS', None)
+    }
+
+
+def record_parameters(record: Dict) -> Dict:
+    """
+    读取评估记录生成时的参数
+
+    新记录在parameters中保存规则集、扩散模拟、不确定性模拟次数和排程参数；
+    没有parameters的旧记录按默认规则集处理，扩散模拟和不确定性分析按记录中已有的结果推断。
+    """
+    params = dict(record.get('parameters') or {})
+    params.setdefault('rule_set', 'default')
+    if 'diffusion_simulation' not in params:
+        diffusion_risk = (record.get('assessment') or {}).get('diffusion_risk') or {}
+        params['diffusion_simulation'] = 'simulation' in diffusion_risk
+    if 'uncertainty_samples' not in params:
+        uncertainty = record.get('uncertainty') or (record.get('assessment') or {}).get('uncertainty') or {}
+        params['uncertainty_samples'] = int(uncertainty.get('samples', 0))
+    return params
+
+
+def load_manifest(manifest_path: str) -> Dict:
+    """读取重算检查点，不存在或损坏时返回空字典"""
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def index_history_records(history_folder: str, resource_folder: str) -> Dict[str, List[Dict]]:
+    """
+    扫描历史记录目录，按上传文件名索引引用它的评估记录
+
+    Returns:
+        {文件名: [{'path': 记录路径, 'kind': pollution/resource/agriculture, 'area': 面积}]}
+    """
+    index = {}
+    folders = [(history_folder, lambda name: 'pollution'),
+               (resource_folder, lambda name: 'agriculture' if name.startswith('agri_') else 'resource')]
+    for folder, kind_of in folders:
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                with open(path, 'r') as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(record, dict) or 'filename' not in record:
+                continue
+            index.setdefault(record['filename'], []).append({
+                'path': path,
+                'kind': kind_of(name),
+                'area': float(record.get('area', 10000))
+            })
+    return index
+
+
+def reprocess_upload(filepath: str, targets: List[Dict], param_hash: str, settings: Dict) -> Dict:
+    """
+    按各评估记录生成时的参数重新计算一个上传文件及引用它的所有评估记录
+
+    每个记录使用其parameters中的煤层判别规则集，数据按规则集分别处理一次；扩散模拟、不确定性分析和
+    分期开采计划按记录的参数重算，无法重算的字段（如缺少排程参数的旧记录的mining_schedule）原样保留。
+
+    Args:
+        filepath: 上传文件路径
+        targets: index_history_records给出的该文件的记录列表
+        param_hash: 当前参数哈希，写入更新后的记录
+        settings: reprocess_settings给出的配置参数
+
+    Returns:
+        {'filename', 'records': {记录路径: 新记录}} ，失败时包含error
+    """
+    filename = os.path.basename(filepath)
+    reprocessed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    processed = {}
+    pollution_cache = {}
+    soil_cache = {}
+
+    def process(rule_set):
+        if rule_set not in processed:
+            if rule_set not in settings['rule_sets']:
+                raise ValueError(f'未知的煤层判别规则集: {rule_set}')
+            processed[rule_set] = process_data_file(filepath, settings['curve_aliases'], settings['signal_filters'],
+                                                    settings['rule_sets'][rule_set])
+        return processed[rule_set]
+
+    def uncertainty(rule_set, params, area):
+        data, coal_mask, coal_data, chart_data = process(rule_set)
+        return monte_carlo_assessment(data, params['uncertainty_samples'], settings['error_models'],
+                                      settings['rule_sets'][rule_set], area=area, seed=params.get('seed'))
+
+    try:
+        records = {}
+        for target in targets:
+            with open(target['path'], 'r') as f:
+                record = json.load(f)
+            params = record_parameters(record)
+            rule_set = params['rule_set']
+            data, coal_mask, coal_data, chart_data = process(rule_set)
+
+            if target['kind'] == 'pollution':
+                key = (rule_set, params['diffusion_simulation'])
+                if key not in pollution_cache:
+                    diffusion_params = settings['diffusion_params'] if params['diffusion_simulation'] else None
+                    pollution_assessment = assess_coal_pollution(data, coal_mask, diffusion_params=diffusion_params)
+                    pollution_cache[key] = (pollution_assessment, generate_pollution_visualization(pollution_assessment))
+                pollution_assessment, visualization = pollution_cache[key]
+                pollution_assessment = dict(pollution_assessment)
+                if params['uncertainty_samples']:
+                    result = uncertainty(rule_set, params, 10000)
+                    pollution_assessment['uncertainty'] = {'samples': result['samples'],
+                                                           'overall_score': result['overall_score']}
+                record.update({'assessment': pollution_assessment, 'visualization': visualization})
+            elif target['kind'] == 'resource':
+                schedule_options = {key: params[key] for key in SCHEDULE_PARAMETERS if params.get(key) is not None}
+                resource_data = calculate_coal_resources(data, coal_mask, target['area'])
+                mining_plan = optimize_mining_plan(resource_data["layers"], **schedule_options)
+                record.update({
+                    'total_resources': resource_data["total_resources"],
+                    'total_volume': resource_data["total_volume"],
+                    'layers_count': len(resource_data["layers"]),
+                    'layers': resource_data["layers"].to_records(),
+                    'mining_plan': mining_plan["mining_plan"],
+                    'priority_chart': mining_plan["priority_chart"]
+                })
+                if 'schedule' in mining_plan:
+                    record['mining_schedule'] = mining_plan['schedule']
+                if params['uncertainty_samples']:
+                    result = uncertainty(rule_set, params, target['area'])
+                    record['uncertainty'] = {key: result[key]
+                                             for key in ('samples', 'total_resources', 'total_thickness', 'area')}
+            else:
+                if rule_set not in soil_cache:
+                    soil_cache[rule_set] = assess_soil_quality(data, coal_mask, settings['horizon_params'])
+                soil_quality = soil_cache[rule_set]
+                record['soil_quality'] = soil_quality
+                if 'reclamation_plan' in record:
+                    record['reclamation_plan'] = generate_reclamation_plan(soil_quality)
+                if 'agriculture_recommendation' in record:
+                    record['agriculture_recommendation'] = recommend_agriculture(soil_quality)
+
+            record.update({'reprocessed_at': reprocessed_at, 'parameter_hash': param_hash})
+            records[target['path']] = record
+    except Exception as e:
+        return {'filename': filename, 'error': f'处理文件时出错: {str(e)}'}
+
+    return {'filename': filename, 'records': records}
+
+
+def iter_reprocess_uploads(upload_folder: str, history_folder: str, resource_folder: str, config,
+                           manifest_path: str, max_workers: Optional[int] = None,
+                           force: bool = False) -> Iterator[Dict]:
+    """
+    并行重算上传目录中的文件，跳过内容哈希和参数哈希都未变化的文件
+
+    每个文件完成后立即原子替换其评估记录并更新检查点，中断后重新运行会从未完成的文件继续。
+
+    Yields:
+        每个文件的处理状态：{'filename', 'status': reprocessed/skipped/failed, 'records', 'bytes', ...}
+    """
+    param_hash = parameter_hash(config)
+    settings = reprocess_settings(config)
+    manifest = load_manifest(manifest_path)
+    history_index = index_history_records(history_folder, resource_folder)
+
+    pending = []
+    for name in sorted(os.listdir(upload_folder)):
+        filepath = os.path.join(upload_folder, name)
+        if not os.path.isfile(filepath) or not allowed_file(name):
+            continue
+        content_hash = file_content_hash(filepath)
+        entry = manifest.get(name, {})
+        if not force and entry.get('content_hash') == content_hash and entry.get('parameter_hash') == param_hash:
+            yield {'filename': name, 'status': 'skipped', 'records': 0, 'bytes': 0}
+            continue
+        pending.append((filepath, content_hash))
+
+    if not pending:
+        return
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(pending))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(reprocess_upload, filepath, history_index.get(os.path.basename(filepath), []),
+                                   param_hash, settings): (filepath, content_hash)
+                   for filepath, content_hash in pending}
+        for future in as_completed(futures):
+            filepath, content_hash = futures[future]
+            result = future.result()
+            name = result['filename']
+            if 'error' in result:
+                yield {'filename': name, 'status': 'failed', 'error': result['error'], 'records': 0, 'bytes': 0}
+                continue
+
+            # 逐条原子替换评估记录，再写检查点
+            for path, record in result['records'].items():
+                write_json_atomic(path, record)
+            manifest[name] = {
+                'content_hash': content_hash,
+                'parameter_hash': param_hash,
+                'records': sorted(result['records']),
+                'completed_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+            write_json_atomic(manifest_path, manifest)
+            yield {'filename': name, 'status': 'reprocessed', 'records': len(result['records']),
+                   'bytes': os.path.getsize(filepath)}
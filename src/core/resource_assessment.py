@@ -4,12 +4,13 @@ import pandas as pd
 import matplotlib
 matplotlib.use('Agg')  # 设置非交互式后端，解决服务器环境下的渲染问题
 import matplotlib.pyplot as plt
+import time
 from datetime import datetime, timedelta
-from sklearn.linear_model import LinearRegression
 from functools import lru_cache
 from typing import Dict, List, Tuple, Optional, Any, Union
 from utils import set_chinese_font, plot_to_base64
-from coal_analysis import get_coal_depth_ranges
+from coal_analysis import label_coal_layers, summarize_coal_layers
+from layer_table import LayerTable
 
 # 常量定义
 # 煤炭品质评估常量
@@ -29,6 +30,10 @@ DIFFICULTY_THRESHOLDS = {
     "极困难": 10
 }
 
+# 煤层厚度分段（米）及对应的开采难度因子：<1m很难，1-2m较难，2-5m理想，5-8m较难，>8m难
+THICKNESS_BOUNDS = np.array([1, 2, 5, 8])
+THICKNESS_FACTORS = np.array([8, 5, 2, 4, 6], dtype=float)
+
 # 开采方法回收率因子
 METHOD_FACTORS = {
     "露天开采": 1.2,
@@ -39,6 +44,16 @@ METHOD_FACTORS = {
     "房柱式开采": 0.85
 }
 
+# 开采方法说明
+METHOD_DESCRIPTIONS = {
+    "露天开采": "适用于浅层且较厚的煤层，成本低，回收率高。",
+    "长壁开采": "适用于中等深度、厚度适中的煤层，产量高，安全性好。",
+    "分层开采": "适用于中深度、较厚的煤层，可分批次开采，提高安全性。",
+    "窄煤柱开采": "适用于薄煤层，可提高回收率，但成本较高。",
+    "水力开采": "适用于深层煤层，通过高压水冲击煤层，安全性较高但成本高。",
+    "房柱式开采": "通用性强的开采方法，适应性好，但回收率较低。"
+}
+
 
 def calculate_coal_resources(data: pd.DataFrame, coal_mask: pd.Series, area_square_meters: float = 10000) -> Dict:
     """
@@ -50,97 +65,145 @@ def calculate_coal_resources(data: pd.DataFrame, coal_mask: pd.Series, area_squa
         area_square_meters: 煤层面积(平方米)
 
     Returns:
-        包含资源量计算结果的字典
+        包含资源量计算结果的字典，其中layers为LayerTable（输出JSON时调用to_records()）
     """
     coal_data = data[coal_mask]
 
     if coal_data.empty:
-        return {"total_resources": 0, "layers": [], "total_volume": 0, "area_square_meters": area_square_meters}
-
-        # 计算每个煤层的资源情况
-    depth_ranges = get_coal_depth_ranges(data, coal_mask)
-    coal_layers = []
-    total_volume = 0
-
-    for i, (start, end) in enumerate(depth_ranges):
-        thickness = end - start
-        # 获取该煤层内的煤炭数据
-        layer_data = data[(data['深度'] >= start) & (data['深度'] <= end)]
-
-        # 计算煤层体积和质量
-        layer_volume = thickness * area_square_meters
-        avg_density = layer_data['密度'].mean()
-        layer_mass = layer_volume * avg_density * 1000  # 转换为吨
-
-        # 煤层品质评估
-        quality_score = assess_coal_quality(layer_data)
-
-        # 计算开采难度
-        mining_difficulty = assess_mining_difficulty(start, end, thickness)
-
-        coal_layers.append({
-            "layer_number": i + 1,
-            "start_depth": float(start),
-            "end_depth": float(end),
-            "thickness": float(thickness),
-            "volume": float(layer_volume),
-            "density": float(avg_density),
-            "mass_tons": float(layer_mass),
-            "quality": quality_score,
-            "mining_difficulty": mining_difficulty
-        })
-
-        total_volume += layer_volume
-
-        # 计算总储量
+        return {"total_resources": 0, "layers": LayerTable.empty(), "total_volume": 0,
+                "area_square_meters": area_square_meters}
+
+        # 一次分组归约得到每个煤层的统计量
+    labels = label_coal_layers(data, coal_mask)
+    stats = summarize_coal_layers(data, labels)
+    thickness = stats["end"] - stats["start"]
+
+    # 计算煤层体积和质量
+    volume = thickness * area_square_meters
+    mass_tons = volume * stats["density"] * 1000  # 转换为吨
+
+    # 向量化评估所有煤层的品质和开采难度
+    quality_score, quality_grade = score_coal_quality(stats["density"], stats["gamma"])
+    difficulty = score_mining_difficulty(stats["start"], stats["end"], thickness)
+
+    layers = LayerTable(
+        layer_number=np.arange(1, len(thickness) + 1),
+        start_depth=stats["start"].astype(float),
+        end_depth=stats["end"].astype(float),
+        thickness=thickness.astype(float),
+        volume=volume,
+        density=stats["density"],
+        gamma=stats["gamma"],
+        mass_tons=mass_tons,
+        quality_score=quality_score,
+        quality_grade=quality_grade,
+        difficulty_score=difficulty["score"],
+        difficulty_grade=difficulty["grade"],
+        depth_factor=difficulty["depth_factor"],
+        thickness_factor=difficulty["thickness_factor"]
+    )
+
+    # 计算总储量
+    total_volume = float(volume.sum())
     avg_density = coal_data['密度'].mean()
     total_resources = total_volume * avg_density * 1000  # 转换为吨
 
     return {
         "total_resources": float(total_resources),
-        "layers": coal_layers,
-        "total_volume": float(total_volume),
+        "layers": layers,
+        "total_volume": total_volume,
         "area_square_meters": float(area_square_meters)
     }
 
 
-def assess_coal_quality(layer_data: pd.DataFrame) -> Dict:
+def score_coal_quality(avg_density: np.ndarray, avg_gamma: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     """
-    评估煤炭品质
+    向量化计算煤炭品质评分和等级
 
     Args:
-        layer_data: 煤层数据
+        avg_density: 各煤层平均密度数组
+        avg_gamma: 各煤层平均伽马值数组
 
     Returns:
-        包含品质评估结果的字典
+        (品质评分数组, 品质等级数组)
     """
-    avg_density = layer_data['密度'].mean()
-    avg_gamma = layer_data['自然伽玛'].mean()
+    avg_density = np.asarray(avg_density, dtype=float)
+    avg_gamma = np.asarray(avg_gamma, dtype=float)
 
     # 密度评分：1.1-1.8范围内，密度越低分数越高
-    density_score = max(0, min(100, (1.8 - avg_density) / 0.7 * 100))
+    density_score = np.clip((1.8 - avg_density) / 0.7 * 100, 0, 100)
 
     # 伽马评分：20-80范围内，伽马值越低分数越高
-    gamma_score = max(0, min(100, (80 - avg_gamma) / 60 * 100))
+    gamma_score = np.clip((80 - avg_gamma) / 60 * 100, 0, 100)
 
     # 总体品质评分（0-100）
     quality_score = 0.6 * density_score + 0.4 * gamma_score
 
-    # 确定品质等级
-    quality_grade = "低质"  # 默认值
-    for grade, threshold in QUALITY_THRESHOLDS.items():
-        if quality_score >= threshold:
-            quality_grade = grade
-            break
+    # 确定品质等级（取第一个达到阈值的等级，默认低质）
+    quality_grade = np.select([quality_score >= threshold for threshold in QUALITY_THRESHOLDS.values()],
+                              list(QUALITY_THRESHOLDS.keys()), default="低质")
+
+    return quality_score, quality_grade
+
+
+def assess_coal_quality(layer_data: pd.DataFrame) -> Dict:
+    """
+    评估煤炭品质
+
+    Args:
+        layer_data: 煤层数据
+
+    Returns:
+        包含品质评估结果的字典
+    """
+    avg_density = layer_data['密度'].mean()
+    avg_gamma = layer_data['自然伽玛'].mean()
+    quality_score, quality_grade = score_coal_quality([avg_density], [avg_gamma])
 
     return {
-        "score": float(quality_score),
-        "grade": quality_grade,
+        "score": float(quality_score[0]),
+        "grade": str(quality_grade[0]),
         "density": float(avg_density),
         "gamma": float(avg_gamma)
     }
 
 
+def score_mining_difficulty(start_depth: np.ndarray, end_depth: np.ndarray,
+                            thickness: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    向量化评估开采难度
+
+    Args:
+        start_depth: 煤层起始深度数组
+        end_depth: 煤层结束深度数组
+        thickness: 煤层厚度数组
+
+    Returns:
+        包含score/grade/depth_factor/thickness_factor数组的字典
+    """
+    avg_depth = (np.asarray(start_depth, dtype=float) + np.asarray(end_depth, dtype=float)) / 2
+
+    # 深度因子：深度越大，开采难度越大
+    depth_factor = np.minimum(10, avg_depth / 100)
+
+    # 厚度因子：煤层过薄或过厚都会增加开采难度
+    thickness_factor = THICKNESS_FACTORS[np.searchsorted(THICKNESS_BOUNDS, thickness, side='right')]
+
+    # 计算总难度（1-10分）
+    difficulty_score = depth_factor * 0.7 + thickness_factor * 0.3
+
+    # 确定难度等级（取第一个高于得分的阈值，默认极困难）
+    difficulty_grade = np.select([difficulty_score < threshold for threshold in DIFFICULTY_THRESHOLDS.values()],
+                                 list(DIFFICULTY_THRESHOLDS.keys()), default="极困难")
+
+    return {
+        "score": difficulty_score,
+        "grade": difficulty_grade,
+        "depth_factor": depth_factor,
+        "thickness_factor": thickness_factor
+    }
+
+
 def assess_mining_difficulty(start_depth: float, end_depth: float, thickness: float) -> Dict:
     """
     评估开采难度
@@ -153,39 +216,40 @@ def assess_mining_difficulty(start_depth: float, end_depth: float, thickness: fl
     Returns:
         包含开采难度评估结果的字典
     """
-    avg_depth = (start_depth + end_depth) / 2
-
-    # 深度因子：深度越大，开采难度越大
-    depth_factor = min(10, avg_depth / 100)
+    difficulty = score_mining_difficulty([start_depth], [end_depth], [thickness])
 
-    # 厚度因子：煤层过薄或过厚都会增加开采难度
-    thickness_factor_map = {
-        (0, 1): 8,  # <1m: 很难
-        (1, 2): 5,  # 1-2m: 较难
-        (2, 5): 2,  # 2-5m: 理想
-        (5, 8): 4,  # 5-8m: 较难
-        (8, float('inf')): 6  # >8m: 难
+    return {
+        "score": float(difficulty["score"][0]),
+        "grade": str(difficulty["grade"][0]),
+        "depth_factor": float(difficulty["depth_factor"][0]),
+        "thickness_factor": float(difficulty["thickness_factor"][0])
     }
 
-    thickness_factor = next(factor for (lower, upper), factor in thickness_factor_map.items()
-                            if lower <= thickness < upper)
 
-    # 计算总难度（1-10分）
-    difficulty_score = (depth_factor * 0.7 + thickness_factor * 0.3)
+def determine_mining_methods(start_depth: np.ndarray, thickness: np.ndarray) -> np.ndarray:
+    """
+    向量化确定各煤层的推荐开采方法
 
-    # 确定难度等级
-    difficulty_grade = "极困难"  # 默认值
-    for grade, threshold in DIFFICULTY_THRESHOLDS.items():
-        if difficulty_score < threshold:
-            difficulty_grade = grade
-            break
+    Args:
+        start_depth: 煤层起始深度数组
+        thickness: 煤层厚度数组
 
-    return {
-        "score": float(difficulty_score),
-        "grade": difficulty_grade,
-        "depth_factor": float(depth_factor),
-        "thickness_factor": float(thickness_factor)
-    }
+    Returns:
+        开采方法名称数组
+    """
+    depth = np.asarray(start_depth, dtype=float)
+    thickness = np.asarray(thickness, dtype=float)
+
+    # 决策逻辑（按顺序取第一个满足的条件）
+    conditions = [
+        (depth < 50) & (thickness > 2),
+        (depth >= 50) & (depth < 300) & (thickness >= 1.5) & (thickness <= 8),
+        (depth >= 100) & (depth < 600) & (thickness > 6),
+        thickness < 1.5,
+        depth >= 600
+    ]
+    choices = ["露天开采", "长壁开采", "分层开采", "窄煤柱开采", "水力开采"]
+    return np.select(conditions, choices, default="房柱式开采")
 
 
 def determine_mining_method(layer: Dict) -> Dict:
@@ -198,35 +262,40 @@ def determine_mining_method(layer: Dict) -> Dict:
     Returns:
         推荐的开采方法
     """
-    depth = layer["start_depth"]
-    thickness = layer["thickness"]
-
-    # 决策逻辑
-    if depth < 50 and thickness > 2:
-        method = "露天开采"
-        description = "适用于浅层且较厚的煤层，成本低，回收率高。"
-    elif 50 <= depth < 300 and 1.5 <= thickness <= 8:
-        method = "长壁开采"
-        description = "适用于中等深度、厚度适中的煤层，产量高，安全性好。"
-    elif 100 <= depth < 600 and thickness > 6:
-        method = "分层开采"
-        description = "适用于中深度、较厚的煤层，可分批次开采，提高安全性。"
-    elif thickness < 1.5:
-        method = "窄煤柱开采"
-        description = "适用于薄煤层，可提高回收率，但成本较高。"
-    elif depth >= 600:
-        method = "水力开采"
-        description = "适用于深层煤层，通过高压水冲击煤层，安全性较高但成本高。"
-    else:
-        method = "房柱式开采"
-        description = "通用性强的开采方法，适应性好，但回收率较低。"
+    method = str(determine_mining_methods([layer["start_depth"]], [layer["thickness"]])[0])
 
     return {
         "name": method,
-        "description": description
+        "description": METHOD_DESCRIPTIONS[method]
     }
 
 
+def calculate_recovery_rates(difficulty: np.ndarray, methods: np.ndarray, base_rate: Union[float, np.ndarray] = 0.85,
+                             method_factors: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """
+    向量化计算预期回收率
+
+    Args:
+        difficulty: 各煤层开采难度得分数组
+        methods: 各煤层开采方法名称数组
+        base_rate: 基础回收率（标量或可与煤层维度广播的数组）
+        method_factors: 开采方法回收率因子，默认使用METHOD_FACTORS
+
+    Returns:
+        预期回收率数组(0-1之间的小数)
+    """
+    factors = METHOD_FACTORS if method_factors is None else method_factors
+
+    # 基于开采方法调整回收率
+    method_factor = np.array([factors.get(name, 1.0) for name in np.asarray(methods).tolist()], dtype=float)
+
+    # 基于难度调整回收率
+    difficulty_factor = np.maximum(0.7, 1 - np.asarray(difficulty, dtype=float) * 0.03)
+
+    # 计算最终回收率，但不超过95%
+    return np.minimum(0.95, np.asarray(base_rate, dtype=float) * method_factor * difficulty_factor)
+
+
 def calculate_recovery_rate(layer: Dict, method: Dict, base_rate: float = 0.85) -> float:
     """
     计算预期回收率
@@ -239,22 +308,59 @@ def calculate_recovery_rate(layer: Dict, method: Dict, base_rate: float = 0.85)
     Returns:
         预期回收率(0-1之间的小数)
     """
-    difficulty = layer["mining_difficulty"]["score"]
+    return float(calculate_recovery_rates([layer["mining_difficulty"]["score"]], [method["name"]], base_rate)[0])
 
-    # 基于开采方法调整回收率
-    method_factor = METHOD_FACTORS.get(method["name"], 1.0)
 
-    # 基于难度调整回收率
-    difficulty_factor = max(0.7, 1 - difficulty * 0.03)
+def evaluate_mining_scenarios(resource_data: Dict, areas: List[float], extraction_rates: List[float],
+                              method_factor_sets: Optional[List[Dict[str, float]]] = None) -> Dict:
+    """
+    对面积、提取率和开采方法回收率因子的所有组合一次性广播计算储量与预期产量
 
-    # 计算最终回收率，但不超过95%
-    recovery_rate = min(0.95, base_rate * method_factor * difficulty_factor)
+    Args:
+        resource_data: calculate_coal_resources的返回结果（任意面积）
+        areas: 煤层面积列表(平方米)
+        extraction_rates: 提取率（即回收率计算中的基础回收率）列表
+        method_factor_sets: 对METHOD_FACTORS的覆盖列表，每项只需给出要修改的方法，默认不覆盖
+
+    Returns:
+        结果矩阵：expected_output_tons按[面积][提取率][因子组]排列，
+        recovery_rate（与面积无关）按[提取率][因子组]排列
+    """
+    layers = resource_data["layers"]
+    method_factor_sets = method_factor_sets or [{}]
+    areas = np.asarray(areas, dtype=float)
+    rates = np.asarray(extraction_rates, dtype=float)
+
+    # 储量与面积成正比，先换算到单位面积
+    base_area = resource_data["area_square_meters"] or 1.0
+    resources_per_area = resource_data["total_resources"] / base_area
+    mass_per_area = layers.mass_tons / base_area
+
+    # 回收率矩阵：[提取率, 因子组, 煤层]
+    methods = determine_mining_methods(layers.start_depth, layers.thickness)
+    recovery = np.stack([calculate_recovery_rates(layers.difficulty_score, methods, rates[:, None],
+                                                  {**METHOD_FACTORS, **overrides})
+                         for overrides in method_factor_sets], axis=1)
+
+    # 预期产量：[面积, 提取率, 因子组]
+    output_per_area = recovery @ mass_per_area
+    expected_output = areas[:, None, None] * output_per_area[None, :, :]
+    total_mass_per_area = mass_per_area.sum()
+    overall_recovery = output_per_area / total_mass_per_area if total_mass_per_area else np.zeros_like(output_per_area)
 
-    return recovery_rate
+    return {
+        "areas": areas.tolist(),
+        "extraction_rates": rates.tolist(),
+        "method_factor_sets": method_factor_sets,
+        "layers_count": len(layers),
+        "total_resources": (areas * resources_per_area).tolist(),
+        "expected_output_tons": expected_output.tolist(),
+        "recovery_rate": (overall_recovery * 100).tolist()  # 百分比
+    }
 
 
-def _create_priority_chart(layer_numbers: List[str], qualities: List[float],
-                           difficulties: List[float], priorities: List[float]) -> str:
+def _create_priority_chart(layer_numbers: List[str], qualities: np.ndarray,
+                           difficulties: np.ndarray, priorities: np.ndarray) -> str:
     """创建优先级分析图表"""
     set_chinese_font()
 
@@ -276,134 +382,319 @@ def _create_priority_chart(layer_numbers: List[str], qualities: List[float],
     return plot_to_base64(fig)
 
 
-def optimize_mining_plan(coal_layers: List[Dict], extraction_rate: float = 0.85) -> Dict:
+def optimize_mining_plan(coal_layers: Union[LayerTable, List[Dict]], extraction_rate: float = 0.85,
+                         annual_capacity: Optional[float] = None, include_chart: bool = True,
+                         **schedule_options) -> Dict:
     """
     优化开采顺序和方法
 
     Args:
-        coal_layers: 煤层数据列表
+        coal_layers: 煤层数据表（也兼容煤层字典列表）
         extraction_rate: 提取率
+        annual_capacity: 年产能(吨)，给出时附加按产能和顺序约束生成的分期开采计划
+        include_chart: 是否绘制优先级分析图表
+        schedule_options: 传给schedule_mining的其他参数（discount_rate、max_periods、time_budget等）
 
     Returns:
         优化的开采规划
     """
-    # 准备数据
-    layers = sorted(coal_layers, key=lambda x: x["start_depth"])
-    layer_numbers = [f"煤层{l['layer_number']}" for l in layers]
-    qualities = [l["quality"]["score"] for l in layers]
-    difficulties = [l["mining_difficulty"]["score"] * 10 for l in layers]  # 缩放为0-100
-    resources = [l["mass_tons"] / 1000 for l in layers]  # 转换为千吨
-
-    # 计算优先级得分 = 品质 * 0.5 + (100-难度) * 0.3 + 储量占比 * 0.2
-    max_resource = max(resources) if resources else 1
-    priorities = []
-    for i in range(len(layers)):
-        resource_factor = resources[i] / max_resource * 100
-        priority = qualities[i] * 0.5 + (100 - difficulties[i]) * 0.3 + resource_factor * 0.2
-        priorities.append(priority)
+    if not isinstance(coal_layers, LayerTable):
+        coal_layers = LayerTable.from_records(coal_layers)
 
-        # 排序并生成开采顺序建议
-    combined_data = list(zip(layer_numbers, qualities, difficulties, resources, priorities, layers))
-    ordered_layers = sorted(combined_data, key=lambda x: x[4], reverse=True)
+        # 准备数据
+    layers = coal_layers.sort_by("start_depth")
+    layer_numbers = [f"煤层{n}" for n in layers.layer_number.tolist()]
 
-    mining_plan = []
-    for i, (name, quality, difficulty, resource, priority, layer) in enumerate(ordered_layers):
-        # 计算最佳开采方法
-        method = determine_mining_method(layer)
+    # 计算优先级得分 = 品质 * 0.5 + (100-难度) * 0.3 + 储量占比 * 0.2
+    priorities = layers.priority_scores()
 
-        # 计算预期回收率
-        recovery_rate = calculate_recovery_rate(layer, method, extraction_rate)
+    # 排序并生成开采顺序建议
+    order = np.argsort(-priorities, kind='stable')
+    ordered = layers.take(order)
+    ordered_priorities = priorities[order]
 
-        # 预期产量
-        expected_output = layer["mass_tons"] * recovery_rate
+    # 向量化计算开采方法、回收率和预期产量
+    methods = determine_mining_methods(ordered.start_depth, ordered.thickness)
+    recovery_rates = calculate_recovery_rates(ordered.difficulty_score, methods, extraction_rate)
+    expected_outputs = ordered.mass_tons * recovery_rates
 
+    mining_plan = []
+    for i, layer in enumerate(ordered.to_records()):
+        method = str(methods[i])
         mining_plan.append({
             "order": i + 1,
             "layer": layer["layer_number"],
             "depth_range": f"{layer['start_depth']:.1f}m - {layer['end_depth']:.1f}m",
-            "quality_score": float(quality),
-            "difficulty_score": float(difficulty / 10),  # 转回1-10分
-            "resource_ktons": float(resource),
-            "priority_score": float(priority),
-            "recommended_method": method["name"],
-            "method_details": method["description"],
-            "expected_recovery_rate": float(recovery_rate * 100),  # 百分比
-            "expected_output_tons": float(expected_output)
+            "quality_score": float(layer["quality"]["score"]),
+            "difficulty_score": float(layer["mining_difficulty"]["score"]),
+            "resource_ktons": float(layer["mass_tons"] / 1000),
+            "priority_score": float(ordered_priorities[i]),
+            "recommended_method": method,
+            "method_details": METHOD_DESCRIPTIONS[method],
+            "expected_recovery_rate": float(recovery_rates[i] * 100),  # 百分比
+            "expected_output_tons": float(expected_outputs[i])
         })
 
         # 绘制优先级分析图表
-    plot_data = _create_priority_chart(layer_numbers, qualities, difficulties, priorities)
+    plot_data = _create_priority_chart(layer_numbers, layers.quality_score,
+                                       layers.difficulty_score * 10,  # 缩放为0-100
+                                       priorities) if include_chart else ''
 
-    return {
+    result = {
         "mining_plan": mining_plan,
         "priority_chart": plot_data
     }
+    if annual_capacity:
+        result["schedule"] = schedule_mining(coal_layers, annual_capacity, extraction_rate, **schedule_options)
+    return result
 
 
-def predict_resource_trend(resource_history: List[Dict]) -> Optional[Dict]:
+def _chain_blocks(values: np.ndarray, tons: np.ndarray, deadline: float) -> List[Tuple[float, float, List[int]]]:
     """
-    基于历史数据预测未来储量变化趋势
+    将一口井内按深度排序的煤层分解为产出密度（产量/吨位）单调不增的连续块
+
+    相邻块若后者密度更高则合并，这样每块都是当前剩余链上密度最高的前缀；
+    超过deadline时不再合并，剩余煤层按深度顺序各自成块。
+    """
+    blocks = []
+    for i in range(len(values)):
+        value, ton, members = float(values[i]), float(tons[i]), [i]
+        if time.perf_counter() < deadline:
+            while blocks and blocks[-1][0] * ton <= value * blocks[-1][1]:
+                prev_value, prev_ton, prev_members = blocks.pop()
+                value, ton, members = prev_value + value, prev_ton + ton, prev_members + members
+        blocks.append((value, ton, members))
+    return blocks
+
+
+def _discounted_tons(position: np.ndarray, capacity: float, discount: float) -> np.ndarray:
+    """累计开采position吨时的折现吨位（每期产能capacity，每期折现因子discount）"""
+    full_periods = np.floor(position / capacity)
+    factor = discount ** full_periods
+    if discount == 1:
+        full = full_periods * capacity
+    else:
+        full = capacity * (1 - factor) / (1 - discount)
+    return full + (position - full_periods * capacity) * factor
+
+
+def schedule_mining(coal_layers: LayerTable, annual_capacity: float, extraction_rate: float = 0.85,
+                    discount_rate: float = 0.08, max_periods: int = 30,
+                    well_ids: Optional[np.ndarray] = None, time_budget: float = 2.0) -> Dict:
+    """
+    在年产能和开采顺序约束下生成多期开采计划，使折现预期产量最大
+
+    约束：每期开采的原煤吨位不超过annual_capacity；同一口井内浅部煤层采完才能开采更深的煤层。
+    每口井的煤层链先分解为产出密度单调不增的块，再把所有井的块按密度从高到低排列，
+    得到满足顺序约束的开采序列，最后按产能切分到各期。复杂度O(n log n)。
 
     Args:
-        resource_history: 资源历史记录列表
+        coal_layers: 煤层数据表（可由多口井的表拼接而成）
+        annual_capacity: 每期（年）最大开采吨位
+        extraction_rate: 提取率（回收率计算中的基础回收率）
+        discount_rate: 每期折现率
+        max_periods: 最大规划期数，超出部分计入unscheduled_tons
+        well_ids: 每个煤层所属井的编号，默认全部属于同一口井
+        time_budget: 计算时间预算(秒)，超时后剩余煤层直接按深度顺序排列
 
     Returns:
-        趋势预测结果，如果数据不足则返回None
+        包含分期开采计划、折现产量、上界及最优性差距的字典
     """
-    if len(resource_history) < 2:
-        return None
+    started = time.perf_counter()
+    deadline = started + time_budget
+    if annual_capacity <= 0:
+        raise ValueError("annual_capacity必须大于0")
+
+    n = len(coal_layers)
+    well_ids = np.zeros(n, dtype=int) if well_ids is None else np.asarray(well_ids)
+    methods = determine_mining_methods(coal_layers.start_depth, coal_layers.thickness)
+    tons = coal_layers.mass_tons
+    values = tons * calculate_recovery_rates(coal_layers.difficulty_score, methods, extraction_rate)
+    discount = 1 / (1 + discount_rate)
+
+    # 按井、深度排序后拆分为各井的煤层链
+    chain_order = np.lexsort((coal_layers.start_depth, well_ids))
+    split_points = np.flatnonzero(np.diff(well_ids[chain_order])) + 1
+    blocks = []
+    for chain in np.split(chain_order, split_points) if n else []:
+        chain_blocks = _chain_blocks(values[chain], tons[chain], deadline)
+        ratios = np.array([value / ton if ton else np.inf for value, ton, _ in chain_blocks])
+        # 取链内累计最小值，超时未合并时也保证同一链内的排序键单调不增
+        for ratio, (_, _, members) in zip(np.minimum.accumulate(ratios), chain_blocks):
+            blocks.append((ratio, chain[members]))
+
+    # 块按密度从高到低排列（同一链内排序键单调不增，稳定排序保证顺序约束）
+    block_ratios = np.array([ratio for ratio, _ in blocks], dtype=float)
+    block_order = np.argsort(-block_ratios, kind='stable')
+    sequence = np.concatenate([blocks[i][1] for i in block_order]) if blocks else np.empty(0, dtype=int)
+
+    # 按产能切分到各期
+    horizon = annual_capacity * max_periods
+    seq_tons = tons[sequence]
+    seq_density = np.divide(values[sequence], seq_tons, out=np.zeros(len(sequence)), where=seq_tons > 0)
+    ends = np.minimum(np.cumsum(seq_tons), horizon)
+    starts = np.minimum(np.concatenate(([0.0], np.cumsum(seq_tons)[:-1])), horizon)
+    discounted = seq_density * (_discounted_tons(ends, annual_capacity, discount) -
+                                _discounted_tons(starts, annual_capacity, discount))
+
+    # 上界：忽略顺序约束，全部煤层按产出密度排列
+    bound_order = np.argsort(-seq_density, kind='stable')
+    bound_ends = np.minimum(np.cumsum(seq_tons[bound_order]), horizon)
+    bound_starts = np.concatenate(([0.0], bound_ends[:-1]))
+    upper_bound = float(np.sum(seq_density[bound_order] * (
+        _discounted_tons(bound_ends, annual_capacity, discount) -
+        _discounted_tons(bound_starts, annual_capacity, discount))))
+
+    periods = []
+    first_period = np.floor(starts / annual_capacity).astype(int)
+    last_period = np.minimum(np.ceil(ends / annual_capacity).astype(int), max_periods)
+    for i, layer in enumerate(sequence.tolist()):
+        for period in range(first_period[i], last_period[i]):
+            amount = min(ends[i], (period + 1) * annual_capacity) - max(starts[i], period * annual_capacity)
+            if amount <= 0:
+                continue
+            while len(periods) <= period:
+                periods.append({"period": len(periods) + 1, "tons": 0.0, "expected_output_tons": 0.0,
+                                "discounted_output_tons": 0.0, "extractions": []})
+            output = amount * seq_density[i]
+            entry = periods[period]
+            entry["tons"] += float(amount)
+            entry["expected_output_tons"] += float(output)
+            entry["discounted_output_tons"] += float(output * discount ** period)
+            entry["extractions"].append({
+                "well": well_ids[layer].item(),
+                "layer": int(coal_layers.layer_number[layer]),
+                "tons": float(amount),
+                "expected_output_tons": float(output)
+            })
+
+    total_discounted = float(discounted.sum())
+    return {
+        "periods": periods,
+        "sequence": [{"well": well_ids[i].item(), "layer": int(coal_layers.layer_number[i])}
+                     for i in sequence.tolist()],
+        "total_expected_output_tons": float(np.sum(seq_density * (ends - starts))),
+        "total_discounted_output_tons": total_discounted,
+        "upper_bound_discounted_output_tons": upper_bound,
+        "optimality_gap": float((upper_bound - total_discounted) / upper_bound) if upper_bound > 0 else 0.0,
+        "unscheduled_tons": float(max(0.0, seq_tons.sum() - horizon)),
+        "time_budget_exhausted": time.perf_counter() > deadline,
+        "elapsed_seconds": float(time.perf_counter() - started)
+    }
 
-        # 设置中文字体
-    set_chinese_font()
 
-    # 创建数据框处理时间序列
-    df = pd.DataFrame([
-        {"date": datetime.strptime(record["timestamp"], "%Y-%m-%d %H:%M:%S"),
-         "resources": record["total_resources"]}
-        for record in resource_history
-    ])
+def update_trend_stats(stats: Optional[Dict], record: Dict) -> Dict:
+    """
+    用一条资源记录O(1)更新趋势模型的充分统计量
 
-    # 计算起始日期以来的天数
-    df['days'] = (df['date'] - df['date'].min()).dt.days
+    Args:
+        stats: 已有的统计量，首次调用传None
+        record: 包含timestamp和total_resources的资源记录
 
-    # 准备建模数据
-    X = df['days'].values.reshape(-1, 1)
-    y = df['resources'].values
+    Returns:
+        更新后的统计量（x为距首条记录的天数，y为储量）
+    """
+    date = datetime.strptime(record["timestamp"], "%Y-%m-%d %H:%M:%S")
+    if stats is None:
+        stats = {"origin": date, "n": 0, "sum_x": 0.0, "sum_y": 0.0, "sum_xy": 0.0, "sum_xx": 0.0}
+
+    x = float((date - stats["origin"]).days)
+    y = float(record["total_resources"])
+    stats["n"] += 1
+    stats["sum_x"] += x
+    stats["sum_y"] += y
+    stats["sum_xy"] += x * y
+    stats["sum_xx"] += x * x
+    stats["last_date"] = date
+    stats["last_value"] = y
+    return stats
+
+
+def trend_from_stats(stats: Dict) -> Optional[Dict]:
+    """
+    由充分统计量闭式求解最小二乘线性趋势并预测未来180天的储量
 
-    # 线性回归预测
-    model = LinearRegression()
-    model.fit(X, y)
+    Args:
+        stats: update_trend_stats维护的统计量
+
+    Returns:
+        趋势预测结果（不含图表），如果数据不足则返回None
+    """
+    if stats is None or stats["n"] < 2:
+        return None
+
+    n = stats["n"]
+    denominator = n * stats["sum_xx"] - stats["sum_x"] ** 2
+    slope = (n * stats["sum_xy"] - stats["sum_x"] * stats["sum_y"]) / denominator if denominator else 0.0
+    intercept = (stats["sum_y"] - slope * stats["sum_x"]) / n
 
     # 预测未来180天的资源趋势
-    future_days = np.array(list(range(0, 180, 30))).reshape(-1, 1)
-    predicted_resources = model.predict(future_days)
+    future_days = np.arange(0, 180, 30)
+    predicted_resources = intercept + slope * future_days
 
     # 计算枯竭日期（如果有消耗趋势）
     depletion_date = None
-    if model.coef_[0] < 0:  # 如果斜率为负（储量在减少）
-        days_to_depletion = -y[-1] / model.coef_[0]
-        last_date = df['date'].iloc[-1]
-        depletion_date = (last_date + timedelta(days=float(days_to_depletion))).strftime("%Y-%m-%d")
-
-        # 生成趋势图
-    plt.figure(figsize=(10, 6))
-    plt.scatter(X, y, color='blue', label='历史数据')
-    plt.plot(future_days, predicted_resources, color='red', linestyle='--', label='预测趋势')
+    if slope < 0:  # 如果斜率为负（储量在减少）
+        days_to_depletion = -stats["last_value"] / slope
+        depletion_date = (stats["last_date"] + timedelta(days=float(days_to_depletion))).strftime("%Y-%m-%d")
+
+    return {
+        "model_slope": float(slope),
+        "model_intercept": float(intercept),
+        "predicted_values": [float(x) for x in predicted_resources.tolist()],
+        "prediction_days": [int(x) for x in future_days.tolist()],
+        "depletion_date": depletion_date
+    }
+
+
+def generate_trend_chart(resource_history: List[Dict], trend: Dict) -> str:
+    """
+    绘制储量历史数据与预测趋势图
+
+    Args:
+        resource_history: 资源历史记录列表
+        trend: trend_from_stats的返回结果
+
+    Returns:
+        base64编码的趋势图
+    """
+    set_chinese_font()
+
+    origin = datetime.strptime(resource_history[0]["timestamp"], "%Y-%m-%d %H:%M:%S")
+    days = [(datetime.strptime(r["timestamp"], "%Y-%m-%d %H:%M:%S") - origin).days for r in resource_history]
+    resources = [r["total_resources"] for r in resource_history]
+
+    fig = plt.figure(figsize=(10, 6))
+    plt.scatter(days, resources, color='blue', label='历史数据')
+    plt.plot(trend["prediction_days"], trend["predicted_values"], color='red', linestyle='--', label='预测趋势')
     plt.title('煤炭资源储量变化趋势')
     plt.xlabel('时间（天）')
     plt.ylabel('储量（吨）')
     plt.legend()
     plt.grid(True)
 
-    # 将图表转换为base64编码
-    fig = plt.gcf()
-    trend_chart = plot_to_base64(fig)
+    return plot_to_base64(fig)
 
-    return {
-        "model_slope": float(model.coef_[0]),
-        "model_intercept": float(model.intercept_),
-        "predicted_values": [float(x) for x in predicted_resources.tolist()],
-        "prediction_days": [int(x[0]) for x in future_days.tolist()],
-        "trend_chart": trend_chart,
-        "depletion_date": depletion_date
-    }
\ No newline at end of file
+
+def predict_resource_trend(resource_history: List[Dict], include_chart: bool = True) -> Optional[Dict]:
+    """
+    基于历史数据预测未来储量变化趋势
+
+    Args:
+        resource_history: 资源历史记录列表
+        include_chart: 是否生成趋势图
+
+    Returns:
+        趋势预测结果，如果数据不足则返回None
+    """
+    if len(resource_history) < 2:
+        return None
+
+    stats = None
+    for record in resource_history:
+        stats = update_trend_stats(stats, record)
+
+    trend = trend_from_stats(stats)
+    if include_chart:
+        trend["trend_chart"] = generate_trend_chart(resource_history, trend)
+    return trend
@@ -0,0 +1,183 @@
+# seam_correlation.py - 多井煤层对比
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# 默认对比参数
+DEFAULT_CORRELATION_PARAMS = {
+    'signature_points': 32,     # 每个煤层特征曲线的采样点数
+    'margin': 1.0,              # 特征曲线向煤层顶底各延伸的深度(米)，包含顶底板的响应
+    'band': 4,                  # DTW的Sakoe-Chiba带宽(采样点)
+    'max_depth_offset': 50.0,   # 两井煤层中点深度差超过该值(米)时不比较
+    'max_thickness_ratio': 3.0, # 两井煤层厚度比超过该值时不比较
+    'max_distance': 1.0,        # 归一化DTW距离超过该值时不视为同一煤层
+    'gap_penalty': 0.8          # 层序对齐中跳过一个煤层的代价
+}
+
+
+def layer_signatures(depth, gamma, density, layers, params: Optional[Dict] = None) -> Dict:
+    """
+    计算井内各煤层的特征曲线
+
+    自然伽玛和密度先按全井均值和标准差标准化，再在[顶-margin, 底+margin]区间上插值到固定点数，
+    得到形状为(煤层数, 点数, 2)的特征曲线。
+
+    Args:
+        depth, gamma, density: 全井的深度和指标序列
+        layers: [{'start', 'end', ...}]，按深度排序的煤层
+    """
+    params = {**DEFAULT_CORRELATION_PARAMS, **(params or {})}
+    depth = np.asarray(depth, dtype=float)
+    order = np.argsort(depth, kind='stable')
+    depth = depth[order]
+
+    curves = []
+    for values in (gamma, density):
+        values = np.asarray(values, dtype=float)[order]
+        valid = ~np.isnan(values)
+        mean = values[valid].mean() if valid.any() else 0.0
+        std = values[valid].std() if valid.any() else 0.0
+        curves.append(((values - mean) / (std or 1.0), valid))
+
+    starts = np.array([layer['start'] for layer in layers], dtype=float)
+    ends = np.array([layer['end'] for layer in layers], dtype=float)
+    fractions = np.linspace(0.0, 1.0, int(params['signature_points']))
+    sample_depths = (starts - params['margin'])[:, None] + \
+        ((ends - starts) + 2 * params['margin'])[:, None] * fractions[None, :]
+
+    signatures = np.zeros((len(layers), fractions.size, 2))
+    for k, (values, valid) in enumerate(curves):
+        if valid.sum() >= 2:
+            signatures[:, :, k] = np.interp(sample_depths, depth[valid], values[valid])
+
+    return {
+        'signatures': signatures,
+        'starts': starts,
+        'ends': ends,
+        'thickness': ends - starts,
+        'mid_depth': (starts + ends) / 2
+    }
+
+
+def banded_dtw(x, y, band: int) -> np.ndarray:
+    """
+    批量计算等长多维序列对的带约束DTW距离（按路径长度归一化）
+
+    Args:
+        x, y: 形状为(对数, 点数, 维数)的数组
+        band: Sakoe-Chiba带宽
+
+    Returns:
+        形状为(对数,)的距离数组
+    """
+    pairs, n = x.shape[0], x.shape[1]
+    cost = np.sqrt(((x[:, :, None, :] - y[:, None, :, :]) ** 2).sum(axis=3))
+    total = np.full((pairs, n + 1, n + 1), np.inf)
+    total[:, 0, 0] = 0.0
+    for i in range(1, n + 1):
+        for j in range(max(1, i - band), min(n, i + band) + 1):
+            total[:, i, j] = cost[:, i - 1, j - 1] + np.minimum(
+                np.minimum(total[:, i - 1, j], total[:, i - 1, j - 1]), total[:, i, j - 1])
+    return total[:, n, n] / (2 * n)
+
+
+def pairwise_layer_distances(well_a: Dict, well_b: Dict, params: Optional[Dict] = None) -> np.ndarray:
+    """
+    计算两井所有煤层对的DTW距离矩阵
+
+    中点深度差或厚度比超出阈值的煤层对直接剪枝（距离为inf），只对剩余的对批量计算DTW。
+    """
+    params = {**DEFAULT_CORRELATION_PARAMS, **(params or {})}
+    distances = np.full((well_a['starts'].size, well_b['starts'].size), np.inf)
+    if distances.size == 0:
+        return distances
+
+    thick_a = np.maximum(well_a['thickness'], 0.05)[:, None]
+    thick_b = np.maximum(well_b['thickness'], 0.05)[None, :]
+    candidates = ((np.abs(well_a['mid_depth'][:, None] - well_b['mid_depth'][None, :]) <= params['max_depth_offset'])
+                  & (np.maximum(thick_a / thick_b, thick_b / thick_a) <= params['max_thickness_ratio']))
+    index_a, index_b = np.nonzero(candidates)
+    if index_a.size:
+        distances[index_a, index_b] = banded_dtw(well_a['signatures'][index_a], well_b['signatures'][index_b],
+                                                 int(params['band']))
+    return distances
+
+
+def align_layer_sequences(distances: np.ndarray, params: Optional[Dict] = None) -> List[Dict]:
+    """
+    按层序对齐两井的煤层（煤层不交叉匹配），返回匹配的煤层对
+
+    动态规划最小化 匹配距离之和 + 跳过煤层的代价，距离超过max_distance的对不能匹配。
+    """
+    params = {**DEFAULT_CORRELATION_PARAMS, **(params or {})}
+    count_a, count_b = distances.shape
+    gap = params['gap_penalty']
+    match_cost = np.where(distances <= params['max_distance'], distances, np.inf)
+
+    total = np.zeros((count_a + 1, count_b + 1))
+    total[:, 0] = np.arange(count_a + 1) * gap
+    total[0, :] = np.arange(count_b + 1) * gap
+    for i in range(1, count_a + 1):
+        for j in range(1, count_b + 1):
+            total[i, j] = min(total[i - 1, j - 1] + match_cost[i - 1, j - 1],
+                              total[i - 1, j] + gap, total[i, j - 1] + gap)
+
+    matches = []
+    i, j = count_a, count_b
+    while i > 0 and j > 0:
+        if total[i, j] == total[i - 1, j - 1] + match_cost[i - 1, j - 1]:
+            matches.append({'layer_a': i - 1, 'layer_b': j - 1, 'distance': float(distances[i - 1, j - 1])})
+            i, j = i - 1, j - 1
+        elif total[i, j] == total[i - 1, j] + gap:
+            i -= 1
+        else:
+            j -= 1
+    return matches[::-1]
+
+
+def correlate_well_pair(well_a: Dict, well_b: Dict, params: Optional[Dict] = None) -> List[Dict]:
+    """对比两口井的煤层，返回按层序对齐的匹配列表[{'layer_a', 'layer_b', 'distance'}]（煤层下标从0开始）"""
+    return align_layer_sequences(pairwise_layer_distances(well_a, well_b, params), params)
+
+
+def build_seam_groups(layer_counts: Dict[str, int], pair_matches: Dict) -> List[List]:
+    """
+    把两两匹配结果合并为跨井煤层组
+
+    按距离从小到大合并匹配对，同一组内每口井最多一个煤层，冲突的匹配被舍弃。
+
+    Args:
+        layer_counts: {井名: 煤层数}
+        pair_matches: {(井A, 井B): correlate_well_pair的结果}
+
+    Returns:
+        [[(井名, 煤层下标), ...]]，按组内平均匹配距离排序，只包含至少两口井的组
+    """
+    parent = {(well, i): (well, i) for well, count in layer_counts.items() for i in range(count)}
+    wells_of = {node: {node[0]} for node in parent}
+    distance_sum = {node: 0.0 for node in parent}
+    match_count = {node: 0 for node in parent}
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    edges = sorted(((match['distance'], (well_a, match['layer_a']), (well_b, match['layer_b']))
+                    for (well_a, well_b), matches in pair_matches.items() for match in matches),
+                   key=lambda edge: edge[0])
+    for distance, node_a, node_b in edges:
+        root_a, root_b = find(node_a), find(node_b)
+        if root_a == root_b or wells_of[root_a] & wells_of[root_b]:
+            continue
+        parent[root_b] = root_a
+        wells_of[root_a] |= wells_of.pop(root_b)
+        distance_sum[root_a] += distance_sum.pop(root_b) + distance
+        match_count[root_a] += match_count.pop(root_b) + 1
+
+    groups = {}
+    for node in parent:
+        groups.setdefault(find(node), []).append(node)
+    return sorted((sorted(members) for root, members in groups.items() if len(members) > 1),
+                  key=lambda members: distance_sum[find(members[0])] / match_count[find(members[0])])
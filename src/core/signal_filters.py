@@ -0,0 +1,106 @@
+# signal_filters.py - 测井曲线滑动窗口滤波
+from typing import Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 滑动中值按行分块计算，限制窗口展开后的临时内存
+MEDIAN_BLOCK_ROWS = 65536
+
+
+def _odd_window(window) -> int:
+    """窗口长度取奇数，保证以当前样本为中心"""
+    window = max(1, int(window))
+    return window if window % 2 else window + 1
+
+
+def moving_average(values, window: int) -> np.ndarray:
+    """
+    居中滑动平均（累积和实现，复杂度与窗口长度无关）
+
+    边缘处窗口截断为实际可用的样本，NaN不参与平均。
+    """
+    values = np.asarray(values, dtype=float)
+    half = _odd_window(window) // 2
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+
+    index = np.arange(values.size)
+    lower = np.clip(index - half, 0, values.size)
+    upper = np.clip(index + half + 1, 0, values.size)
+    window_counts = counts[upper] - counts[lower]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_counts > 0, (sums[upper] - sums[lower]) / window_counts, np.nan)
+
+
+def _window_rows(values, window: int):
+    """按块生成居中窗口视图（边缘用端点值填充），返回(起始行, 窗口矩阵)"""
+    half = window // 2
+    padded = np.pad(values, half, mode='edge')
+    windows = sliding_window_view(padded, window)
+    for start in range(0, values.size, MEDIAN_BLOCK_ROWS):
+        yield start, windows[start:start + MEDIAN_BLOCK_ROWS]
+
+
+def rolling_median(values, window: int) -> np.ndarray:
+    """居中滑动中值（stride tricks窗口视图上的向量化中值，边缘用端点值填充）"""
+    values = np.asarray(values, dtype=float)
+    window = _odd_window(window)
+    if window == 1 or values.size == 0:
+        return values.copy()
+
+    result = np.empty_like(values)
+    for start, rows in _window_rows(values, window):
+        result[start:start + rows.shape[0]] = np.median(rows, axis=1)
+    return result
+
+
+def despike(values, window: int, threshold: float = 3.0) -> np.ndarray:
+    """
+    Hampel去尖峰：与窗口中值的偏差超过threshold倍稳健标准差(1.4826×MAD)的样本替换为窗口中值
+    """
+    values = np.asarray(values, dtype=float)
+    window = _odd_window(window)
+    if window == 1 or values.size == 0:
+        return values.copy()
+
+    result = values.copy()
+    for start, rows in _window_rows(values, window):
+        stop = start + rows.shape[0]
+        medians = np.median(rows, axis=1)
+        mad = np.median(np.abs(rows - medians[:, None]), axis=1)
+        spikes = np.abs(values[start:stop] - medians) > threshold * 1.4826 * mad
+        result[start:stop] = np.where(spikes, medians, values[start:stop])
+    return result
+
+
+FILTERS = {
+    'median': lambda values, spec: rolling_median(values, spec.get('window', 5)),
+    'mean': lambda values, spec: moving_average(values, spec.get('window', 5)),
+    'despike': lambda values, spec: despike(values, spec.get('window', 7), spec.get('threshold', 3.0))
+}
+
+
+def apply_signal_filters(data, signal_filters: Optional[Dict[str, List[Dict]]] = None):
+    """
+    按指标依次应用滤波器，返回滤波后的副本（未配置的指标保持不变）
+
+    Args:
+        data: 钻孔数据DataFrame（应已按深度规整为等间隔）
+        signal_filters: {指标列名: [{'type': 'despike'/'median'/'mean', 'window': 样本数, 'threshold': 阈值}]}
+    """
+    if not signal_filters:
+        return data
+
+    data = data.copy()
+    for column, steps in signal_filters.items():
+        if column not in data.columns:
+            continue
+        values = data[column].to_numpy(dtype=float)
+        for spec in steps:
+            if spec.get('type') not in FILTERS:
+                raise ValueError(f"未知的滤波器类型: {spec.get('type')}")
+            values = FILTERS[spec['type']](values, spec)
+        data[column] = values
+    return data
@@ -0,0 +1,175 @@
+# soil_zoning.py - 多井土壤分区聚类
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+from agriculture import soil_type_from_properties
+from utils import write_json_atomic
+
+# 聚类特征：电阻率取log1p后再标准化，避免高阻层主导距离
+SOIL_ZONE_FEATURES = ['密度', '自然伽玛', '双侧向电阻率']
+
+# 默认分区参数
+DEFAULT_ZONING_PARAMS = {
+    'n_zones': 5,                   # 分区数
+    'batch_size': 2048,             # 小批量KMeans的批大小
+    'max_samples_per_well': 20000,  # 每口井参与拟合的最多样本数（超出时等间隔抽取）
+    'max_iter': 100,
+    'n_init': 3,
+    'random_state': 0
+}
+
+# 分区判别时每次计算的样本数，限制(样本数 × 分区数)距离矩阵的内存
+ASSIGN_CHUNK_SIZE = 262144
+
+
+def soil_features(data, coal_mask=None):
+    """
+    取非煤样本的聚类特征
+
+    Args:
+        data: 包含深度和SOIL_ZONE_FEATURES各列的数据（DataFrame或{列名: 序列}）
+        coal_mask: 煤层样本掩码，None时使用全部样本
+
+    Returns:
+        (深度, 形状(样本数, 3)的特征)，只包含三个特征都不缺失的样本，电阻率为log1p变换后的值
+    """
+    depths = np.asarray(data['深度'], dtype=float)
+    features = np.column_stack([np.asarray(data[column], dtype=float) for column in SOIL_ZONE_FEATURES])
+    features[:, 2] = np.log1p(np.maximum(features[:, 2], 0.0))
+    keep = ~np.isnan(features).any(axis=1)
+    if coal_mask is not None:
+        keep &= ~np.asarray(coal_mask, dtype=bool)
+    return depths[keep], features[keep]
+
+
+def zone_model_id(well_features: Dict[str, np.ndarray], params: Optional[Dict] = None) -> str:
+    """按参与拟合的各井特征和分区参数计算模型标识，相同的输入总是得到相同的模型"""
+    params = {**DEFAULT_ZONING_PARAMS, **(params or {})}
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8'))
+    for name in sorted(well_features):
+        digest.update(name.encode('utf-8'))
+        digest.update(np.ascontiguousarray(well_features[name], dtype=float).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def fit_soil_zones(well_features: Dict[str, np.ndarray], params: Optional[Dict] = None) -> Dict:
+    """
+    用小批量KMeans对多口井的非煤样本聚类，得到土壤分区模型
+
+    每口井最多抽取max_samples_per_well个样本，特征按全部抽样样本的均值和标准差标准化。
+    分区按中心的伽马值从低到高编号（从1开始），模型只含中心和标准化参数，可直接序列化为JSON。
+
+    Args:
+        well_features: {井名: soil_features返回的特征}
+        params: 覆盖DEFAULT_ZONING_PARAMS的参数
+
+    Returns:
+        {'model_id', 'wells', 'params', 'mean', 'scale', 'centers', 'zones': [{'zone', 'samples', 'density',
+         'gamma', 'resistivity', 'soil_type'}]}
+    """
+    params = {**DEFAULT_ZONING_PARAMS, **(params or {})}
+    limit = max(1, int(params['max_samples_per_well']))
+    sampled = [features[::int(np.ceil(len(features) / limit))] for features in well_features.values()
+               if len(features)]
+    if not sampled:
+        raise ValueError('没有可用于分区的土壤样本')
+    samples = np.concatenate(sampled)
+    n_zones = int(params['n_zones'])
+    if n_zones < 1 or n_zones > len(samples):
+        raise ValueError(f'分区数需在1到{len(samples)}之间')
+
+    mean = samples.mean(axis=0)
+    scale = samples.std(axis=0)
+    scale[scale == 0] = 1.0
+    kmeans = MiniBatchKMeans(n_clusters=n_zones, batch_size=int(params['batch_size']),
+                             max_iter=int(params['max_iter']), n_init=int(params['n_init']),
+                             random_state=params['random_state'])
+    labels = kmeans.fit_predict((samples - mean) / scale)
+
+    # 按原始单位的伽马值排序分区
+    centers = kmeans.cluster_centers_ * scale + mean
+    order = np.argsort(centers[:, 1], kind='stable')
+    counts = np.bincount(labels, minlength=n_zones)
+    zones = [{
+        'zone': rank + 1,
+        'samples': int(counts[k]),
+        'density': round(float(centers[k, 0]), 3),
+        'gamma': round(float(centers[k, 1]), 2),
+        'resistivity': round(float(np.expm1(centers[k, 2])), 2),
+        'soil_type': soil_type_from_properties(centers[k, 0], centers[k, 1])
+    } for rank, k in enumerate(order)]
+
+    return {
+        'model_id': zone_model_id(well_features, params),
+        'wells': sorted(well_features),
+        'params': params,
+        'mean': mean.tolist(),
+        'scale': scale.tolist(),
+        'centers': kmeans.cluster_centers_[order].tolist(),
+        'zones': zones
+    }
+
+
+def assign_soil_zones(model: Dict, features) -> np.ndarray:
+    """按最近的分区中心判别样本所属分区（不重新拟合），返回从1开始的分区编号"""
+    features = np.asarray(features, dtype=float).reshape(-1, len(SOIL_ZONE_FEATURES))
+    mean, scale = np.asarray(model['mean']), np.asarray(model['scale'])
+    centers = np.asarray(model['centers'])
+    center_norms = (centers ** 2).sum(axis=1)
+
+    # |x - c|² = |x|² - 2x·c + |c|²，|x|²与分区无关，只比较后两项
+    labels = np.empty(len(features), dtype=int)
+    for start in range(0, len(features), ASSIGN_CHUNK_SIZE):
+        chunk = (features[start:start + ASSIGN_CHUNK_SIZE] - mean) / scale
+        labels[start:start + len(chunk)] = np.argmin(center_norms - 2 * chunk @ centers.T, axis=1)
+    return labels + 1
+
+
+def summarize_soil_zones(model: Dict, depths, labels, max_gap: float = 1) -> Dict:
+    """
+    汇总一口井的分区结果
+
+    Returns:
+        {'model_id', 'samples', 'dominant_zone', 'zones': [{'zone', 'soil_type', 'samples', 'fraction'}],
+         'intervals': [{'zone', 'start', 'end'}]}，intervals为同一分区的连续深度段（间隔超过max_gap时断开）
+    """
+    depths = np.asarray(depths, dtype=float)
+    labels = np.asarray(labels, dtype=int)
+    counts = np.bincount(labels, minlength=len(model['zones']) + 1)[1:]
+    total = max(1, len(labels))
+
+    breaks = np.flatnonzero((np.diff(labels) != 0) | (np.diff(depths) > max_gap)) + 1
+    starts = np.concatenate(([0], breaks)) if len(labels) else np.array([], dtype=int)
+    ends = np.append(breaks, len(labels)) - 1 if len(labels) else np.array([], dtype=int)
+
+    return {
+        'model_id': model['model_id'],
+        'samples': int(len(labels)),
+        'dominant_zone': int(np.argmax(counts)) + 1 if len(labels) else None,
+        'zones': [{'zone': zone['zone'], 'soil_type': zone['soil_type'], 'samples': int(count),
+                   'fraction': round(float(count / total), 4)} for zone, count in zip(model['zones'], counts)],
+        'intervals': [{'zone': int(labels[start]), 'start': float(depths[start]), 'end': float(depths[end])}
+                      for start, end in zip(starts, ends)]
+    }
+
+
+def save_zone_model(model: Dict, folder: str) -> str:
+    """把分区模型保存为<model_id>.json，返回文件路径"""
+    path = os.path.join(folder, f"{model['model_id']}.json")
+    write_json_atomic(path, model)
+    return path
+
+
+def load_zone_model(folder: str, model_id: str) -> Optional[Dict]:
+    """读取保存的分区模型，不存在或损坏时返回None"""
+    path = os.path.join(folder, f"{os.path.basename(model_id)}.json")
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
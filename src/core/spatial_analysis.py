@@ -0,0 +1,149 @@
+# spatial_analysis.py - 钻孔空间索引与平面插值
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# 插值时每次查询的网格点数，限制临时数组的内存
+GRID_CHUNK_SIZE = 262144
+
+
+class WellSpatialIndex:
+    """钻孔坐标的KD树索引，支持最近邻和半径查询"""
+
+    def __init__(self, names: Sequence[str], coords):
+        self.names = list(names)
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        self.tree = cKDTree(self.coords) if len(self.names) else None
+
+    def nearest(self, x: float, y: float, k: int = 5) -> List[Dict]:
+        """返回距离(x, y)最近的k口井，按距离排序"""
+        if self.tree is None:
+            return []
+        k = min(int(k), len(self.names))
+        distances, indices = self.tree.query([x, y], k=k)
+        distances, indices = np.atleast_1d(distances), np.atleast_1d(indices)
+        return [{'filename': self.names[i], 'x': float(self.coords[i, 0]), 'y': float(self.coords[i, 1]),
+                 'distance': float(d)} for d, i in zip(distances, indices)]
+
+    def within(self, x: float, y: float, radius: float) -> List[Dict]:
+        """返回距离(x, y)不超过radius的井，按距离排序"""
+        if self.tree is None:
+            return []
+        indices = self.tree.query_ball_point([x, y], r=radius)
+        distances = np.hypot(self.coords[indices, 0] - x, self.coords[indices, 1] - y)
+        return [{'filename': self.names[i], 'x': float(self.coords[i, 0]), 'y': float(self.coords[i, 1]),
+                 'distance': float(d)} for d, i in sorted(zip(distances, indices))]
+
+
+def grid_axes(bounds: Sequence[float], cell_size: float):
+    """按范围(xmin, ymin, xmax, ymax)和网格边长生成网格中心坐标"""
+    xmin, ymin, xmax, ymax = map(float, bounds)
+    if cell_size <= 0 or xmax <= xmin or ymax <= ymin:
+        raise ValueError('网格范围或网格边长无效')
+    xs = np.arange(xmin + cell_size / 2, xmax, cell_size)
+    ys = np.arange(ymin + cell_size / 2, ymax, cell_size)
+    return xs, ys
+
+
+def _idw_weights(tree: cKDTree, count: int, points, power: float, neighbors: int):
+    """按网格分块查询最近的neighbors口井，生成(分块切片, 井下标, 归一化权重)"""
+    k = min(int(neighbors), count)
+    for start in range(0, len(points), GRID_CHUNK_SIZE):
+        chunk = points[start:start + GRID_CHUNK_SIZE]
+        distances, indices = tree.query(chunk, k=k, workers=-1)
+        distances = distances.reshape(len(chunk), k)
+        indices = indices.reshape(len(chunk), k)
+
+        # 与井位重合的目标点直接取该井的值
+        exact = distances[:, 0] == 0
+        with np.errstate(divide='ignore'):
+            weights = 1.0 / distances ** power
+        weights[exact] = 0.0
+        weights[exact, 0] = 1.0
+        weights /= weights.sum(axis=1, keepdims=True)
+        yield slice(start, start + len(chunk)), indices, weights
+
+
+def idw_interpolate(coords, values, points, power: float = 2.0, neighbors: int = 12,
+                    tree: Optional[cKDTree] = None) -> np.ndarray:
+    """
+    反距离加权插值：每个目标点只使用KD树查得的最近neighbors口井，按网格分块向量化计算
+
+    values可以是一维（单个属性）或形状(井数, 属性数)的二维数组，多个属性共用一次近邻查询。
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    values = np.asarray(values, dtype=float)
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    result = np.full((len(points),) + values.shape[1:], np.nan)
+    if len(values) == 0:
+        return result
+
+    tree = tree or cKDTree(coords)
+    for rows, indices, weights in _idw_weights(tree, len(values), points, power, neighbors):
+        if values.ndim == 1:
+            result[rows] = (weights * values[indices]).sum(axis=1)
+        else:
+            result[rows] = np.einsum('nk,nka->na', weights, values[indices])
+    return result
+
+
+def interpolate_surfaces(coords, attributes: Dict[str, Sequence[float]], bounds: Sequence[float],
+                         cell_size: float, power: float = 2.0, neighbors: int = 12) -> Dict:
+    """
+    把各井的属性插值为规则网格上的平面分布
+
+    Args:
+        coords: 井位坐标，形状(井数, 2)
+        attributes: {属性名: 各井取值}，NaN表示该井缺少该属性（不参与该属性的插值）
+        bounds: (xmin, ymin, xmax, ymax)
+        cell_size: 网格边长
+
+    Returns:
+        {'x': 网格中心x, 'y': 网格中心y, 'surfaces': {属性名: 形状(ny, nx)的数组}}
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    xs, ys = grid_axes(bounds, cell_size)
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    points = np.column_stack((grid_x.ravel(), grid_y.ravel()))
+
+    # 缺失情况相同的属性共用一棵KD树和一次近邻查询
+    groups = {}
+    for name, values in attributes.items():
+        values = np.asarray(values, dtype=float)
+        valid = ~np.isnan(values)
+        groups.setdefault(valid.tobytes(), (valid, []))[1].append((name, values))
+
+    surfaces = {}
+    for valid, members in groups.values():
+        if not valid.any():
+            surfaces.update({name: np.full(grid_x.shape, np.nan) for name, _ in members})
+            continue
+        stacked = np.column_stack([values[valid] for _, values in members])
+        interpolated = idw_interpolate(coords[valid], stacked, points, power, neighbors)
+        for column, (name, _) in enumerate(members):
+            surfaces[name] = interpolated[:, column].reshape(grid_x.shape)
+    return {'x': xs, 'y': ys, 'surfaces': surfaces}
+
+
+def summarize_resource_grid(grid: Dict, cell_size: float) -> Dict:
+    """
+    在网格上积分资源量
+
+    grid需包含tons_per_m2（单位面积资源量，吨/平方米）平面，可选thickness和pollution_score平面。
+    """
+    cell_area = float(cell_size) ** 2
+    surfaces = grid['surfaces']
+    tonnage = surfaces['tons_per_m2'] * cell_area
+    summary = {
+        'cells': int(tonnage.size),
+        'cell_area': cell_area,
+        'total_area': float(tonnage.size * cell_area),
+        'total_resources': float(np.nansum(tonnage))
+    }
+    if 'thickness' in surfaces:
+        summary['mean_thickness'] = float(np.nanmean(surfaces['thickness']))
+        summary['total_volume'] = float(np.nansum(surfaces['thickness']) * cell_area)
+    if 'pollution_score' in surfaces and not np.all(np.isnan(surfaces['pollution_score'])):
+        summary['mean_pollution_score'] = float(np.nanmean(surfaces['pollution_score']))
+    return summary
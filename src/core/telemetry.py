@@ -0,0 +1,239 @@
+# telemetry.py - 随钻实时数据接入与增量煤层识别
+import json
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from coal_analysis import GAP_FACTOR, REQUIRED_COLUMNS, classify_coal_layer, detect_sampling_interval, layer_merge_gap
+from pollution_assessment import calculate_segment_pollution
+
+
+class TelemetryStream:
+    """
+    单口井的随钻数据流状态
+
+    样本按深度递增分批到达，每批只对新样本做煤层判别，并增量维护：
+    - 当前未闭合的煤层与已闭合的煤层列表（与get_coal_depth_ranges的划分规则一致：合并间隔随采样间隔放宽，
+      跨过数据缺失段的煤样本不属于同一煤层）
+    - 各污染分段的累计量，只重新计算本批样本落入的分段
+
+    污染分段的深度因子以目前钻达的深度为下限计算，是随钻过程中的临时评分；
+    完整评估仍以钻后上传文件的assess_coal_pollution结果为准。
+    """
+
+    def __init__(self, well_id: str, segment_size: float = 10, max_gap: Optional[float] = None,
+                 coal_rules: Optional[Dict] = None, rule_set: str = 'default'):
+        self.well_id = well_id
+        # 同一数据流的所有批次使用同一套煤层判别规则，煤层开闭才前后一致；rule_set为规则集名称
+        self.coal_rules = coal_rules
+        self.rule_set = rule_set
+        self.segment_size = float(segment_size)
+        # 煤层合并间隔，None时按首批样本估计的采样间隔确定（见layer_merge_gap）
+        self.max_gap = None if max_gap is None else float(max_gap)
+        self.sampling_interval = None
+        # 已接收样本中的数据缺失段个数（相邻样本深度差超过GAP_FACTOR倍采样间隔）
+        self.gap_count = 0
+
+        self.samples = 0
+        self.depth_min = None
+        self.last_depth = None
+        self.open_layer = None
+        self.closed_layers = []
+        # 分段编号 -> 累计量（样本数、煤样本数、各参数总和、非煤样本的密度和电阻率总和）
+        self.segments = {}
+
+    def ingest(self, samples) -> List[Dict]:
+        """
+        接入一批按深度递增的样本
+
+        Args:
+            samples: DataFrame或样本字典列表，需包含REQUIRED_COLUMNS中的列
+
+        Returns:
+            本批产生的事件列表：layer_open、layer_close、segment_update
+
+        Raises:
+            ValueError: 缺少必要的列、数值列含非数值、深度缺失或不递增，此时不改变数据流状态
+        """
+        batch = samples if isinstance(samples, pd.DataFrame) else pd.DataFrame(list(samples))
+        if batch.empty:
+            return []
+        missing = [col for col in REQUIRED_COLUMNS if col not in batch.columns]
+        if missing:
+            raise ValueError(f'样本中缺少必要的列：{", ".join(missing)}')
+
+        batch = batch.reset_index(drop=True)
+        for col in REQUIRED_COLUMNS:
+            values = pd.to_numeric(batch[col], errors='coerce')
+            invalid = values.isna() & batch[col].notna()
+            if invalid.any():
+                index = int(np.flatnonzero(invalid.to_numpy())[0])
+                raise ValueError(f'第{index + 1}个样本的{col}不是数值：{batch[col].iloc[index]!r}')
+            batch[col] = values.astype(float)
+        if batch['深度'].isna().any():
+            raise ValueError('样本缺少深度')
+        batch['双侧向电阻率'] = 0.7 * batch['深侧向'] + 0.3 * batch['浅侧向']
+        depths = batch['深度'].to_numpy(dtype=float)
+        if np.any(np.diff(depths) < 0) or (self.last_depth is not None and depths[0] < self.last_depth):
+            raise ValueError(f'样本深度必须递增（当前已接收至{self.last_depth}米）')
+
+        coal_mask = classify_coal_layer(batch, self.coal_rules).to_numpy()
+        previous = depths[:1] if self.last_depth is None else np.array([self.last_depth])
+        if self.sampling_interval is None:
+            self.sampling_interval = detect_sampling_interval(np.concatenate((previous, depths)))
+        # 每个样本所在的连续区段编号（之前的数据缺失段个数）
+        steps = np.diff(np.concatenate((previous, depths)))
+        gap_flags = (steps > GAP_FACTOR * self.sampling_interval if self.sampling_interval
+                     else np.zeros(steps.size, dtype=bool))
+        runs = self.gap_count + np.cumsum(gap_flags)
+        if self.depth_min is None:
+            self.depth_min = float(depths[0])
+        self.samples += len(batch)
+        self.last_depth = float(depths[-1])
+        self.gap_count = int(runs[-1])
+
+        events = self._update_layers(batch, depths, coal_mask, runs)
+        events.extend(self._update_segments(batch, depths, coal_mask))
+        return events
+
+    def _merge_gap(self) -> float:
+        """当前使用的煤层合并间隔(米)"""
+        return self.max_gap if self.max_gap is not None else layer_merge_gap(self.sampling_interval)
+
+    def _update_layers(self, batch, depths, coal_mask, runs) -> List[Dict]:
+        """延续、闭合或新开煤层（只遍历本批中的煤层，而非整条测井曲线）"""
+        events = []
+        max_gap = self._merge_gap()
+        coal_depths = depths[coal_mask]
+        if coal_depths.size:
+            density = batch['密度'].to_numpy(dtype=float)[coal_mask]
+            gamma = batch['自然伽玛'].to_numpy(dtype=float)[coal_mask]
+            coal_runs = runs[coal_mask]
+            previous = self.open_layer['end'] if self.open_layer else -math.inf
+            previous_run = self.open_layer['run'] if self.open_layer else -1
+            # 编号0表示延续当前未闭合的煤层；深度差超过合并间隔或跨过数据缺失段时断开
+            splits = ((np.diff(np.concatenate(([previous], coal_depths))) > max_gap) |
+                      (np.diff(np.concatenate(([previous_run], coal_runs))) != 0))
+            group_ids = np.cumsum(splits)
+            boundaries = np.flatnonzero(np.diff(group_ids)) + 1
+            for first, last in zip(np.concatenate(([0], boundaries)),
+                                   np.concatenate((boundaries, [coal_depths.size]))):
+                if group_ids[first] > 0:
+                    if self.open_layer:
+                        events.append(self._close_layer())
+                    self.open_layer = {'start': float(coal_depths[first]), 'end': float(coal_depths[first]),
+                                       'run': int(coal_runs[first]), 'count': 0, 'density_sum': 0.0, 'density_count': 0,
+                                       'gamma_sum': 0.0, 'gamma_count': 0}
+                    events.append({'event': 'layer_open', 'layer': self._layer_summary(self.open_layer)})
+                layer = self.open_layer
+                layer['end'] = float(coal_depths[last - 1])
+                layer['count'] += int(last - first)
+                for key, values in (('density', density[first:last]), ('gamma', gamma[first:last])):
+                    valid = values[~np.isnan(values)]
+                    layer[f'{key}_sum'] += float(valid.sum())
+                    layer[f'{key}_count'] += int(valid.size)
+
+        # 已钻过未闭合煤层底部超过合并间隔仍无煤样本，或其后出现数据缺失段时，煤层不可能再延续
+        if self.open_layer and (self.last_depth - self.open_layer['end'] > max_gap or
+                                self.gap_count != self.open_layer['run']):
+            events.append(self._close_layer())
+        return events
+
+    def _close_layer(self) -> Dict:
+        layer = self._layer_summary(self.open_layer)
+        self.closed_layers.append(layer)
+        self.open_layer = None
+        return {'event': 'layer_close', 'layer': layer}
+
+    def _layer_summary(self, layer) -> Dict:
+        return {
+            'layer_number': len(self.closed_layers) + 1,
+            'start': layer['start'],
+            'end': layer['end'],
+            'thickness': layer['end'] - layer['start'],
+            'samples': layer['count'],
+            'avg_density': layer['density_sum'] / layer['density_count'] if layer['density_count'] else None,
+            'avg_gamma': layer['gamma_sum'] / layer['gamma_count'] if layer['gamma_count'] else None
+        }
+
+    def _update_segments(self, batch, depths, coal_mask) -> List[Dict]:
+        """把本批样本按分段累加，并重新计算受影响分段的污染指数"""
+        segment_ids = np.floor((depths - self.depth_min) / self.segment_size).astype(np.int64)
+        columns = {'density': '密度', 'gamma': '自然伽玛', 'resistivity': '双侧向电阻率', 'sonic': '声波时差'}
+        values = {key: batch[column].to_numpy(dtype=float) for key, column in columns.items()}
+
+        events = []
+        for segment_id in np.unique(segment_ids).tolist():
+            in_segment = segment_ids == segment_id
+            rock = in_segment & ~coal_mask
+            stats = self.segments.setdefault(segment_id, dict.fromkeys(
+                ['count', 'coal', 'density', 'gamma', 'resistivity', 'sonic',
+                 'rock_count', 'rock_density', 'rock_resistivity'], 0.0))
+            stats['count'] += int(in_segment.sum())
+            stats['coal'] += int((in_segment & coal_mask).sum())
+            for key in columns:
+                stats[key] += float(values[key][in_segment].sum())
+            stats['rock_count'] += int(rock.sum())
+            stats['rock_density'] += float(values['density'][rock].sum())
+            stats['rock_resistivity'] += float(values['resistivity'][rock].sum())
+            events.append({'event': 'segment_update', 'segment': self.segment_score(segment_id)})
+        return events
+
+    def segment_score(self, segment_id: int) -> Dict:
+        """按目前的累计量计算分段污染指数（公式与assess_coal_pollution相同）"""
+        stats = self.segments[segment_id]
+        start = self.depth_min + segment_id * self.segment_size
+        coal_percentage = stats['coal'] / stats['count']
+        avg_density = stats['density'] / stats['count']
+        avg_gamma = stats['gamma'] / stats['count']
+        resistivity = stats['resistivity'] / stats['count']
+
+        pollution_level = 0.0
+        if stats['coal'] > 0:
+            rock_density = stats['rock_density'] / stats['rock_count'] if stats['rock_count'] else None
+            rock_resistivity = stats['rock_resistivity'] / stats['rock_count'] if stats['rock_count'] else None
+            depth_range = self.last_depth - self.depth_min
+            depth_factor = 1.0 - (start - self.depth_min) / depth_range * 0.5 if depth_range > 0 else 1.0
+            porosity_factor = min(1.5, stats['sonic'] / stats['count'] / 200)
+            pollution_level = calculate_segment_pollution(coal_percentage, avg_density, avg_gamma, resistivity,
+                                                          porosity_factor, rock_density, rock_resistivity,
+                                                          depth_factor)
+
+        return {
+            'start_depth': float(start),
+            'end_depth': float(start + self.segment_size),
+            'samples': int(stats['count']),
+            'coal_percentage': float(coal_percentage),
+            'pollution_level': float(pollution_level),
+            'physical_params': {
+                'density': float(avg_density),
+                'gamma': float(avg_gamma),
+                'resistivity': float(resistivity)
+            }
+        }
+
+    def finish(self) -> List[Dict]:
+        """钻进结束：闭合未闭合的煤层"""
+        return [self._close_layer()] if self.open_layer else []
+
+    def snapshot(self) -> Dict:
+        """当前状态，新订阅者连接时首先收到"""
+        return {
+            'well_id': self.well_id,
+            'samples': self.samples,
+            'depth': self.last_depth,
+            'closed_layers': self.closed_layers,
+            'open_layer': self._layer_summary(self.open_layer) if self.open_layer else None,
+            'segments': [self.segment_score(segment_id) for segment_id in sorted(self.segments)]
+        }
+
+
+def parse_telemetry_line(line) -> Optional[List[Dict]]:
+    """解析NDJSON中的一行：单个样本对象或样本数组，空行返回None"""
+    line = line.strip()
+    if not line:
+        return None
+    payload = json.loads(line)
+    return payload if isinstance(payload, list) else [payload]
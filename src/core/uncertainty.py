@@ -0,0 +1,151 @@
+# uncertainty.py - 污染评分与资源量的蒙特卡洛不确定性分析
+from typing import Dict, Optional
+
+import numpy as np
+
+from coal_analysis import classify_coal_arrays, coal_layer_boundaries, coal_layer_gaps
+from pollution_assessment import calculate_segment_pollution
+
+# 默认误差模型：relative为相对误差（乘以1+sigma×N(0,1)），absolute为绝对误差（加上sigma×N(0,1)）
+DEFAULT_ERROR_MODELS = {
+    '深侧向': {'type': 'relative', 'sigma': 0.05},
+    '浅侧向': {'type': 'relative', 'sigma': 0.05},
+    '声波时差': {'type': 'relative', 'sigma': 0.02},
+    '自然伽玛': {'type': 'relative', 'sigma': 0.05},
+    '密度': {'type': 'absolute', 'sigma': 0.02},
+    'area': {'type': 'relative', 'sigma': 0.1}
+}
+
+# 每批模拟的(模拟次数 × 深度点数)元素上限，限制二维临时数组的内存
+SAMPLE_CHUNK_ELEMENTS = 2000000
+
+
+def perturb(values, model: Optional[Dict], rng: np.random.Generator, shape) -> np.ndarray:
+    """按误差模型生成shape形状的扰动值（values按广播规则对齐到shape的末尾维度）"""
+    values = np.asarray(values, dtype=float)
+    if not model or not model.get('sigma'):
+        return np.broadcast_to(values, shape)
+    kind = model.get('type', 'relative')
+    if kind not in ('relative', 'absolute'):
+        raise ValueError(f"未知的误差模型类型: {kind}")
+    noise = rng.standard_normal(shape)
+    noise *= float(model['sigma'])
+    if kind == 'relative':
+        noise += 1.0
+        noise *= values
+    else:
+        noise += values
+    return noise
+
+
+def _segment_mean(values, bounds, mask=None):
+    """沿第1维按分段起点bounds求均值（NaN和mask为False的样本不计入，没有有效样本时为NaN）"""
+    valid = ~np.isnan(values)
+    if mask is not None:
+        valid &= mask
+    sums = np.add.reduceat(np.where(valid, values, 0.0), bounds, axis=1)
+    counts = np.add.reduceat(valid, bounds, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _percentiles(values) -> Dict:
+    """P10/P50/P90（第10/50/90百分位数）及均值、标准差"""
+    values = np.asarray(values, dtype=float)
+    p10, p50, p90 = np.percentile(values, [10, 50, 90])
+    return {'p10': float(p10), 'p50': float(p50), 'p90': float(p90),
+            'mean': float(values.mean()), 'std': float(values.std())}
+
+
+def monte_carlo_assessment(data, samples: int = 1000, error_models: Optional[Dict] = None, rules=None,
+                           area: float = 10000, segment_size: float = 10, max_gap: Optional[float] = None,
+                           seed: Optional[int] = None) -> Dict:
+    """
+    对测井曲线和面积加入随机测量误差，重复煤层识别、污染评分和资源量计算，统计结果的分布
+
+    每批模拟在(模拟次数, 深度点数)二维数组上一次完成：扰动原始曲线、重算双侧向电阻率、按规则判别煤样本、
+    按10米分段归约污染参数并评分、由煤层首末样本求总厚度和资源量。评分和资源量的计算口径
+    与assess_coal_pollution、calculate_coal_resources一致，误差为零时结果与两者相同。
+
+    Args:
+        data: process_data_frame处理后的钻孔数据
+        samples: 模拟次数
+        error_models: 覆盖DEFAULT_ERROR_MODELS的误差模型{列名或'area': {'type': 'relative'/'absolute', 'sigma': 标准差}}，
+            sigma为0的项不扰动
+        rules: 煤层判别阈值
+        area: 煤层面积(平方米)
+        max_gap: 煤层合并间隔，未给出时按数据的采样间隔确定（煤层划分参数见coal_layer_gaps）
+        seed: 随机种子
+
+    Returns:
+        {'samples', 'overall_score', 'total_resources', 'total_thickness', 'area'}，
+        后四项为{'p10', 'p50', 'p90', 'mean', 'std'}
+    """
+    samples = int(samples)
+    if samples < 1:
+        raise ValueError('模拟次数必须为正整数')
+    error_models = {**DEFAULT_ERROR_MODELS, **(error_models or {})}
+    rng = np.random.default_rng(seed)
+    max_gap, gaps = coal_layer_gaps(data, max_gap)
+
+    data = data.sort_values('深度', kind='stable')
+    depths = data['深度'].to_numpy(dtype=float)
+    depth_min, depth_max = depths[0], depths[-1]
+    columns = {column: data[column].to_numpy(dtype=float)
+               for column in ('深侧向', '浅侧向', '声波时差', '自然伽玛', '密度')}
+
+    # 污染分段（与assess_coal_pollution相同：每segment_size米一段，不含最大深度处的样本，跳过空分段），
+    # 数据按深度排序后每个分段是连续的一段样本，用reduceat沿深度维归约
+    segment_starts = np.arange(depth_min, depth_max, segment_size)
+    stop = int(np.searchsorted(depths, depth_max, side='left'))
+    bounds = np.searchsorted(depths[:stop], segment_starts, side='left')
+    segment_counts = np.diff(np.append(bounds, stop))
+    bounds, segment_starts, segment_counts = (bounds[segment_counts > 0], segment_starts[segment_counts > 0],
+                                              segment_counts[segment_counts > 0])
+    depth_range = depth_max - depth_min
+    depth_factor = 1.0 - (segment_starts - depth_min) / max(depth_range, 1e-12) * 0.5
+    score_weight = 1 - 0.3 * (segment_starts - depth_min) / max(1, depth_range)
+
+    chunk = max(1, SAMPLE_CHUNK_ELEMENTS // max(1, depths.size))
+    scores, thickness, avg_density = [], [], []
+    for first in range(0, samples, chunk):
+        shape = (min(chunk, samples - first), depths.size)
+        noisy = {column: perturb(values, error_models.get(column), rng, shape) for column, values in columns.items()}
+        noisy['双侧向电阻率'] = 0.7 * noisy['深侧向'] + 0.3 * noisy['浅侧向']
+        coal = classify_coal_arrays(noisy, shape, rules)
+
+        # 资源量：煤层总厚度 × 面积 × 煤样本平均密度
+        starts, ends = coal_layer_boundaries(coal, depths, max_gap, gaps)
+        thickness.append(np.where(ends, depths, 0.0).sum(axis=1) - np.where(starts, depths, 0.0).sum(axis=1))
+        coal_density = np.where(coal & ~np.isnan(noisy['密度']), noisy['密度'], 0.0).sum(axis=1)
+        coal_count = (coal & ~np.isnan(noisy['密度'])).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_density.append(np.where(coal_count > 0, coal_density / np.maximum(coal_count, 1), 0.0))
+
+        # 污染评分
+        if bounds.size == 0:
+            scores.append(np.zeros(shape[0]))
+            continue
+        segment_coal = coal[:, :stop]
+        coal_percentage = np.add.reduceat(segment_coal, bounds, axis=1) / segment_counts
+        resistivity = _segment_mean(noisy['双侧向电阻率'][:, :stop], bounds)
+        porosity_factor = np.fmin(1.5, _segment_mean(noisy['声波时差'][:, :stop], bounds) / 200)
+        rock = ~segment_coal
+        rock_density = _segment_mean(noisy['密度'][:, :stop], bounds, rock)
+        rock_resistivity = _segment_mean(noisy['双侧向电阻率'][:, :stop], bounds, rock)
+        levels = calculate_segment_pollution(coal_percentage, _segment_mean(noisy['密度'][:, :stop], bounds),
+                                             _segment_mean(noisy['自然伽玛'][:, :stop], bounds), resistivity,
+                                             porosity_factor, rock_density, rock_resistivity, depth_factor)
+        levels = np.where(coal_percentage > 0, levels, 0.0)
+        scores.append(np.fmin(100, (levels * score_weight).sum(axis=1) / (10 * bounds.size) * 100))
+
+    areas = np.maximum(perturb(area, error_models.get('area'), rng, (samples,)), 0.0)
+    thickness = np.concatenate(thickness)
+    resources = thickness * areas * np.concatenate(avg_density) * 1000
+    return {
+        'samples': samples,
+        'overall_score': _percentiles(np.concatenate(scores)),
+        'total_resources': _percentiles(resources),
+        'total_thickness': _percentiles(thickness),
+        'area': _percentiles(areas)
+    }
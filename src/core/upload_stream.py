@@ -0,0 +1,83 @@
+# upload_stream.py - 上传文件流式解析功能
+import hashlib
+import logging
+import os
+import queue
+import threading
+
+logger = logging.getLogger('upload_stream')
+
+
+class BackgroundFileWriter(threading.Thread):
+    """在后台线程中把数据块写入临时文件，完成后原子替换为目标文件"""
+
+    def __init__(self, filepath, max_pending_chunks=64):
+        super().__init__(daemon=True)
+        self.filepath = filepath
+        self.chunks = queue.Queue(maxsize=max_pending_chunks)
+        self.error = None
+
+    def run(self):
+        tmp_path = f"{self.filepath}.part{os.getpid()}_{threading.get_ident()}"
+        closed = False
+        try:
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    chunk = self.chunks.get()
+                    if chunk is None:
+                        closed = True
+                        break
+                    f.write(chunk)
+            os.replace(tmp_path, self.filepath)
+        except OSError as e:
+            self.error = e
+            logger.error(f"保存上传文件失败: {str(e)}")
+            # 排空队列，避免生产者阻塞
+            while not closed:
+                closed = self.chunks.get() is None
+
+    def write(self, chunk):
+        self.chunks.put(chunk)
+
+    def close(self):
+        self.chunks.put(None)
+
+
+class HashingTee:
+    """
+    包装上传数据流：读取的同时计算SHA-256，并把数据块交给后台线程落盘
+
+    可直接作为文件对象传给pandas.read_csv，解析和落盘并行进行。
+    """
+
+    def __init__(self, source, filepath, chunk_size=1 << 20):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.digest = hashlib.sha256()
+        self.writer = BackgroundFileWriter(filepath)
+        self.writer.start()
+        self.finished = False
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return b''.join(iter(lambda: self.read(self.chunk_size), b''))
+        chunk = self.source.read(size)
+        if chunk:
+            self.digest.update(chunk)
+            self.writer.write(chunk)
+        return chunk
+
+    def readable(self):
+        return True
+
+    def __iter__(self):
+        return iter(lambda: self.read(self.chunk_size), b'')
+
+    def finish(self):
+        """读完剩余数据并通知后台线程结束写入，返回内容哈希（不等待落盘完成）"""
+        if not self.finished:
+            while self.read(self.chunk_size):
+                pass
+            self.writer.close()
+            self.finished = True
+        return self.digest.hexdigest()
@@ -4,6 +4,8 @@ import os
 import matplotlib.pyplot as plt
 import io
 import base64
+import hashlib
+import json
 from matplotlib.font_manager import FontProperties
 import numpy as np
 
@@ -12,10 +14,27 @@ matplotlib.use('Agg')  # 必须在其他matplotlib导入之前设置
 
 
 # 检查文件类型是否合法
-def allowed_file(filename, allowed_extensions={'xlsx', 'xls', 'csv'}):
+def allowed_file(filename, allowed_extensions={'xlsx', 'xls', 'csv', 'las'}):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
 
+# 分块计算文件内容的SHA-256
+def file_content_hash(filepath, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 先写临时文件再原子替换，读者不会看到写了一半的JSON文件
+def write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
 # 设置中文字体
 def set_chinese_font():
     try:
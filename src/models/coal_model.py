@@ -1,37 +1,12 @@
 # src/models/coal_model.py - 煤层数据模型
 
 from dataclasses import dataclass
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
 import pandas as pd
 
-@dataclass
-class CoalLayer:
-    """煤层数据模型"""
-    layer_number: int
-    start_depth: float
-    end_depth: float
-    thickness: float
-    volume: float
-    density: float
-    mass_tons: float
-    quality_score: float
-    quality_grade: str
-    mining_difficulty: Dict[str, Any]
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """转换为字典格式"""
-        return {
-            'layer_number': self.layer_number,
-            'start_depth': self.start_depth,
-            'end_depth': self.end_depth,
-            'thickness': self.thickness,
-            'volume': self.volume,
-            'density': self.density,
-            'mass_tons': self.mass_tons,
-            'quality_score': self.quality_score,
-            'quality_grade': self.quality_grade,
-            'mining_difficulty': self.mining_difficulty
-        }
+if TYPE_CHECKING:
+    # 只用于类型标注：导入src.core会加载全部核心模块（需要src/core在sys.path中）
+    from src.core.layer_table import LayerTable
 
 @dataclass
 class CoalAnalysisResult:
@@ -41,7 +16,7 @@ class CoalAnalysisResult:
     notes: str
     timestamp: str
     total_thickness: float
-    layers: List[CoalLayer]
+    layers: 'LayerTable'
     chart_data: Dict[str, Any]
     
     def to_dict(self) -> Dict[str, Any]:
@@ -52,7 +27,7 @@ class CoalAnalysisResult:
             'notes': self.notes,
             'timestamp': self.timestamp,
             'total_thickness': self.total_thickness,
-            'layers': [layer.to_dict() for layer in self.layers],
+            'layers': self.layers.to_records(),
             'chart_data': self.chart_data
         }
 